@@ -1,13 +1,17 @@
 import sys
 import os
 from PyQt5.QtWidgets import QApplication, QMessageBox, QAction, QMenu
-from PyQt5.QtCore import QDir
+from PyQt5.QtCore import QDir, QTimer
 from main import MainWindow
 from editor import Editor, WelcomeWidget
 from file_system import FileExplorer
 from git_manager import GitManager
 from style import Style
 from mind_map import MindMap
+from workspace_search import SearchPanel
+from quick_open import QuickOpenDialog
+from journal import JournalWriter, DocumentJournal, find_recoveries
+from repo_watcher import RepoWatcher
 
 class Application:
     def __init__(self):
@@ -25,13 +29,25 @@ class Application:
         self.connect_signals()
         
     def init_components(self):
+        # 自动保存日志的写入线程
+        self.journal_writer = JournalWriter()
+        self.journal_writer.start()
+        
         # 初始化文件浏览器
         self.file_explorer = FileExplorer()
         self.main_window.sidebar.removeTab(0)  # 移除占位符
         self.main_window.sidebar.insertTab(0, self.file_explorer, "文件")
         
+        # 搜索面板、Git管理器、文件浏览器和快速打开共用一个文件监视器
+        self.repo_watcher = RepoWatcher(self.main_window)
+        
+        # 初始化搜索面板
+        self.search_panel = SearchPanel(self.repo_watcher)
+        self.main_window.sidebar.removeTab(1)  # 移除搜索占位符
+        self.main_window.sidebar.insertTab(1, self.search_panel, "搜索")
+        
         # 初始化Git管理器
-        self.git_manager = GitManager()
+        self.git_manager = GitManager(self.repo_watcher)
         self.main_window.sidebar.removeTab(2)  # 移除Git占位符
         self.main_window.sidebar.insertTab(2, self.git_manager, "Git")
         
@@ -39,6 +55,13 @@ class Application:
         current_dir = QDir.currentPath()
         self.git_manager.set_repo_path(current_dir)
         
+        # 为当前工作目录建立搜索索引
+        self.search_panel.set_root_path(current_dir)
+        
+        # 初始化快速打开
+        self.quick_open = QuickOpenDialog(self.main_window)
+        self.quick_open.set_root_path(current_dir)
+        
         # 添加欢迎页面
         self.welcome_widget = WelcomeWidget()
         self.main_window.editor.add_tab(self.welcome_widget, "欢迎")
@@ -54,8 +77,32 @@ class Application:
         # 连接文件浏览器的双击信号
         self.file_explorer.tree_view.doubleClicked.connect(self.on_file_double_clicked)
         
-        # 连接标签关闭信号
-        self.main_window.editor.main_container.tab_widget.tabCloseRequested.connect(self.on_tab_close_requested)
+        # 文件树显示Git状态
+        self.git_manager.status_snapshot_changed.connect(self.file_explorer.set_status_snapshot)
+        
+        # 连接搜索信号
+        self.file_explorer.root_path_changed.connect(self.search_panel.set_root_path)
+        self.file_explorer.search_requested.connect(self.on_search_requested)
+        self.search_panel.open_file_requested.connect(self.open_file)
+        self.app.aboutToQuit.connect(self.search_panel.stop)
+        
+        # 连接快速打开信号，文件变化来自共用的监视器
+        self.main_window.quick_open_action.triggered.connect(self.quick_open.popup)
+        self.file_explorer.root_path_changed.connect(self.quick_open.set_root_path)
+        self.repo_watcher.paths_changed.connect(self.quick_open.update_paths)
+        self.repo_watcher.paths_changed.connect(self.file_explorer.refresh_paths)
+        self.quick_open.file_selected.connect(self.open_file)
+        self.app.aboutToQuit.connect(self.quick_open.stop)
+        self.app.aboutToQuit.connect(self.journal_writer.stop)
+        
+        # 保存、撤销和重做作用于当前获得焦点的编辑器或思维导图
+        self.main_window.save_action.triggered.connect(self.on_save)
+        self.main_window.undo_action.triggered.connect(self.on_undo)
+        self.main_window.redo_action.triggered.connect(self.on_redo)
+        
+        # 连接标签关闭信号，退出时停止所有标签页的后台加载
+        self.main_window.editor.tab_closing.connect(self.on_tab_closing)
+        self.app.aboutToQuit.connect(self.close_documents)
         
         # 连接Git命令执行信号
         self.git_manager.git_command_executed.connect(self.on_git_command_executed)
@@ -87,42 +134,84 @@ class Application:
         if self.file_explorer.model.rootPath() != self.git_manager.current_repo_path:
             self.git_manager.set_repo_path(self.file_explorer.model.rootPath())
         
+    def on_search_requested(self, text):
+        # 切换到搜索标签并执行搜索
+        self.main_window.sidebar.setCurrentWidget(self.search_panel)
+        self.search_panel.search(text)
+        
     def on_file_double_clicked(self, index):
         # 获取文件路径
-        file_path = self.file_explorer.model.filePath(index)
+        file_path = self.file_explorer.file_path(index)
         
         # 如果是文件，则打开
         import os
         if os.path.isfile(file_path):
             self.open_file(file_path)
     
-    def open_file(self, file_path):
-        # 创建编辑器
+    def create_editor(self, title):
+        # 创建编辑器并添加到编辑器容器
         editor = Editor()
-        
-        # 读取文件内容
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            editor.set_content(content)
-            
-            # 获取文件名
-            import os
-            file_name = os.path.basename(file_path)
-            
-            # 添加到编辑器
-            index = self.main_window.editor.add_tab(editor, file_name)
-            self.main_window.editor.set_current_widget(editor)
-        except Exception as e:
-            print(f"打开文件失败: {e}")
+        editor.status_message.connect(self.main_window.statusBar.showMessage)
+        editor.file_saved.connect(self.repo_watcher.file_changed)
+        editor.set_journal(DocumentJournal(self.journal_writer, "editor"))
+        self.main_window.editor.add_tab(editor, title)
+        self.main_window.editor.set_current_widget(editor)
+        return editor
     
-    def on_tab_close_requested(self, index):
-        # 获取发送信号的标签页
-        sender = self.app.sender()
+    def open_file(self, file_path, line=None):
+        # 创建编辑器
+        editor = self.create_editor(os.path.basename(file_path))
         
-        # 关闭标签页
-        if hasattr(sender, 'removeTab'):
-            sender.removeTab(index)
+        # 在后台分块读取文件内容
+        editor.load_file(file_path)
+        if line is not None:
+            editor.goto_line(line)
+    
+    def current_document(self):
+        # 从焦点控件向上查找所在的编辑器或思维导图
+        widget = self.app.focusWidget()
+        while widget is not None and not isinstance(widget, (Editor, MindMap)):
+            widget = widget.parentWidget()
+        return widget
+    
+    def on_save(self):
+        widget = self.current_document()
+        if isinstance(widget, MindMap):
+            widget.save_mind_map()
+        elif isinstance(widget, Editor):
+            widget.save_file()
+    
+    def on_undo(self):
+        widget = self.current_document()
+        if isinstance(widget, MindMap):
+            widget.undo()
+        elif isinstance(widget, Editor):
+            widget.text_edit.undo()
+    
+    def on_redo(self):
+        widget = self.current_document()
+        if isinstance(widget, MindMap):
+            widget.redo()
+        elif isinstance(widget, Editor):
+            widget.text_edit.redo()
+    
+    def on_tab_closing(self, widget):
+        # 主动关闭的文档不再需要恢复
+        journal = getattr(widget, 'journal', None)
+        if journal:
+            journal.reset()
+        # 停止后台加载和大文件的索引线程
+        if hasattr(widget, 'close_document'):
+            widget.close_document()
+    
+    def close_documents(self):
+        # 退出时保留自动保存日志，只停止后台线程
+        for container in self.main_window.editor.containers:
+            tab_widget = container.tab_widget
+            for index in range(tab_widget.count()):
+                widget = tab_widget.widget(index)
+                if hasattr(widget, 'close_document'):
+                    widget.close_document()
     
     def init_mind_map(self):
         # 创建思维导图按钮
@@ -138,6 +227,7 @@ class Application:
     def create_mind_map(self):
         # 创建思维导图
         mind_map = MindMap()
+        mind_map.set_journal(DocumentJournal(self.journal_writer, "mind_map"))
         
         # 添加到主编辑器容器
         index = self.main_window.editor.add_tab(mind_map, "思维导图")
@@ -148,8 +238,35 @@ class Application:
         
         return mind_map
     
+    def restore_unsaved(self):
+        # 恢复上次退出或崩溃前未保存的文档
+        recoveries = find_recoveries(self.journal_writer.directory)
+        if not recoveries:
+            return
+        reply = QMessageBox.question(
+            self.main_window, "恢复未保存的内容",
+            f"发现 {len(recoveries)} 个未保存的文档，是否恢复？",
+            QMessageBox.Yes | QMessageBox.No)
+        for recovery in recoveries:
+            # 旧的日志文件删除，恢复后的文档使用新的日志
+            self.journal_writer.submit(("discard_key", recovery["key"]))
+            if reply != QMessageBox.Yes:
+                continue
+            try:
+                if recovery["kind"] == "mind_map":
+                    widget = self.create_mind_map()
+                else:
+                    file_path = recovery.get("file_path")
+                    widget = self.create_editor(os.path.basename(file_path) if file_path else "未命名")
+                widget.restore_from_journal(recovery)
+            except Exception as e:
+                print(f"恢复文档失败: {e}")
+        if reply == QMessageBox.Yes:
+            self.main_window.statusBar.showMessage(f"已恢复 {len(recoveries)} 个未保存的文档")
+    
     def run(self):
         self.main_window.show()
+        QTimer.singleShot(0, self.restore_unsaved)
         return self.app.exec_()
 
 if __name__ == "__main__":
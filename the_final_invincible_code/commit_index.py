@@ -0,0 +1,244 @@
+import os
+import json
+import heapq
+import subprocess
+import threading
+
+
+class CommitIndex:
+    """提交图与引用索引
+
+    保存每个提交的父提交和世代号（到根提交的最长距离加一），以及各引用的指向。
+    索引持久化在 .git/lingxi 中：提交只追加到commits文件，每行为“世代号 提交 父提交...”；
+    引用和状态较小，每次整体重写refs.json。packed-refs、引用或reflog发生变化时，
+    只读取并追加新增的提交。索引在第一次refresh时加载，可以在多个线程中使用。
+    """
+
+    VERSION = 2
+
+    def __init__(self, repo_path, git_dir):
+        self.repo_path = repo_path
+        self.git_dir = git_dir
+        self.cache_dir = os.path.join(git_dir, "lingxi")
+        self.commits_path = os.path.join(self.cache_dir, "commits")
+        self.refs_path = os.path.join(self.cache_dir, "refs.json")
+        self.refs = {}  # 引用名 -> 提交
+        self.upstreams = {}  # 本地分支引用名 -> 上游引用名
+        self.head = None  # HEAD指向的引用名，分离头指针时为提交哈希
+        self.parents = {}  # 提交 -> 父提交元组
+        self.generation = {}  # 提交 -> 世代号
+        self.state = None
+        self.loaded = False
+        self.rewrite = False  # 已有的提交文件不可用，下次写入时覆盖
+        self.lock = threading.RLock()
+
+    def load(self):
+        """读取持久化的索引，格式不符或提交文件不完整时从头建立"""
+        try:
+            with open(self.refs_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                raise ValueError(data.get("version"))
+            with open(self.commits_path, 'r', encoding='ascii') as f:
+                size = 0
+                for line in f:
+                    if not line.endswith("\n"):
+                        # 追加时中断留下的半行
+                        break
+                    size += len(line)
+                    fields = line.split()
+                    self.generation[fields[1]] = int(fields[0])
+                    self.parents[fields[1]] = tuple(fields[2:])
+            if size < data["commits_size"]:
+                raise ValueError(size)
+        except (OSError, ValueError, KeyError, IndexError, UnicodeDecodeError):
+            self.parents.clear()
+            self.generation.clear()
+            self.rewrite = True
+        else:
+            self.refs = data["refs"]
+            self.upstreams = data.get("upstreams", {})
+            self.head = data.get("head")
+            self.state = data.get("state")
+        self.loaded = True
+
+    def append_commits(self, lines):
+        """把新增的提交追加到提交文件"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.commits_path, 'w' if self.rewrite else 'a', encoding='ascii') as f:
+            f.writelines(lines)
+        self.rewrite = False
+
+    def save_refs(self):
+        """保存引用和状态，记录提交文件的大小用于检查其完整性"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            commits_size = os.path.getsize(self.commits_path)
+        except OSError:
+            commits_size = 0
+        data = {
+            "version": self.VERSION,
+            "commits_size": commits_size,
+            "refs": self.refs,
+            "upstreams": self.upstreams,
+            "head": self.head,
+            "state": self.state,
+        }
+        temp_path = self.refs_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.refs_path)
+
+    def read_state(self):
+        """收集HEAD、packed-refs、引用和reflog文件的修改时间，作为是否需要更新的依据"""
+        state = []
+        for name in ("HEAD", "packed-refs", os.path.join("logs", "HEAD")):
+            path = os.path.join(self.git_dir, name)
+            try:
+                st = os.stat(path)
+                state.append([name, st.st_mtime_ns, st.st_size])
+            except OSError:
+                pass
+        for top in ("refs", os.path.join("logs", "refs")):
+            for root, _, files in os.walk(os.path.join(self.git_dir, top)):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    state.append([os.path.relpath(path, self.git_dir), st.st_mtime_ns, st.st_size])
+        state.sort()
+        return state
+
+    def git(self, *args, input=None):
+        result = subprocess.run(
+            ["git"] + list(args),
+            cwd=self.repo_path,
+            input=input,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def refresh(self):
+        """引用有变化时增量更新索引，返回是否发生了更新"""
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            state = self.read_state()
+            if state == self.state:
+                return False
+            self.update(state)
+            return True
+
+    def is_ready(self):
+        """索引是否已加载且包含提交，不会为此读取磁盘"""
+        return self.loaded and bool(self.parents)
+
+    def update(self, state):
+        """重新读取引用，并把新引用可达的提交加入索引"""
+        # 读取所有引用的指向和上游
+        refs = {}
+        upstreams = {}
+        output = self.git("for-each-ref", "--format=%(objectname) %(refname) %(upstream)")
+        for line in output.splitlines():
+            parts = line.split(" ")
+            if len(parts) < 2:
+                continue
+            refs[parts[1]] = parts[0]
+            if len(parts) > 2 and parts[2]:
+                upstreams[parts[1]] = parts[2]
+        head = self.git("symbolic-ref", "-q", "HEAD").strip() if self.is_symbolic_head() else None
+        if head is None:
+            head = self.git("rev-parse", "HEAD").strip()
+            refs["HEAD"] = head
+
+        # 只遍历新引用可达、旧引用不可达的提交
+        new_tips = {sha for sha in refs.values() if sha not in self.parents}
+        if new_tips:
+            known_tips = {sha for sha in self.refs.values() if sha in self.parents}
+            stdin = "\n".join(list(new_tips) + ["^" + sha for sha in known_tips]) + "\n"
+            output = self.git("rev-list", "--topo-order", "--reverse", "--parents", "--stdin",
+                              input=stdin.encode("utf-8"))
+            lines = []
+            for line in output.splitlines():
+                shas = line.split()
+                if not shas:
+                    continue
+                commit, parents = shas[0], tuple(shas[1:])
+                self.parents[commit] = parents
+                # 逆拓扑序保证父提交的世代号已经计算过
+                generation = 1 + max((self.generation.get(p, 0) for p in parents), default=0)
+                self.generation[commit] = generation
+                lines.append(f"{generation} {line}\n")
+            if lines or self.rewrite:
+                self.append_commits(lines)
+
+        self.refs = refs
+        self.upstreams = upstreams
+        self.head = head
+        self.state = state
+        self.save_refs()
+
+    def is_symbolic_head(self):
+        try:
+            with open(os.path.join(self.git_dir, "HEAD"), 'r', encoding='utf-8') as f:
+                return f.read().startswith("ref:")
+        except OSError:
+            return False
+
+    def branches(self):
+        """返回本地分支列表，元素为(分支名, 提交, 上游分支名)"""
+        result = []
+        for ref, sha in sorted(self.refs.items()):
+            if ref.startswith("refs/heads/"):
+                upstream = self.upstreams.get(ref)
+                result.append((ref[len("refs/heads/"):], sha, upstream))
+        return result
+
+    def ahead_behind(self, a, b):
+        """计算a相对b领先和落后的提交数
+
+        按世代号从大到小遍历，处理到某个提交时它的所有子提交都已处理，
+        标记不会再改变；当队列中只剩两边都可达的提交时即可停止。
+        """
+        if a == b:
+            return 0, 0
+        flags = {a: 1}
+        flags[b] = flags.get(b, 0) | 2
+        queue = []
+        queued = set()
+        pending = 0  # 队列中不是两边都可达的提交数
+
+        def push(commit):
+            nonlocal pending
+            queued.add(commit)
+            heapq.heappush(queue, (-self.generation.get(commit, 0), commit))
+            if flags[commit] != 3:
+                pending += 1
+
+        push(a)
+        push(b)
+        ahead = behind = 0
+        while queue and pending > 0:
+            _, commit = heapq.heappop(queue)
+            flag = flags[commit]
+            if flag != 3:
+                pending -= 1
+            if flag == 1:
+                ahead += 1
+            elif flag == 2:
+                behind += 1
+            for parent in self.parents.get(commit, ()):
+                old = flags.get(parent, 0)
+                new = old | flag
+                if new == old:
+                    continue
+                flags[parent] = new
+                if parent not in queued:
+                    push(parent)
+                elif new == 3:
+                    pending -= 1
+        return ahead, behind
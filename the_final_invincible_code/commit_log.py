@@ -0,0 +1,364 @@
+import os
+import heapq
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QListView, QStyledItemDelegate, QStyle, QLabel
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QPointF, QThread, pyqtSignal
+from PyQt5.QtGui import QPen, QColor, QFont, QPainter
+from style import Style
+
+# 每条记录的字段用\x1f分隔，记录之间用\x1e分隔
+LOG_FORMAT = "%H%x1f%P%x1f%an%x1f%at%x1f%D%x1f%s%x1e"
+FIELD_SEP = b"\x1f"
+RECORD_SEP = b"\x1e"
+
+# 一条提交：哈希、父提交、作者、时间戳、引用、标题、所在列、处理后的列状态
+Commit = namedtuple("Commit", ["hash", "parents", "author", "timestamp", "refs", "subject", "column", "lanes"])
+
+LANE_COLORS = ["#4ec9b0", "#569cd6", "#c586c0", "#ce9178", "#dcdcaa", "#9cdcfe", "#d16969", "#b5cea8"]
+
+
+def split_records(data):
+    """把 git log 的输出拆分为记录，丢弃最后一个分隔符之后的内容"""
+    return [record.lstrip(b"\n") for record in data.split(RECORD_SEP)[:-1]]
+
+
+class CommitLogReader(QThread):
+    """在工作线程中按页读取提交记录
+
+    提交图索引已建立时，按世代号从大到小遍历索引得到每一页的提交，
+    世代号保证父提交总在所有子提交之后，再用 git log --no-walk 读取这一页的信息。
+    只需要读取的页数与遍历的提交数成正比，与历史深度无关。
+    索引尚未加载或建立时直接流式读取 git log --all 的默认顺序，第一页同样很快出现，
+    少数时钟错乱的父提交会早于子提交出现，由模型处理。
+    每读完一页通过records_loaded交给UI线程，然后等待下一次request_page。
+    """
+
+    records_loaded = pyqtSignal(list, bool)  # 一页记录, 是否已全部读完
+
+    def __init__(self, repo_path, index, page_size, parent=None):
+        super().__init__(parent)
+        self.repo_path = repo_path
+        self.index = index
+        self.page_size = page_size
+        self.process = None
+        self._cancelled = False
+        self._requests = threading.Semaphore(0)
+
+    def request_page(self):
+        self._requests.release()
+
+    def cancel(self):
+        self._cancelled = True
+        # 结束进程以唤醒阻塞在读取上的工作线程
+        process = self.process
+        if process and process.poll() is None:
+            process.kill()
+        self._requests.release()
+
+    def wait_request(self):
+        """等待下一次请求，已取消时返回False"""
+        self._requests.acquire()
+        return not self._cancelled
+
+    def run(self):
+        try:
+            if self.index is not None and self.index.is_ready():
+                self.index.refresh()
+                self.read_by_generation()
+            else:
+                self.read_stream()
+        except (OSError, subprocess.CalledProcessError):
+            if not self._cancelled:
+                self.records_loaded.emit([], True)
+
+    def read_by_generation(self):
+        index = self.index
+        with index.lock:
+            tips = {sha for sha in index.refs.values() if sha}
+            queue = [(-index.generation.get(sha, 0), sha) for sha in tips]
+        heapq.heapify(queue)
+        seen = set(tips)
+        while queue:
+            if not self.wait_request():
+                return
+            shas = []
+            with index.lock:
+                while queue and len(shas) < self.page_size:
+                    _, sha = heapq.heappop(queue)
+                    shas.append(sha)
+                    for parent in index.parents.get(sha, ()):
+                        if parent not in seen:
+                            seen.add(parent)
+                            heapq.heappush(queue, (-index.generation.get(parent, 0), parent))
+            records = self.read_details(shas)
+            if self._cancelled:
+                return
+            self.records_loaded.emit(records, not queue)
+
+    def read_details(self, shas):
+        """按给定顺序读取一页提交的信息"""
+        self.process = subprocess.Popen(
+            ["git", "log", "--no-walk=unsorted", "--stdin", f"--format={LOG_FORMAT}"],
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.PIPE,
+        )
+        output, _ = self.process.communicate("\n".join(shas).encode("ascii") + b"\n")
+        return split_records(output)
+
+    def read_stream(self):
+        # 不指定排序方式时 git 边遍历边输出，不需要先遍历整个历史
+        self.process = subprocess.Popen(
+            ["git", "log", "--all", f"--format={LOG_FORMAT}"],
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+        )
+        buffer = b""
+        try:
+            while self.wait_request():
+                records = []
+                while len(records) < self.page_size:
+                    index = buffer.find(RECORD_SEP)
+                    if index >= 0:
+                        records.append(buffer[:index].lstrip(b"\n"))
+                        buffer = buffer[index + 1:]
+                        continue
+                    chunk = self.process.stdout.read1(65536)
+                    if not chunk:
+                        break
+                    buffer += chunk
+                if self._cancelled:
+                    break
+                finished = len(records) < self.page_size
+                self.records_loaded.emit(records, finished)
+                if finished:
+                    break
+        finally:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.stdout.close()
+            self.process.wait()
+
+
+class CommitLogModel(QAbstractListModel):
+    """按需分页加载的提交历史模型
+
+    提交在工作线程中读取，视图滚动到底部时 fetchMore 请求下一页，
+    读取完成后再插入行，UI线程从不等待 git 的输出。
+    因此打开任意深度的历史都只需要读取第一页。图形的列在插入时增量计算。
+    """
+
+    PAGE_SIZE = 200
+    CommitRole = Qt.UserRole + 1
+
+    page_loaded = pyqtSignal()
+
+    def __init__(self, repo_path, index=None, parent=None):
+        super().__init__(parent)
+        self.repo_path = repo_path
+        self.commits = []
+        self.lanes = ()  # 当前等待出现的提交，每列一个
+        self.shown = set()  # 已经加入图中的提交
+        self.fetching = False
+        self.finished = False
+        self.reader = CommitLogReader(repo_path, index, self.PAGE_SIZE, self)
+        self.reader.records_loaded.connect(self.on_records_loaded)
+        self.reader.start()
+
+    def close(self):
+        """结束 git log 进程和读取线程"""
+        self.finished = True
+        if self.reader:
+            self.reader.cancel()
+            self.reader.wait()
+            self.reader = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.commits)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.finished
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.finished or self.fetching:
+            return
+        self.fetching = True
+        self.reader.request_page()
+
+    def on_records_loaded(self, records, finished):
+        """工作线程读完一页后在UI线程中插入"""
+        if self.finished:
+            return
+        self.fetching = False
+        self.finished = finished
+        if records:
+            commits = [self.layout_commit(record) for record in records]
+            first = len(self.commits)
+            self.beginInsertRows(QModelIndex(), first, first + len(commits) - 1)
+            self.commits.extend(commits)
+            self.endInsertRows()
+        self.page_loaded.emit()
+
+    def layout_commit(self, record):
+        """解析一条记录并计算它在图中的列"""
+        fields = record.decode("utf-8", errors="replace").split("\x1f")
+        commit_hash, parents, author, timestamp, refs, subject = (fields + [""] * 6)[:6]
+        parents = tuple(parents.split()) if parents else ()
+        self.shown.add(commit_hash)
+
+        lanes = list(self.lanes)
+        if commit_hash in lanes:
+            column = lanes.index(commit_hash)
+        elif None in lanes:
+            column = lanes.index(None)
+        else:
+            column = len(lanes)
+            lanes.append(None)
+
+        # 其他等待同一提交的列在这里汇合
+        lanes = [None if lane == commit_hash else lane for lane in lanes]
+        # 时钟错乱时父提交可能已经出现在上方，不再为它保留列，这条边不画
+        waiting = [parent for parent in parents if parent not in self.shown]
+        if waiting:
+            lanes[column] = waiting[0]
+            for parent in waiting[1:]:
+                if parent in lanes:
+                    continue
+                if None in lanes:
+                    lanes[lanes.index(None)] = parent
+                else:
+                    lanes.append(parent)
+        # 去掉末尾的空列
+        while lanes and lanes[-1] is None:
+            lanes.pop()
+
+        self.lanes = tuple(lanes)
+        return Commit(commit_hash, parents, author, int(timestamp or 0), refs, subject, column, self.lanes)
+
+    def lanes_before(self, row):
+        """返回某一行上方的列状态"""
+        return self.commits[row - 1].lanes if row > 0 else ()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.commits):
+            return None
+        commit = self.commits[index.row()]
+        if role == Qt.DisplayRole:
+            refs = f"({commit.refs}) " if commit.refs else ""
+            return f"{commit.hash[:7]} {refs}{commit.subject}"
+        if role == Qt.ToolTipRole:
+            date = time.strftime("%Y-%m-%d %H:%M", time.localtime(commit.timestamp))
+            return f"{commit.hash}\n{commit.author}  {date}\n\n{commit.subject}"
+        if role == self.CommitRole:
+            return commit
+        return None
+
+
+class CommitGraphDelegate(QStyledItemDelegate):
+    """绘制提交图和提交信息，只有可见的行才会被绘制"""
+
+    LANE_WIDTH = 14
+    ROW_HEIGHT = 22
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def lane_x(self, rect, column):
+        return rect.left() + self.LANE_WIDTH * column + self.LANE_WIDTH / 2
+
+    def lane_pen(self, column):
+        return QPen(QColor(LANE_COLORS[column % len(LANE_COLORS)]), 2)
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        commit = model.data(index, CommitLogModel.CommitRole)
+        if commit is None:
+            return super().paint(painter, option, index)
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, QColor(Style.SELECTION_BG))
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        rect = option.rect
+        top, bottom = rect.top(), rect.bottom() + 1
+        middle = rect.center().y()
+        lanes_in = model.lanes_before(index.row())
+        lanes_out = commit.lanes
+        node_x = self.lane_x(rect, commit.column)
+
+        # 上半部分：进入本行的列，等待本提交的列汇合到节点
+        for column, lane in enumerate(lanes_in):
+            if lane is None:
+                continue
+            painter.setPen(self.lane_pen(column))
+            if lane == commit.hash:
+                painter.drawLine(QPointF(self.lane_x(rect, column), top), QPointF(node_x, middle))
+            elif lane in lanes_out:
+                target = lanes_out.index(lane)
+                painter.drawLine(QPointF(self.lane_x(rect, column), top),
+                                 QPointF(self.lane_x(rect, target), bottom))
+
+        # 下半部分：从节点连到各个父提交所在的列
+        for parent in commit.parents:
+            if parent in lanes_out:
+                target = lanes_out.index(parent)
+                painter.setPen(self.lane_pen(target))
+                painter.drawLine(QPointF(node_x, middle), QPointF(self.lane_x(rect, target), bottom))
+
+        # 提交节点
+        painter.setPen(QPen(QColor(Style.TEXT_COLOR), 1))
+        painter.setBrush(QColor(LANE_COLORS[commit.column % len(LANE_COLORS)]))
+        painter.drawEllipse(QPointF(node_x, middle), 4, 4)
+
+        # 提交信息
+        width = max(len(lanes_in), len(lanes_out), commit.column + 1)
+        text_rect = rect.adjusted(int(self.LANE_WIDTH * width) + 6, 0, 0, 0)
+        painter.setPen(QColor(Style.TEXT_COLOR))
+        text = index.data(Qt.DisplayRole)
+        painter.drawText(text_rect, Qt.AlignVCenter | Qt.AlignLeft,
+                         option.fontMetrics.elidedText(text, Qt.ElideRight, text_rect.width()))
+        painter.restore()
+
+
+class CommitLogDialog(QDialog):
+    """提交历史窗口"""
+
+    def __init__(self, repo_path, index=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"提交日志 - {os.path.basename(repo_path)}")
+        self.resize(800, 600)
+        self.setStyleSheet(f"background-color: {Style.EDITOR_BG}; color: {Style.TEXT_COLOR};")
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        self.model = CommitLogModel(repo_path, index, self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(CommitGraphDelegate(self.view))
+        # 固定行高，视图只需计算可见的行
+        self.view.setUniformItemSizes(True)
+        self.view.setFont(QFont(Style.CODE_FONT_FAMILY.split(',')[0].strip(), Style.CODE_FONT_SIZE))
+        layout.addWidget(self.view)
+
+        self.count_label = QLabel()
+        self.count_label.setStyleSheet(f"color: {Style.INACTIVE_TEXT};")
+        layout.addWidget(self.count_label)
+        self.model.page_loaded.connect(self.update_count)
+
+    def update_count(self):
+        suffix = "" if self.model.finished else "+"
+        self.count_label.setText(f"已加载 {self.model.rowCount()}{suffix} 个提交")
+
+    def done(self, result):
+        self.model.close()
+        super().done(result)
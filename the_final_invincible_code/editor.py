@@ -1,11 +1,28 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QPlainTextEdit, QLabel
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont, QColor, QTextOption
+import os
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QLabel, QProgressBar, QPushButton, QFileDialog
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QFont, QColor, QTextOption, QTextCursor
 from style import Style
+from file_loader import FileLoader
+from large_file_viewer import LargeFileViewer
 
 class Editor(QWidget):
+    # 定义信号
+    status_message = pyqtSignal(str)  # 需要在状态栏显示的信息
+    file_saved = pyqtSignal(str)  # 保存后的文件路径
+    
+    # 超过该大小的文件使用只读的大文件查看器打开
+    LARGE_FILE_THRESHOLD = 100 * 1024 * 1024
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.file_path = None
+        self.encoding = "utf-8"
+        self.newline = None  # 保存时使用的换行符，None表示系统默认
+        self.loader = None
+        self.viewer = None
+        self.pending_line = None
+        self.journal = None  # 自动保存日志，由应用设置
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.layout.setSpacing(0)
@@ -34,17 +51,221 @@ class Editor(QWidget):
         self.text_edit.setWordWrapMode(QTextOption.NoWrap)
         self.text_edit.setTabStopWidth(4 * self.text_edit.fontMetrics().width(' '))
         
+        # 创建加载进度条，仅在加载文件时显示
+        self.load_bar = QWidget()
+        load_layout = QHBoxLayout(self.load_bar)
+        load_layout.setContentsMargins(5, 2, 5, 2)
+        self.load_progress = QProgressBar()
+        self.load_progress.setFixedHeight(12)
+        self.load_progress.setTextVisible(False)
+        self.load_cancel_button = QPushButton("取消")
+        self.load_cancel_button.clicked.connect(self.cancel_loading)
+        load_layout.addWidget(self.load_progress)
+        load_layout.addWidget(self.load_cancel_button)
+        self.load_bar.setVisible(False)
+        
         # 添加到布局
+        self.layout.addWidget(self.load_bar)
         self.layout.addWidget(self.text_edit)
         
         # 设置初始内容
         self.text_edit.setPlainText("")
+        self.text_edit.document().contentsChange.connect(self.on_contents_change)
         
     def set_content(self, content):
         self.text_edit.setPlainText(content)
         
     def get_content(self):
         return self.text_edit.toPlainText()
+    
+    def set_journal(self, journal):
+        self.journal = journal
+    
+    def on_contents_change(self, position, removed, added):
+        """把编辑操作写入自动保存日志，加载文件时的插入不记录"""
+        if self.journal is None or self.text_edit.isReadOnly():
+            return
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.setPosition(position)
+        cursor.setPosition(position + added, QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        record = {"op": "edit", "pos": position, "removed": removed, "text": text}
+        self.journal.log(record, lambda: {"text": self.get_content()}, self.file_path)
+    
+    def restore_from_journal(self, recovery):
+        """从快照和之后的编辑记录恢复未保存的内容
+
+        记录中的位置来自contentsChange，以文档的UTF-16单位计算，
+        因此在文档中用QTextCursor重放，而不是切片Python字符串。
+        """
+        self.file_path = recovery.get("file_path")
+        journal = self.journal
+        self.journal = None
+        self.set_content(recovery["data"]["text"])
+        document = self.text_edit.document()
+        document.setUndoRedoEnabled(False)
+        cursor = QTextCursor(document)
+        for record in recovery["records"]:
+            try:
+                pos = record["pos"]
+                end = pos + record["removed"]
+                if pos < 0 or end >= document.characterCount():
+                    break
+                cursor.setPosition(pos)
+                cursor.setPosition(end, QTextCursor.KeepAnchor)
+                cursor.insertText(record["text"])
+            except (KeyError, TypeError):
+                break
+        document.setUndoRedoEnabled(True)
+        self.journal = journal
+        if self.journal:
+            self.journal.compact({"text": self.get_content()}, self.file_path)
+    
+    def save_file(self):
+        """保存到原文件，新文档先选择保存位置"""
+        if self.viewer:
+            return
+        file_path = self.file_path
+        if not file_path:
+            file_path, _ = QFileDialog.getSaveFileName(self, "保存文件")
+            if not file_path:
+                return
+        try:
+            with open(file_path, 'w', encoding=self.encoding, newline=self.newline) as f:
+                f.write(self.get_content())
+        except (OSError, UnicodeError) as e:
+            self.status_message.emit(f"保存失败: {e}")
+            return
+        self.file_path = file_path
+        if self.journal:
+            self.journal.reset()
+        self.status_message.emit(f"已保存 {os.path.basename(file_path)}")
+        self.file_saved.emit(file_path)
+    
+    def load_file(self, file_path):
+        """在后台分块加载文件，加载过程中编辑器为只读"""
+        try:
+            large = os.path.getsize(file_path) > self.LARGE_FILE_THRESHOLD and LargeFileViewer.supports(file_path)
+        except OSError as e:
+            self.status_message.emit(f"打开文件失败: {e}")
+            return
+        self.cancel_loading()
+        self.close_viewer()
+        self.file_path = file_path
+        self.newline = None
+        
+        if large:
+            self.open_viewer(file_path)
+            return
+        
+        # 重新加载后内容与文件一致，不再需要恢复
+        if self.journal:
+            self.journal.reset()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.clear()
+        # 加载过程不需要撤销记录
+        self.text_edit.document().setUndoRedoEnabled(False)
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setValue(0)
+        self.load_bar.setVisible(True)
+        
+        self.loader = FileLoader(file_path, self)
+        self.loader.chunk_loaded.connect(self.append_chunk)
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.encoding_detected.connect(self.on_encoding_detected)
+        self.loader.load_finished.connect(self.on_load_finished)
+        self.loader.load_failed.connect(self.on_load_failed)
+        self.loader.finished.connect(self.loader.deleteLater)
+        self.loader.start()
+    
+    def open_viewer(self, file_path):
+        """用内存映射的只读查看器代替文本编辑器"""
+        self.viewer = LargeFileViewer(file_path)
+        self.viewer.status_message.connect(self.status_message)
+        self.encoding = self.viewer.encoding
+        self.text_edit.setVisible(False)
+        self.layout.addWidget(self.viewer)
+        self.viewer.setFocus()
+    
+    def close_viewer(self):
+        if self.viewer:
+            self.viewer.hide()
+            self.viewer.close_file()
+            self.layout.removeWidget(self.viewer)
+            self.viewer.deleteLater()
+            self.viewer = None
+            self.text_edit.setVisible(True)
+    
+    def close_document(self):
+        """关闭标签页或退出时停止后台加载并释放大文件"""
+        self.cancel_loading()
+        self.close_viewer()
+    
+    def append_chunk(self, text):
+        """把一块文本追加到文档末尾"""
+        loader = self.sender()
+        if loader is not self.loader:
+            # 已取消的加载仍可能有排队的块，直接丢弃
+            return
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        loader.chunk_consumed()
+    
+    def on_encoding_detected(self, encoding):
+        self.encoding = encoding
+    
+    def on_load_progress(self, loaded, total):
+        if self.sender() is not self.loader:
+            return
+        percent = int(loaded * 100 / total) if total else 100
+        self.load_progress.setValue(percent)
+        self.status_message.emit(f"正在加载 {os.path.basename(self.file_path)}: {percent}%")
+    
+    def on_load_finished(self):
+        if self.sender() is not self.loader:
+            return
+        self.newline = self.loader.newline
+        self.end_loading()
+        self.text_edit.moveCursor(QTextCursor.Start)
+        if self.pending_line is not None:
+            self.goto_line(self.pending_line)
+        self.status_message.emit(f"已打开 {os.path.basename(self.file_path)} ({self.encoding})")
+    
+    def on_load_failed(self, message):
+        self.end_loading()
+        self.status_message.emit(f"打开文件失败: {message}")
+    
+    def goto_line(self, line):
+        """跳转到第line行（从0开始），文件仍在加载时在加载完成后跳转"""
+        if self.viewer:
+            self.viewer.goto_line(line)
+            return
+        if self.loader:
+            self.pending_line = line
+            return
+        self.pending_line = None
+        block = self.text_edit.document().findBlockByNumber(line)
+        if block.isValid():
+            cursor = QTextCursor(block)
+            self.text_edit.setTextCursor(cursor)
+            self.text_edit.centerCursor()
+        self.text_edit.setFocus()
+    
+    def cancel_loading(self):
+        """取消正在进行的加载，已加载的内容保留"""
+        if self.loader and self.loader.isRunning():
+            self.loader.cancel()
+            self.loader.wait()
+            self.newline = self.loader.newline
+            self.end_loading()
+            self.status_message.emit(f"已取消加载 {os.path.basename(self.file_path)}")
+    
+    def end_loading(self):
+        self.load_bar.setVisible(False)
+        self.text_edit.setReadOnly(False)
+        self.text_edit.document().setUndoRedoEnabled(True)
+        self.loader = None
 
 class WelcomeWidget(QWidget):
     def __init__(self, parent=None):
@@ -0,0 +1,111 @@
+import io
+import os
+import codecs
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# 文件开头的字节序标记
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def detect_encoding(block):
+    """根据文件的第一块数据推测编码"""
+    for bom, encoding in BOMS:
+        if block.startswith(bom):
+            return encoding
+    try:
+        block.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 块末尾被截断的多字节字符不算错误
+        if e.start >= len(block) - 3 and e.reason == "unexpected end of data":
+            return "utf-8"
+    try:
+        block.decode("gb18030")
+        return "gb18030"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+class FileLoader(QThread):
+    """在工作线程中分块读取文件并解码
+
+    每块解码后的文本通过chunk_loaded信号交给UI线程追加到文档中。
+    UI线程处理完一块后调用chunk_consumed，未处理的块数超过上限时工作线程会等待，
+    避免读取速度超过界面时在信号队列中堆积整个文件。
+    """
+
+    chunk_loaded = pyqtSignal(str)
+    progress = pyqtSignal(int, int)  # 已读取字节数, 总字节数
+    encoding_detected = pyqtSignal(str)
+    load_finished = pyqtSignal()
+    load_failed = pyqtSignal(str)
+
+    CHUNK_SIZE = 1024 * 1024
+    MAX_PENDING_CHUNKS = 4
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.encoding = None
+        self.newline = None  # 文件使用的换行符，没有换行时为None
+        self._cancelled = False
+        self._pending = threading.Semaphore(self.MAX_PENDING_CHUNKS)
+
+    def cancel(self):
+        self._cancelled = True
+        # 唤醒可能正在等待的工作线程
+        self._pending.release()
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def chunk_consumed(self):
+        """UI线程追加完一块后调用"""
+        self._pending.release()
+
+    @staticmethod
+    def detect_newline(newlines):
+        """把解码器记录的换行符换算成保存时使用的换行符，混合换行时按\\r\\n保存"""
+        if isinstance(newlines, tuple):
+            return "\r\n" if "\r\n" in newlines else "\n"
+        return newlines
+
+    def run(self):
+        try:
+            total = os.path.getsize(self.file_path)
+            loaded = 0
+            decoder = None
+            with open(self.file_path, 'rb') as f:
+                while not self._cancelled:
+                    block = f.read(self.CHUNK_SIZE)
+                    if decoder is None:
+                        self.encoding = detect_encoding(block)
+                        self.encoding_detected.emit(self.encoding)
+                        # 与文本模式打开文件一样，把\r\n和\r统一为\n
+                        decoder = io.IncrementalNewlineDecoder(
+                            codecs.getincrementaldecoder(self.encoding)(errors="replace"), translate=True)
+                    final = not block
+                    text = decoder.decode(block, final=final)
+                    self.newline = self.detect_newline(decoder.newlines)
+                    loaded += len(block)
+                    if text:
+                        self._pending.acquire()
+                        if self._cancelled:
+                            break
+                        self.chunk_loaded.emit(text)
+                    self.progress.emit(loaded, total)
+                    if final:
+                        break
+        except Exception as e:
+            self.load_failed.emit(str(e))
+            return
+
+        if not self._cancelled:
+            self.load_finished.emit()
@@ -1,10 +1,69 @@
-from PyQt5.QtWidgets import QFileSystemModel, QTreeView, QVBoxLayout, QWidget, QLineEdit, QPushButton, QHBoxLayout, QLabel
-from PyQt5.QtCore import QDir, Qt, QModelIndex
-from PyQt5.QtGui import QIcon, QFont
+from PyQt5.QtWidgets import QTreeView, QVBoxLayout, QWidget, QLineEdit, QPushButton, QHBoxLayout, QLabel, QStyledItemDelegate, QStyleOptionViewItem, QMenu
+from PyQt5.QtCore import QDir, Qt, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QIcon, QFont, QColor, QPalette
 import os
 from style import Style
+from file_tree import WorkspaceModel, IgnoreFilterProxyModel
+from git_status import StatusSnapshot, STAGED, MODIFIED, UNTRACKED, CONFLICTED
+
+# 状态标记的优先级、文字和颜色
+STATUS_MARKS = [
+    (CONFLICTED, "!", Style.ERROR_COLOR),
+    (MODIFIED, "M", Style.WARNING_COLOR),
+    (STAGED, "A", Style.SUCCESS_COLOR),
+    (UNTRACKED, "U", Style.INFO_COLOR),
+]
+
+
+class StatusDecorationDelegate(QStyledItemDelegate):
+    """在文件树中绘制Git状态标记
+
+    状态来自GitManager发布的快照，每行只做一次字典查找，不会调用git。
+    文件显示状态字母，目录只用颜色表示其下有变化；被忽略的路径变暗显示。
+    """
+
+    def __init__(self, explorer, parent=None):
+        super().__init__(parent)
+        self.explorer = explorer
+        self.snapshot = StatusSnapshot()
+        self.marks = [(flag, text, QColor(color)) for flag, text, color in STATUS_MARKS]
+        self.ignored_color = QColor(Style.INACTIVE_TEXT)
+        self.ignored_color.setAlpha(150)
+
+    def mark_for(self, flags):
+        for flag, text, color in self.marks:
+            if flags & flag:
+                return text, color
+        return None, None
+
+    def paint(self, painter, option, index):
+        node = self.explorer.model.node(self.explorer.proxy_model.mapToSource(index))
+        flags = self.snapshot.flags(node.path(), node.is_dir) if self.snapshot.root else 0
+        text, color = self.mark_for(flags)
+        if color is None and not self.explorer.proxy_model.hide_ignored and self.explorer.proxy_model.is_ignored(node):
+            color = self.ignored_color
+        if color is None:
+            super().paint(painter, option, index)
+            return
+
+        # 视图在各行之间复用同一个option，修改前先复制
+        option = QStyleOptionViewItem(option)
+        option.palette.setColor(QPalette.Text, color)
+        option.palette.setColor(QPalette.HighlightedText, color)
+        super().paint(painter, option, index)
+        if text and not node.is_dir:
+            painter.save()
+            painter.setPen(color)
+            rect = option.rect.adjusted(0, 0, -8, 0)
+            painter.drawText(rect, Qt.AlignRight | Qt.AlignVCenter, text)
+            painter.restore()
+
 
 class FileExplorer(QWidget):
+    # 定义信号
+    root_path_changed = pyqtSignal(str)  # 根目录
+    search_requested = pyqtSignal(str)  # 搜索内容
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
@@ -54,14 +113,24 @@ class FileExplorer(QWidget):
         self.search_layout.addWidget(self.search_input)
         self.search_layout.addWidget(self.search_button)
         
-        # 创建文件系统模型
-        self.model = QFileSystemModel()
+        # 创建文件系统模型，目录展开时才分批读取
+        self.model = WorkspaceModel(self)
         self.model.setRootPath(QDir.currentPath())
         
+        # 隐藏 .gitignore 中忽略的路径
+        self.proxy_model = IgnoreFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.set_root_path(QDir.currentPath())
+        
         # 创建树状视图
         self.tree_view = QTreeView()
-        self.tree_view.setModel(self.model)
-        self.tree_view.setRootIndex(self.model.index(QDir.currentPath()))
+        self.tree_view.setModel(self.proxy_model)
+        self.tree_view.setUniformRowHeights(True)
+        
+        # 绘制Git状态标记
+        self.status_delegate = StatusDecorationDelegate(self, self.tree_view)
+        self.tree_view.setItemDelegate(self.status_delegate)
+        self.tree_view.setContextMenuPolicy(Qt.CustomContextMenu)
         
         # 设置树状视图样式
         self.tree_view.setStyleSheet(f"""
@@ -95,8 +164,6 @@ class FileExplorer(QWidget):
         
         # 只显示文件名
         self.tree_view.setHeaderHidden(True)
-        for i in range(1, 4):
-            self.tree_view.hideColumn(i)
         
         # 设置字体
         font = QFont()
@@ -111,16 +178,57 @@ class FileExplorer(QWidget):
         
         # 连接信号
         self.tree_view.doubleClicked.connect(self.on_file_double_clicked)
+        self.tree_view.customContextMenuRequested.connect(self.show_context_menu)
+        self.search_button.clicked.connect(self.on_search)
+        self.search_input.returnPressed.connect(self.on_search)
+        
+    def file_path(self, index):
+        """返回树状视图中某一项的文件路径"""
+        return self.model.filePath(self.proxy_model.mapToSource(index))
         
     def on_file_double_clicked(self, index):
         # 获取文件路径
-        file_path = self.model.filePath(index)
+        file_path = self.file_path(index)
         
         # 如果是文件，则发出信号
         if os.path.isfile(file_path):
             # 这里可以发出信号，通知主窗口打开文件
             print(f"打开文件: {file_path}")
             
+    def show_context_menu(self, pos):
+        menu = QMenu(self)
+        show_ignored_action = menu.addAction("显示忽略的文件")
+        show_ignored_action.setCheckable(True)
+        show_ignored_action.setChecked(not self.proxy_model.hide_ignored)
+        show_ignored_action.toggled.connect(lambda checked: self.proxy_model.set_hide_ignored(not checked))
+        menu.exec_(self.tree_view.viewport().mapToGlobal(pos))
+        
+    def set_status_snapshot(self, snapshot):
+        """替换Git状态快照并重绘"""
+        self.status_delegate.snapshot = snapshot
+        self.tree_view.viewport().update()
+        
+    def on_search(self):
+        # 在搜索标签中搜索输入的内容
+        text = self.search_input.text()
+        if text:
+            self.search_requested.emit(text)
+            
     def set_root_path(self, path):
         self.model.setRootPath(path)
-        self.tree_view.setRootIndex(self.model.index(path))
\ No newline at end of file
+        self.proxy_model.set_root_path(path)
+        self.root_path_changed.emit(path)
+        
+    def rules_may_change(self, path):
+        ignore = self.proxy_model.ignore
+        return ignore is not None and ignore.rule_file_changed(path)
+    
+    def refresh_paths(self, paths):
+        """重新读取发生变化的目录"""
+        dirs = {path if os.path.isdir(path) else os.path.dirname(path) for path in paths}
+        # .gitignore 本身的事件（包括删除），或目录的规则文件与缓存不一致时，规则才可能改变
+        rules_changed = any(os.path.basename(path) == ".gitignore" for path in paths)
+        if rules_changed or any(self.rules_may_change(path) for path in dirs):
+            self.proxy_model.refresh()
+        for path in dirs:
+            self.model.refresh_dir(path)
\ No newline at end of file
@@ -0,0 +1,275 @@
+import os
+from PyQt5.QtWidgets import QFileIconProvider
+from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QSortFilterProxyModel
+from gitignore import GitIgnore
+
+
+class FileNode:
+    """文件树中的一个节点，只保存名称和是否为目录，不做stat"""
+
+    __slots__ = ("name", "is_dir", "parent", "row", "children", "pending", "loaded")
+
+    def __init__(self, name, is_dir, parent=None, row=0):
+        self.name = name
+        self.is_dir = is_dir
+        self.parent = parent
+        self.row = row  # 在父节点children中的位置
+        self.children = []  # 已加入模型的子节点
+        self.pending = []  # 已读取但尚未加入模型的(名称, 是否为目录)
+        self.loaded = False
+
+    def path(self):
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        parts.append(node.name)
+        return os.path.join(*reversed(parts))
+
+    def renumber(self, start=0):
+        for row in range(start, len(self.children)):
+            self.children[row].row = row
+
+
+def list_dir(path):
+    """读取目录内容并排序，目录在前；只使用scandir返回的类型信息"""
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+    except OSError:
+        return []
+    entries.sort(key=lambda e: (not e[1], e[0].casefold()))
+    return entries
+
+
+class WorkspaceModel(QAbstractItemModel):
+    """按需加载的工作区文件模型
+
+    目录在展开时才读取，子项按BATCH_SIZE分批加入模型，视图滚动到底部时再加入下一批。
+    模型只有名称一列，不读取大小、类型和修改时间，也不按文件查询图标。
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        icons = QFileIconProvider()
+        self.folder_icon = icons.icon(QFileIconProvider.Folder)
+        self.file_icon = icons.icon(QFileIconProvider.File)
+
+    def setRootPath(self, path):
+        self.beginResetModel()
+        self.root = FileNode(os.path.abspath(path), True)
+        self.endResetModel()
+
+    def rootPath(self):
+        return self.root.name if self.root else ""
+
+    def node(self, index):
+        return index.internalPointer() if index.isValid() else self.root
+
+    def filePath(self, index):
+        node = self.node(index)
+        return node.path() if node else ""
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def index_of(self, node):
+        if node is self.root or node is None:
+            return QModelIndex()
+        siblings = node.parent.children
+        if node.row >= len(siblings) or siblings[node.row] is not node:
+            # 批量增删时行号在最后统一更新，期间按需重新编号
+            node.parent.renumber()
+        return self.createIndex(node.row, 0, node)
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        node = self.node(parent)
+        return len(node.children) if node else 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None or not node.is_dir:
+            return False
+        # 未读取的目录先显示展开箭头，展开时再确定
+        return not node.loaded or bool(node.children or node.pending)
+
+    def canFetchMore(self, parent):
+        node = self.node(parent)
+        return node is not None and node.is_dir and (not node.loaded or bool(node.pending))
+
+    def fetchMore(self, parent):
+        node = self.node(parent)
+        if node is None or not node.is_dir:
+            return
+        if not node.loaded:
+            node.loaded = True
+            node.pending = list_dir(node.path())
+            if not node.pending:
+                # 空目录不再显示展开箭头
+                self.dataChanged.emit(parent, parent)
+                return
+        batch = node.pending[:self.BATCH_SIZE]
+        del node.pending[:self.BATCH_SIZE]
+        first = len(node.children)
+        self.beginInsertRows(parent, first, first + len(batch) - 1)
+        node.children.extend(FileNode(name, is_dir, node, first + i) for i, (name, is_dir) in enumerate(batch))
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.name
+        if role == Qt.DecorationRole:
+            return self.folder_icon if node.is_dir else self.file_icon
+        if role == Qt.ToolTipRole:
+            return node.path()
+        return None
+
+    def find_node(self, path):
+        """返回已加载的路径对应的节点，未加载时返回None"""
+        rel = os.path.relpath(os.path.abspath(path), self.root.name)
+        if rel == ".":
+            return self.root
+        if rel.startswith(".."):
+            return None
+        node = self.root
+        for part in rel.split(os.sep):
+            node = next((child for child in node.children if child.name == part), None)
+            if node is None:
+                return None
+        return node
+
+    def refresh_dir(self, path):
+        """重新读取已加载的目录，只插入和删除发生变化的行"""
+        node = self.find_node(path) if self.root else None
+        if node is None or not node.is_dir or not node.loaded:
+            return
+        parent = self.index_of(node)
+        entries = list_dir(path)
+        current = set(entries)
+
+        # 删除已不存在的行，从后往前删除连续的区间，最后统一重新编号
+        row = len(node.children) - 1
+        first_changed = None
+        while row >= 0:
+            if (node.children[row].name, node.children[row].is_dir) in current:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and (node.children[row].name, node.children[row].is_dir) not in current:
+                row -= 1
+            self.beginRemoveRows(parent, row + 1, last)
+            del node.children[row + 1:last + 1]
+            self.endRemoveRows()
+            first_changed = row + 1
+        if first_changed is not None:
+            node.renumber(first_changed)
+
+        # 新的条目按排序位置插入已加载的部分，其余的留在待加载列表中
+        existing = {(child.name, child.is_dir) for child in node.children}
+        key = lambda e: (not e[1], e[0].casefold())
+        node.pending = []
+        last_key = key((node.children[-1].name, node.children[-1].is_dir)) if node.children else None
+        runs = []  # (起始行, 条目列表)，相邻的新条目一次插入
+        row = 0
+        for entry in entries:
+            if entry in existing:
+                row += 1
+                continue
+            if last_key is not None and key(entry) < last_key:
+                if runs and runs[-1][0] + len(runs[-1][1]) == row:
+                    runs[-1][1].append(entry)
+                else:
+                    runs.append((row, [entry]))
+                row += 1
+            else:
+                node.pending.append(entry)
+        for start, batch in runs:
+            self.beginInsertRows(parent, start, start + len(batch) - 1)
+            node.children[start:start] = [FileNode(name, is_dir, node, start + i)
+                                          for i, (name, is_dir) in enumerate(batch)]
+            self.endInsertRows()
+        if runs:
+            node.renumber(runs[0][0])
+        if not node.children and node.pending:
+            self.fetchMore(parent)
+
+
+class IgnoreFilterProxyModel(QSortFilterProxyModel):
+    """隐藏 .gitignore 中忽略的文件和目录
+
+    被忽略的目录不会显示，也就不会被展开和读取。
+    过滤结果依赖GitIgnore中的缓存，规则文件变化后调用refresh重新过滤。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ignore = None
+        self.hide_ignored = True
+        self.ignored_cache = {}  # 节点 -> 是否被忽略，绘制时直接查表
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.rowsAboutToBeRemoved.connect(self.prune_cache)
+        model.modelAboutToBeReset.connect(lambda: self.ignored_cache.clear())
+
+    def prune_cache(self, parent, first, last):
+        """删除的节点及其已加载的子节点不再保留在缓存中"""
+        if not self.ignored_cache:
+            return
+        stack = self.sourceModel().node(parent).children[first:last + 1]
+        while stack:
+            node = stack.pop()
+            self.ignored_cache.pop(node, None)
+            stack.extend(node.children)
+
+    def set_root_path(self, path):
+        self.ignore = GitIgnore(path)
+        self.ignored_cache = {}
+        self.invalidateFilter()
+
+    def refresh(self):
+        if self.ignore:
+            self.ignore.invalidate()
+        self.ignored_cache = {}
+        self.invalidateFilter()
+
+    def set_hide_ignored(self, hide):
+        self.hide_ignored = hide
+        self.invalidateFilter()
+
+    def is_ignored(self, node):
+        ignored = self.ignored_cache.get(node)
+        if ignored is None:
+            ignored = self.ignore is not None and self.ignore.is_ignored(node.path(), node.is_dir)
+            self.ignored_cache[node] = ignored
+        return ignored
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.hide_ignored or self.ignore is None:
+            return True
+        model = self.sourceModel()
+        return not self.is_ignored(model.node(source_parent).children[source_row])
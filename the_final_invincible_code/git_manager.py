@@ -1,27 +1,58 @@
 import os
 import git
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTextEdit, QComboBox, QListWidget, QListWidgetItem, QSplitter, QToolBar, QAction, QStatusBar, QMessageBox, QDialog, QLineEdit, QProgressBar
-from PyQt5.QtCore import Qt, pyqtSignal, QProcess, QTimer
-from PyQt5.QtGui import QIcon, QColor, QMovie, QFont
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTextEdit, QComboBox, QListView, QSplitter, QToolBar, QAction, QStatusBar, QMessageBox, QDialog, QLineEdit, QProgressBar
+from PyQt5.QtCore import Qt, pyqtSignal, QProcess, QTimer, QThreadPool
+from PyQt5.QtGui import QIcon, QMovie, QFont
 import time
 from style import Style
+from git_worker import GitJob
+from git_status import StatusTable, StatusSnapshot, read_status
+from status_model import StatusListModel
+from commit_log import CommitLogDialog
+from commit_index import CommitIndex
+from repo_cache import RepoCache
 
 class GitManager(QWidget):
     """Git管理器，用于执行Git命令并显示结果"""
     
     # 定义信号
     git_command_executed = pyqtSignal(str, str)  # 命令, 结果
+    status_snapshot_changed = pyqtSignal(object)  # StatusSnapshot
     
-    def __init__(self, parent=None):
+    def __init__(self, repo_watcher, parent=None):
         super().__init__(parent)
         self.current_repo_path = None
         self.is_loading = False
+        # 最近一次刷新得到的状态快照，刷新完成后整体替换
+        self.status_snapshot = StatusSnapshot()
+        
+        # Git任务线程池，串行执行以避免并发修改索引。
+        # 工作线程不过期，它缓存的Repo可以一直复用
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.thread_pool.setExpiryTimeout(-1)
+        self.jobs = []
+        
+        # 按路径和线程缓存的Repo对象，避免每次操作重新创建
+        self.repo_cache = RepoCache()
+        # 切换仓库后等待任务全部结束再关闭的旧仓库路径
+        self.stale_repo_paths = set()
+        # 按.git目录缓存的提交图和引用索引，在UI线程中获取，在工作线程中刷新和读取
+        self.commit_indexes = {}
+        
         self.init_ui()
         
-        # 初始化定时器，每30秒自动刷新状态
+        # 监视仓库文件变化，有变化时刷新状态。监视器与搜索面板共用，
+        # 工作区目录由搜索面板设置，这里只负责.git目录
+        self.last_refresh_time = 0
+        self.repo_watcher = repo_watcher
+        self.repo_watcher.changed.connect(self.on_repo_changed)
+        
+        # 初始化定时器，作为文件监视的兜底，每30秒检查一次
+        self.refresh_interval = 30
         self.refresh_timer = QTimer(self)
         self.refresh_timer.timeout.connect(self.auto_refresh_status)
-        self.refresh_timer.start(30000)  # 30秒刷新一次
+        self.refresh_timer.start(self.refresh_interval * 1000)
         
     def init_ui(self):
         # 创建主布局
@@ -92,23 +123,28 @@ class GitManager(QWidget):
         self.status_label.setFont(font)
         self.status_label.setStyleSheet(f"color: {Style.INACTIVE_TEXT}; font-weight: bold; padding: 2px;")
         
-        self.status_list = QListWidget()
+        # 状态列表使用模型，刷新时只更新变化的行
+        self.status_model = StatusListModel(self)
+        self.status_list = QListView()
+        self.status_list.setModel(self.status_model)
+        self.status_list.setUniformItemSizes(True)
+        self.status_list.setSelectionMode(QListView.ExtendedSelection)
         self.status_list.setFont(font)
         self.status_list.setStyleSheet(f"""
-            QListWidget {{
+            QListView {{
                 background-color: {Style.DARKER_BG};
                 border: 1px solid {Style.BORDER_COLOR};
                 border-radius: 2px;
                 padding: 2px;
             }}
-            QListWidget::item {{
+            QListView::item {{
                 padding: 4px;
                 border-bottom: 1px solid {Style.BORDER_COLOR};
             }}
-            QListWidget::item:selected {{
+            QListView::item:selected {{
                 background-color: {Style.SELECTION_BG};
             }}
-            QListWidget::item:hover:!selected {{
+            QListView::item:hover:!selected {{
                 background-color: #2a2d2e;
             }}
         """)
@@ -182,10 +218,13 @@ class GitManager(QWidget):
         self.pull_action = QAction("拉取", self)
         self.branch_action = QAction("分支", self)
         self.log_action = QAction("日志", self)
+        self.cancel_action = QAction("取消", self)
+        self.cancel_action.setEnabled(False)
         
         # 设置按钮字体
         for action in [self.init_action, self.status_action, self.add_action, self.commit_action,
-                      self.push_action, self.pull_action, self.branch_action, self.log_action]:
+                      self.push_action, self.pull_action, self.branch_action, self.log_action,
+                      self.cancel_action]:
             action.setFont(font)
         
         self.toolbar.addAction(self.init_action)
@@ -196,6 +235,7 @@ class GitManager(QWidget):
         self.toolbar.addAction(self.pull_action)
         self.toolbar.addAction(self.branch_action)
         self.toolbar.addAction(self.log_action)
+        self.toolbar.addAction(self.cancel_action)
         
         self.layout.addWidget(self.toolbar)
         
@@ -208,86 +248,142 @@ class GitManager(QWidget):
         self.pull_action.triggered.connect(self.pull_changes)
         self.branch_action.triggered.connect(self.manage_branches)
         self.log_action.triggered.connect(self.show_log)
+        self.cancel_action.triggered.connect(self.cancel_jobs)
         
     def set_repo_path(self, path):
         """设置当前仓库路径"""
+        if self.current_repo_path and self.current_repo_path != path:
+            # 切换仓库时取消旧仓库的任务，任务结束后再关闭其Git进程
+            self.cancel_jobs()
+            self.stale_repo_paths.add(self.current_repo_path)
+            self.stale_repo_paths.discard(path)
+            self.close_stale_repos()
+            self.status_snapshot = StatusSnapshot()
+            self.status_snapshot_changed.emit(self.status_snapshot)
         self.current_repo_path = path
         self.repo_label.setText(f"仓库: {os.path.basename(path)}")
+        self.update_watcher()
         self.update_branch_info()
         self.check_status()
     
+    def update_watcher(self):
+        """让.git目录的监视跟随当前仓库"""
+        if self.current_repo_path and self.is_git_repo(self.current_repo_path):
+            repo = self.repo_cache.get(self.current_repo_path)
+            self.repo_watcher.set_git_dir(repo.git_dir)
+        else:
+            self.repo_watcher.set_git_dir(None)
+    
+    def on_repo_changed(self):
+        """仓库文件发生变化时刷新分支和状态"""
+        if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
+            return
+        self.update_branch_info()
+        self.refresh_status()
+    
     def update_branch_info(self):
-        """更新分支信息"""
+        """在后台刷新提交图索引并显示当前分支"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.branch_label.setText("分支: 未选择")
             return
-            
-        try:
-            # 使用GitPython获取当前分支
-            repo = git.Repo(self.current_repo_path)
-            branch_name = repo.active_branch.name
-            self.branch_label.setText(f"分支: {branch_name}")
-        except (git.exc.InvalidGitRepositoryError, git.exc.GitCommandError) as e:
-            self.branch_label.setText("分支: 未知")
-            self.log_output(f"获取分支信息失败: {str(e)}")
-        except Exception as e:
-            self.branch_label.setText("分支: 错误")
-            self.log_output(f"获取分支信息失败: {str(e)}")
+        
+        repo_path = self.current_repo_path
+        index = self.get_commit_index(self.repo_cache.get(repo_path))
+        
+        def read_head(job):
+            index.refresh()
+            return index.head
+        
+        def on_finished(success, result):
+            if repo_path != self.current_repo_path:
+                return
+            if not success or not result:
+                self.branch_label.setText("分支: 未知")
+                self.log_output(f"获取分支信息失败: {result}")
+            elif result.startswith("refs/heads/"):
+                self.branch_label.setText(f"分支: {result[len('refs/heads/'):]}")
+            else:
+                self.branch_label.setText(f"分支: {result[:7]} (分离)")
+        
+        self.submit_job(["branch", "--show-current"], read_head, on_finished, silent=True)
     
     def is_git_repo(self, path):
         """检查路径是否为Git仓库"""
         try:
-            git.Repo(path)
+            self.repo_cache.get(path)
             return True
-        except git.exc.InvalidGitRepositoryError:
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
             return False
     
+    def submit_job(self, command, func, callback=None, silent=False):
+        """将Git任务提交到后台线程池执行
+        
+        :param command: 命令参数列表，用于显示和信号
+        :param func: 在工作线程中执行的函数，参数为GitJob
+        :param callback: 在UI线程中处理结果的函数，参数为(是否成功, 结果)
+        :param silent: 静默任务不显示加载动画，也不输出结果
+        """
+        job = GitJob(self.current_repo_path, command, func, self.repo_cache)
+        job.silent = silent
+        if not silent:
+            job.signals.output.connect(self.output_text.append)
+            job.signals.progress.connect(self.on_job_progress)
+        job.signals.finished.connect(lambda success, result: self.on_job_finished(job, success, result, callback))
+        
+        self.jobs.append(job)
+        if not silent:
+            self.show_loading(True)
+        self.thread_pool.start(job)
+        return job
+    
+    def on_job_progress(self, current, total, phase):
+        """根据Git的进度回调更新进度条"""
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(current)
+        self.progress_bar.setToolTip(phase)
+    
+    def on_job_finished(self, job, success, result, callback):
+        """Git任务完成后在UI线程中处理结果"""
+        if job in self.jobs:
+            self.jobs.remove(job)
+        if not any(not j.silent for j in self.jobs):
+            self.show_loading(False)
+        self.close_stale_repos()
+        
+        self._last_command = job.command
+        if callback:
+            callback(success, result)
+        elif not job.silent:
+            self.log_output(str(result) if success else f"命令执行失败: {result}")
+    
+    def close_stale_repos(self):
+        """没有任务在运行时关闭旧仓库的Repo，工作线程中的Repo也不再被使用"""
+        if self.jobs:
+            return
+        for path in self.stale_repo_paths:
+            self.repo_cache.close(path)
+        self.stale_repo_paths.clear()
+    
+    def cancel_jobs(self):
+        """取消所有正在执行或排队的Git任务"""
+        for job in list(self.jobs):
+            job.cancel()
+    
     def run_git_command(self, args):
-        """运行Git命令"""
+        """在后台运行Git命令，输出实时显示，结果通过git_command_executed信号返回"""
         if not self.current_repo_path:
-            return False, "未选择仓库"
+            self.log_output("错误: 未选择仓库")
+            return None
         
-        # 显示加载动画
-        self.show_loading(True)
-            
-        try:
-            # 获取仓库对象
-            repo = git.Repo(self.current_repo_path)
-            
-            # 构建Git命令
-            git_cmd = repo.git
-            
-            # 执行命令
-            method_name = args[0] if args else ""
-            params = args[1:] if len(args) > 1 else []
-            
-            # 使用getattr动态调用方法
-            if hasattr(git_cmd, method_name):
-                method = getattr(git_cmd, method_name)
-                result = method(*params)
-                success = True
-            else:
-                # 对于不支持的命令，使用自定义方法执行
-                result = git_cmd.execute(["git"] + args)
-                success = True
-            
-            # 隐藏加载动画
-            self.show_loading(False)
-            
+        def on_finished(success, result):
+            self.log_output(result if success else f"命令执行失败: {result}")
             # 更新状态（除非当前命令就是status）
-            if method_name != "status":
+            if args and args[0] != "status":
                 self.update_branch_info()
-                self.update_status_list_with_repo(repo)
-                
-            return success, result
-        except git.exc.GitCommandError as e:
-            # 隐藏加载动画
-            self.show_loading(False)
-            return False, str(e)
-        except Exception as e:
-            # 隐藏加载动画
-            self.show_loading(False)
-            return False, str(e)
+                self.refresh_status()
+        
+        return self.submit_job(list(args), lambda job: job.stream(args), on_finished)
     
     def log_output(self, text):
         """在输出区域显示文本"""
@@ -310,6 +406,7 @@ class GitManager(QWidget):
             # 使用GitPython初始化仓库
             git.Repo.init(self.current_repo_path)
             self.log_output("Git仓库初始化成功")
+            self.update_watcher()
             self.update_branch_info()
         except Exception as e:
             self.log_output(f"Git仓库初始化失败: {str(e)}")
@@ -323,99 +420,64 @@ class GitManager(QWidget):
         if not self.is_git_repo(self.current_repo_path):
             self.log_output("当前目录不是Git仓库")
             return
-            
-        self._last_command = ["status"]
-        try:
-            # 使用GitPython获取仓库状态
-            repo = git.Repo(self.current_repo_path)
-            
-            # 获取状态输出
-            status_output = repo.git.status()
-            self.log_output(status_output)
-            
-            # 更新状态列表
-            self.update_status_list_with_repo(repo)
-        except Exception as e:
-            self.log_output(f"获取状态失败: {str(e)}")
-    
-    def update_status_list(self, status_output):
-        """更新文件状态列表（基于命令输出）"""
-        self.status_list.clear()
-        
-        # 解析git status输出
-        modified_files = []
-        untracked_files = []
-        staged_files = []
-        
-        for line in status_output.splitlines():
-            line = line.strip()
-            if "modified:" in line:
-                modified_files.append(line.split("modified:")[-1].strip())
-            elif "new file:" in line:
-                staged_files.append(line.split("new file:")[-1].strip())
-            elif "Untracked files:" in status_output and line and not line.startswith("#") and ":" not in line:
-                if line not in ["Untracked files:", "(use \"git add <file>...\" to include in what will be committed)", ""]:
-                    untracked_files.append(line)
-        
-        # 添加到列表
-        for file in staged_files:
-            item = QListWidgetItem(f"[已暂存] {file}")
-            item.setForeground(QColor("green"))
-            self.status_list.addItem(item)
-            
-        for file in modified_files:
-            item = QListWidgetItem(f"[已修改] {file}")
-            item.setForeground(QColor("blue"))
-            self.status_list.addItem(item)
-            
-        for file in untracked_files:
-            item = QListWidgetItem(f"[未跟踪] {file}")
-            item.setForeground(QColor("red"))
-            self.status_list.addItem(item)
-    
-    def update_status_list_with_repo(self, repo):
-        """使用GitPython直接获取文件状态"""
-        self.status_list.clear()
         
-        # 获取未跟踪文件
-        untracked_files = repo.untracked_files
+        def on_finished(success, result):
+            if not success:
+                self.log_output(f"获取状态失败: {result}")
+                return
+            self.log_output(result.summary())
+            self.populate_status_list(result)
         
-        # 获取修改的文件
-        modified_files = [item.a_path for item in repo.index.diff(None)]
+        self.submit_job(["status"], lambda job: read_status(job.repo()), on_finished)
+    
+    def refresh_status(self, silent=True):
+        """在后台刷新文件状态列表"""
+        if not self.current_repo_path:
+            return
         
-        # 获取已暂存的文件
-        staged_files = [item.a_path for item in repo.index.diff('HEAD')]
+        # 已有排队的刷新任务时无需重复提交
+        if any(job.silent and job.command == ["status"] for job in self.jobs):
+            return
         
-        # 添加到列表
-        for file in staged_files:
-            item = QListWidgetItem(f"[已暂存] {file}")
-            item.setForeground(QColor("green"))
-            self.status_list.addItem(item)
-            
-        for file in modified_files:
-            item = QListWidgetItem(f"[已修改] {file}")
-            item.setForeground(QColor("blue"))
-            self.status_list.addItem(item)
-            
-        for file in untracked_files:
-            item = QListWidgetItem(f"[未跟踪] {file}")
-            item.setForeground(QColor("red"))
-            self.status_list.addItem(item)
+        def on_finished(success, result):
+            if success:
+                self.populate_status_list(result)
+            else:
+                print(f"刷新状态失败: {result}")
+        
+        self.submit_job(["status"], lambda job: read_status(job.repo()), on_finished, silent=silent)
+    
+    def update_status_list(self, status_output):
+        """更新文件状态列表（基于 git status --porcelain=v2 -z 的输出）"""
+        self.populate_status_list(StatusTable.from_output(status_output, self.current_repo_path))
+    
+    def populate_status_list(self, table):
+        """将状态表填充到列表中，必须在UI线程中调用"""
+        self.last_refresh_time = time.monotonic()
+        self.status_model.set_status(table)
+        if table.snapshot is None:
+            table.snapshot = StatusSnapshot(table)
+        self.status_snapshot = table.snapshot
+        self.status_snapshot_changed.emit(self.status_snapshot)
+    
+    def update_status_list_with_repo(self, repo):
+        """使用一次 git status 获取文件状态"""
+        self.populate_status_list(read_status(repo))
     
     def add_files(self):
         """添加文件到暂存区"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.log_output("错误: 未选择有效的Git仓库")
             return
-            
-        self._last_command = ["add", "."]
-        try:
-            repo = git.Repo(self.current_repo_path)
-            repo.git.add('.')
-            self.log_output("文件已添加到暂存区")
-            self.check_status()
-        except Exception as e:
-            self.log_output(f"添加文件失败: {str(e)}")
+        
+        def on_finished(success, result):
+            if success:
+                self.log_output("文件已添加到暂存区")
+                self.check_status()
+            else:
+                self.log_output(f"添加文件失败: {result}")
+        
+        self.submit_job(["add", "."], lambda job: job.stream(["add", "."]), on_finished)
     
     def commit_changes(self):
         """提交更改"""
@@ -451,102 +513,125 @@ class GitManager(QWidget):
             if not commit_message:
                 commit_message = "更新代码"
             
-            self._last_command = ["commit", "-m", commit_message]
-            try:
-                repo = git.Repo(self.current_repo_path)
-                repo.git.commit('-m', commit_message)
-                self.log_output(f"提交成功: {commit_message}")
-                self.check_status()
-            except Exception as e:
-                self.log_output(f"提交失败: {str(e)}")
+            def on_finished(success, result):
+                if success:
+                    self.log_output(f"提交成功: {commit_message}")
+                    self.check_status()
+                else:
+                    self.log_output(f"提交失败: {result}")
+            
+            args = ["commit", "-m", commit_message]
+            self.submit_job(args, lambda job: job.stream(args), on_finished)
     
     def push_changes(self):
         """推送更改"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.log_output("错误: 未选择有效的Git仓库")
             return
-            
-        self._last_command = ["push"]
-        try:
-            repo = git.Repo(self.current_repo_path)
-            origin = repo.remote(name='origin')
-            push_info = origin.push()
-            self.log_output(f"推送成功: {push_info[0].summary}")
-        except Exception as e:
-            self.log_output(f"推送失败: {str(e)}")
+        
+        def on_finished(success, result):
+            if success:
+                self.log_output("推送成功")
+                self.update_branch_info()
+            else:
+                self.log_output(f"推送失败: {result}")
+        
+        args = ["push", "--progress", "origin"]
+        self.submit_job(["push"], lambda job: job.stream(args), on_finished)
     
     def pull_changes(self):
         """拉取更改"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.log_output("错误: 未选择有效的Git仓库")
             return
-            
-        self._last_command = ["pull"]
-        try:
-            repo = git.Repo(self.current_repo_path)
-            origin = repo.remote(name='origin')
-            pull_info = origin.pull()
-            self.log_output(f"拉取成功: {pull_info[0].note}")
-            self.check_status()
-        except Exception as e:
-            self.log_output(f"拉取失败: {str(e)}")
+        
+        def on_finished(success, result):
+            if success:
+                self.log_output("拉取成功")
+                self.update_branch_info()
+                self.check_status()
+            else:
+                self.log_output(f"拉取失败: {result}")
+        
+        args = ["pull", "--progress", "origin"]
+        self.submit_job(["pull"], lambda job: job.stream(args), on_finished)
     
     def manage_branches(self):
         """管理分支"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.log_output("错误: 未选择有效的Git仓库")
             return
-            
-        self._last_command = ["branch"]
-        try:
-            repo = git.Repo(self.current_repo_path)
-            branches = repo.branches
-            branch_list = "\n".join([f"{'* ' if b.name == repo.active_branch.name else '  '}{b.name}" for b in branches])
-            self.log_output(f"分支列表:\n{branch_list}")
-        except Exception as e:
-            self.log_output(f"获取分支列表失败: {str(e)}")
+        
+        index = self.get_commit_index(self.repo_cache.get(self.current_repo_path))
+        
+        def list_branches(job):
+            index.refresh()
+            lines = []
+            with index.lock:
+                for name, sha, upstream in index.branches():
+                    marker = "* " if index.head == f"refs/heads/{name}" else "  "
+                    line = f"{marker}{name}"
+                    upstream_sha = index.refs.get(upstream) if upstream else None
+                    if upstream_sha:
+                        ahead, behind = index.ahead_behind(sha, upstream_sha)
+                        line += f"  [{upstream.split('/', 2)[-1]}: 领先 {ahead}, 落后 {behind}]"
+                    lines.append(line)
+            return "\n".join(lines)
+        
+        def on_finished(success, result):
+            if success:
+                self.log_output(f"分支列表:\n{result}")
+            else:
+                self.log_output(f"获取分支列表失败: {result}")
+        
+        self.submit_job(["branch"], list_branches, on_finished)
     
     def show_log(self):
         """显示提交日志"""
         if not self.current_repo_path or not self.is_git_repo(self.current_repo_path):
             self.log_output("错误: 未选择有效的Git仓库")
             return
-            
-        self._last_command = ["log", "--oneline", "--graph", "--decorate", "--all", "-n", "10"]
+        
+        self._last_command = ["log", "--all"]
         try:
-            repo = git.Repo(self.current_repo_path)
-            log_output = repo.git.log('--oneline', '--graph', '--decorate', '--all', '-n', '10')
-            self.log_output(f"提交日志:\n{log_output}")
+            # 提交历史按需分页加载，不阻塞界面
+            repo = self.repo_cache.get(self.current_repo_path)
+            dialog = CommitLogDialog(repo.working_tree_dir, self.get_commit_index(repo), self)
+            dialog.setAttribute(Qt.WA_DeleteOnClose)
+            dialog.show()
+            self.log_output("已打开提交日志")
         except Exception as e:
             self.log_output(f"获取提交日志失败: {str(e)}")
     
+    def get_commit_index(self, repo):
+        """获取仓库的提交图索引，索引在第一次刷新时从磁盘加载"""
+        index = self.commit_indexes.get(repo.git_dir)
+        if index is None:
+            index = CommitIndex(repo.working_tree_dir, repo.git_dir)
+            self.commit_indexes[repo.git_dir] = index
+        return index
+    
     def show_loading(self, show=True):
         """显示或隐藏加载动画"""
         self.is_loading = show
         self.progress_bar.setVisible(show)
+        self.cancel_action.setEnabled(show)
         
         if show:
-            # 创建加载动画
+            # 在收到进度回调之前使用不确定模式
+            self.progress_bar.setRange(0, 0)
             self.progress_bar.setValue(0)
-            # 如果需要旋转图标，可以使用QMovie
-            # movie = QMovie("path/to/loading.gif")
-            # self.loading_label.setMovie(movie)
-            # movie.start()
-            # self.loading_label.setVisible(True)
         else:
             # 停止加载动画
+            self.progress_bar.setRange(0, 100)
             self.progress_bar.setValue(100)
-            # self.loading_label.clear()
-            # self.loading_label.setVisible(False)
+            self.progress_bar.setToolTip("")
     
     def auto_refresh_status(self):
-        """定时自动刷新仓库状态"""
-        if self.current_repo_path and self.is_git_repo(self.current_repo_path) and not self.is_loading:
-            try:
-                # 静默更新，不显示加载动画
-                repo = git.Repo(self.current_repo_path)
-                self.update_branch_info()
-                self.update_status_list_with_repo(repo)
-            except Exception as e:
-                # 静默处理错误
-                print(f"自动刷新状态失败: {str(e)}")
\ No newline at end of file
+        """定时自动刷新仓库状态，仅在文件监视长时间没有触发刷新时执行"""
+        if time.monotonic() - self.last_refresh_time < self.refresh_interval:
+            return
+        if self.current_repo_path and self.is_git_repo(self.current_repo_path) and not self.is_loading and not self.jobs:
+            # 静默更新，不显示加载动画
+            self.update_branch_info()
+            self.refresh_status()
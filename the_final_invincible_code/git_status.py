@@ -0,0 +1,183 @@
+import os
+from types import MappingProxyType
+from collections import namedtuple
+
+# 一条文件状态：路径、两位状态码（X为暂存区，Y为工作区）、重命名前的路径
+StatusEntry = namedtuple("StatusEntry", ["path", "xy", "orig_path"])
+
+STATUS_ARGS = ["--porcelain=v2", "-z", "--branch", "--untracked-files=all"]
+
+# 文件状态标志，目录的标志为其下所有文件标志的并集
+STAGED = 1
+MODIFIED = 2
+UNTRACKED = 4
+CONFLICTED = 8
+
+
+def decode_path(raw):
+    """Git路径是字节串，无法用UTF-8解码的字节原样保留"""
+    return raw.decode("utf-8", errors="surrogateescape")
+
+
+def parse_porcelain_v2(data):
+    """逐条解析 git status --porcelain=v2 -z 的输出
+
+    生成 ("header", 键, 值) 或 ("entry", StatusEntry) 元组。
+    记录以NUL分隔，路径中的空格和特殊字符不需要转义。
+    """
+    records = iter(data.split(b"\0"))
+    for record in records:
+        if not record:
+            continue
+        kind = record[:1]
+        if kind == b"#":
+            # 头部信息，如 "# branch.head main"
+            parts = record[2:].split(b" ", 1)
+            yield "header", parts[0].decode("utf-8"), decode_path(parts[1]) if len(parts) > 1 else ""
+        elif kind == b"1":
+            # 1 XY sub mH mI mW hH hI path
+            fields = record.split(b" ", 8)
+            yield "entry", StatusEntry(decode_path(fields[8]), fields[1].decode("ascii"), None)
+        elif kind == b"2":
+            # 2 XY sub mH mI mW hH hI Xscore path，原路径是下一条记录
+            fields = record.split(b" ", 9)
+            orig_path = next(records, b"")
+            yield "entry", StatusEntry(decode_path(fields[9]), fields[1].decode("ascii"), decode_path(orig_path))
+        elif kind == b"u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            fields = record.split(b" ", 10)
+            yield "entry", StatusEntry(decode_path(fields[10]), fields[1].decode("ascii"), None)
+        elif kind in (b"?", b"!"):
+            xy = kind.decode("ascii") * 2
+            yield "entry", StatusEntry(decode_path(record[2:]), xy, None)
+
+
+class StatusTable:
+    """一次 git status 得到的文件状态表，各分类集合在解析时一并生成"""
+
+    def __init__(self, root=None):
+        self.root = root  # 工作区根目录
+        self.snapshot = None
+        self.entries = []
+        self.headers = {}
+        self.staged = set()
+        self.modified = set()
+        self.untracked = set()
+        self.ignored = set()
+        self.renamed = {}  # 新路径 -> 原路径
+        self.conflicted = set()
+
+    @classmethod
+    def from_output(cls, data, root=None):
+        """从 porcelain v2 输出构建状态表"""
+        if isinstance(data, str):
+            data = data.encode("utf-8", errors="surrogateescape")
+        table = cls(root)
+        for record in parse_porcelain_v2(data):
+            if record[0] == "header":
+                table.headers[record[1]] = record[2]
+            else:
+                table.add(record[1])
+        return table
+
+    def add(self, entry):
+        self.entries.append(entry)
+        x, y = entry.xy[0], entry.xy[1]
+        if entry.xy == "??":
+            self.untracked.add(entry.path)
+        elif entry.xy == "!!":
+            self.ignored.add(entry.path)
+        elif x == "U" or y == "U" or entry.xy in ("AA", "DD"):
+            self.conflicted.add(entry.path)
+        else:
+            if x != ".":
+                self.staged.add(entry.path)
+            if y != ".":
+                self.modified.add(entry.path)
+            if entry.orig_path is not None:
+                self.renamed[entry.path] = entry.orig_path
+
+    @property
+    def branch(self):
+        return self.headers.get("branch.head")
+
+    def summary(self):
+        """生成供输出区域显示的状态摘要"""
+        lines = []
+        if self.branch:
+            lines.append(f"位于分支 {self.branch}")
+        ahead_behind = self.headers.get("branch.ab")
+        if ahead_behind:
+            ahead, behind = ahead_behind.split()
+            lines.append(f"领先 {ahead.lstrip('+')} 个提交，落后 {behind.lstrip('-')} 个提交")
+        if not self.entries:
+            lines.append("没有需要提交的更改，工作区干净")
+            return "\n".join(lines)
+
+        for title, paths in (("冲突", self.conflicted), ("已暂存", self.staged),
+                             ("已修改", self.modified), ("未跟踪", self.untracked)):
+            if paths:
+                lines.append(f"{title}: {len(paths)} 个文件")
+                for path in sorted(paths):
+                    orig_path = self.renamed.get(path)
+                    lines.append(f"    {orig_path} -> {path}" if orig_path and title == "已暂存" else f"    {path}")
+        return "\n".join(lines)
+
+
+class StatusSnapshot:
+    """发布给界面的不可变状态快照
+
+    文件和目录的状态标志都已预先计算好，目录的标志汇总了其下所有文件，
+    查询任何路径都只需一次字典查找。刷新完成后整体替换为新的快照，
+    读取方不会看到更新到一半的状态。
+    """
+
+    __slots__ = ("root", "files", "dirs")
+
+    def __init__(self, table=None):
+        files = {}
+        dirs = {}
+        if table is not None:
+            for flag, paths in ((STAGED, table.staged), (MODIFIED, table.modified),
+                                (UNTRACKED, table.untracked), (CONFLICTED, table.conflicted)):
+                for path in paths:
+                    files[path] = files.get(path, 0) | flag
+            for path, flags in files.items():
+                # 逐级向上汇总，上级已包含全部标志时提前结束
+                parent = path.rstrip("/").rpartition("/")[0]
+                while parent:
+                    current = dirs.get(parent, 0)
+                    if current | flags == current:
+                        break
+                    dirs[parent] = current | flags
+                    parent = parent.rpartition("/")[0]
+        object.__setattr__(self, "root", os.path.abspath(table.root) if table is not None and table.root else None)
+        object.__setattr__(self, "files", MappingProxyType(files))
+        object.__setattr__(self, "dirs", MappingProxyType(dirs))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StatusSnapshot是不可变的")
+
+    def flags(self, path, is_dir=False):
+        """返回绝对路径的状态标志，不在仓库中或没有变化时返回0"""
+        if not self.root:
+            return 0
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(".."):
+            return 0
+        rel = rel.replace(os.sep, "/")
+        if is_dir:
+            # 整个未跟踪的目录在状态中以 "dir/" 的形式出现
+            return self.dirs.get(rel, 0) | self.files.get(rel + "/", 0)
+        return self.files.get(rel, 0)
+
+
+def read_status(repo):
+    """对仓库执行一次 git status 并解析为状态表，可在工作线程中调用
+
+    供界面使用的状态快照也在这里一并生成。
+    """
+    output = repo.git.status(*STATUS_ARGS, stdout_as_string=False)
+    table = StatusTable.from_output(output, repo.working_tree_dir)
+    table.snapshot = StatusSnapshot(table)
+    return table
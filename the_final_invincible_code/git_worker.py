@@ -0,0 +1,131 @@
+import os
+import re
+import subprocess
+import git
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+# git --progress 输出的进度行，如 "Receiving objects:  45% (123/456)"
+PROGRESS_PATTERN = re.compile(r'^(?:remote:\s*)?([A-Za-z ]+):\s+(\d+)%\s+\((\d+)/(\d+)\)')
+
+
+class GitJobCancelled(Exception):
+    """Git任务被用户取消"""
+
+
+class GitJobSignals(QObject):
+    """Git任务的信号，QRunnable本身不是QObject，因此单独定义"""
+    output = pyqtSignal(str)  # 一行命令输出
+    progress = pyqtSignal(int, int, str)  # 当前值, 最大值, 阶段名称
+    finished = pyqtSignal(bool, object)  # 是否成功, 结果
+
+
+class GitJob(QRunnable):
+    """在线程池中执行的Git任务
+
+    func 接收任务本身作为参数，可以通过 job.repo() 访问仓库，
+    通过 job.stream() 运行需要实时输出和进度的命令。
+    """
+
+    def __init__(self, repo_path, command, func, repo_cache=None):
+        super().__init__()
+        self.repo_path = repo_path
+        self.repo_cache = repo_cache
+        self.command = command
+        self.func = func
+        self.signals = GitJobSignals()
+        self._cancelled = False
+        self._process = None
+
+    def repo(self):
+        """获取任务所在的仓库对象"""
+        if self.repo_cache:
+            return self.repo_cache.get(self.repo_path)
+        return git.Repo(self.repo_path)
+
+    def cancel(self):
+        """请求取消任务，正在运行的子进程会被终止"""
+        self._cancelled = True
+        process = self._process
+        if process and process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def check_cancelled(self):
+        """如果任务已被取消，则中断执行"""
+        if self._cancelled:
+            raise GitJobCancelled()
+
+    def stream(self, args):
+        """运行Git命令，逐行发出输出并根据进度行更新进度"""
+        self.check_cancelled()
+
+        env = os.environ.copy()
+        # 后台线程无法响应终端输入，禁止Git弹出凭据提示
+        env["GIT_TERMINAL_PROMPT"] = "0"
+        self._process = subprocess.Popen(
+            ["git"] + list(args),
+            cwd=self.repo_path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            env=env,
+        )
+
+        lines = []
+        buffer = b""
+        try:
+            while True:
+                chunk = self._process.stdout.read1(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+                # 进度行以\r结尾，普通输出以\n结尾
+                parts = re.split(rb'[\r\n]', buffer)
+                buffer = parts.pop()
+                for part in parts:
+                    self._handle_line(part.decode("utf-8", errors="replace"), lines)
+            if buffer:
+                self._handle_line(buffer.decode("utf-8", errors="replace"), lines)
+        finally:
+            self._process.stdout.close()
+            returncode = self._process.wait()
+            self._process = None
+
+        self.check_cancelled()
+        if returncode != 0:
+            raise git.exc.GitCommandError(["git"] + list(args), returncode, "\n".join(lines[-20:]))
+        return "\n".join(lines)
+
+    def _handle_line(self, line, lines):
+        """处理一行输出：进度行驱动进度条，其余行输出到界面"""
+        line = line.rstrip()
+        if not line:
+            return
+
+        match = PROGRESS_PATTERN.match(line)
+        if match:
+            phase, _, current, total = match.groups()
+            self.signals.progress.emit(int(current), int(total), phase.strip())
+            # 只保留每个阶段完成时的进度行
+            if not line.endswith("done."):
+                return
+
+        lines.append(line)
+        self.signals.output.emit(line)
+
+    def run(self):
+        """线程池入口"""
+        try:
+            self.check_cancelled()
+            result = self.func(self)
+        except GitJobCancelled:
+            self.signals.finished.emit(False, "命令已取消")
+        except Exception as e:
+            self.signals.finished.emit(False, str(e))
+        else:
+            self.signals.finished.emit(True, result)
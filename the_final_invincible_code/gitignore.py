@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+
+
+def translate_pattern(pattern):
+    """把 gitignore 通配符转换为正则表达式"""
+    i, n = 0, len(pattern)
+    result = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                result.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                result.append(".*")
+                i += 2
+                continue
+            result.append("[^/]*")
+        elif c == "?":
+            result.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("!", "^") else i + 1)
+            if end < 0:
+                result.append(re.escape(c))
+            else:
+                content = pattern[i + 1:end]
+                if content[:1] in ("!", "^"):
+                    content = "^" + content[1:]
+                result.append("[" + content.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            result.append(re.escape(pattern[i]))
+        else:
+            result.append(re.escape(c))
+        i += 1
+    return "".join(result)
+
+
+class IgnoreRule:
+    """一条编译后的忽略规则"""
+
+    __slots__ = ("regex", "negate", "dir_only")
+
+    def __init__(self, regex, negate, dir_only):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+
+def parse_rules(lines):
+    """解析 .gitignore 的内容，返回规则列表"""
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n").rstrip("\r")
+        # 去掉未转义的行尾空格
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate or line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # 包含斜杠的规则相对于 .gitignore 所在目录，否则匹配任意层级
+        anchored = "/" in line
+        line = line.lstrip("/")
+        regex = translate_pattern(line)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append(IgnoreRule(re.compile("^" + regex + "$"), negate, dir_only))
+    return rules
+
+
+class GitIgnore:
+    """工作区的 .gitignore 匹配器
+
+    每个目录的 .gitignore 编译后按修改时间缓存，目录是否被忽略的结果也会缓存，
+    被忽略目录下的所有路径都直接视为忽略。规则文件的修改时间在每次invalidate
+    之后只检查一次，匹配大量路径时不会重复stat。可在多个线程中使用。
+    """
+
+    ALWAYS_IGNORED = {".git"}
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._rules = {}  # 相对目录 -> ((修改时间, 大小)元组, 规则列表)
+        self._dir_cache = {}  # 相对目录 -> 是否被忽略
+        self._checked = set()  # 上次invalidate之后已检查过修改时间的目录
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """清除目录的忽略结果缓存，规则文件会按修改时间重新检查"""
+        with self._lock:
+            self._dir_cache.clear()
+            self._checked.clear()
+
+    def rule_file_changed(self, path):
+        """目录的规则文件与上次读取时相比是否有变化（新建、修改或删除）
+
+        从未读取过规则的目录下没有判断过任何路径，视为没有变化。
+        """
+        rel_dir = self.relpath(path)
+        with self._lock:
+            cached = self._rules.get(rel_dir)
+        if cached is None:
+            return False
+        return cached[0] != self.stat_rule_files(rel_dir)[1]
+
+    def stat_rule_files(self, rel_dir):
+        """返回目录的规则文件列表及其(修改时间, 大小)，不存在的文件为None"""
+        files = [os.path.join(self.root, rel_dir, ".gitignore")]
+        if not rel_dir:
+            files.append(os.path.join(self.root, ".git", "info", "exclude"))
+        stamps = []
+        for path in files:
+            try:
+                st = os.stat(path)
+                stamps.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamps.append(None)
+        return files, tuple(stamps)
+
+    def relpath(self, path):
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel == ".":
+            return ""
+        return rel.replace(os.sep, "/")
+
+    def rules_for(self, rel_dir):
+        """返回某个目录下 .gitignore 的规则，文件修改后重新编译"""
+        with self._lock:
+            if rel_dir in self._checked:
+                return self._rules[rel_dir][1]
+        files, stamps = self.stat_rule_files(rel_dir)
+
+        with self._lock:
+            cached = self._rules.get(rel_dir)
+            if cached and cached[0] == stamps:
+                self._checked.add(rel_dir)
+                return cached[1]
+
+        rules = []
+        for path, stamp in zip(files, stamps):
+            if stamp is None:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    rules.extend(parse_rules(f))
+            except OSError:
+                continue
+
+        with self._lock:
+            if cached and cached[0] != stamps:
+                # 规则变化后目录的忽略结果也可能改变
+                self._dir_cache.clear()
+            self._rules[rel_dir] = (stamps, rules)
+            self._checked.add(rel_dir)
+        return rules
+
+    def match(self, rel_path, is_dir):
+        """只根据各级 .gitignore 判断路径本身是否被忽略，不考虑上级目录"""
+        name = rel_path.rsplit("/", 1)[-1]
+        if name in self.ALWAYS_IGNORED:
+            return True
+        ignored = False
+        parts = rel_path.split("/")
+        # 从根目录到父目录依次应用规则，后面的规则优先
+        for depth in range(len(parts)):
+            base = "/".join(parts[:depth])
+            sub_path = "/".join(parts[depth:])
+            for rule in self.rules_for(base):
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(sub_path):
+                    ignored = not rule.negate
+        return ignored
+
+    def is_dir_ignored(self, rel_dir):
+        if not rel_dir:
+            return False
+        with self._lock:
+            cached = self._dir_cache.get(rel_dir)
+        if cached is not None:
+            return cached
+        parent = rel_dir.rsplit("/", 1)[0] if "/" in rel_dir else ""
+        ignored = self.is_dir_ignored(parent) or self.match(rel_dir, True)
+        with self._lock:
+            self._dir_cache[rel_dir] = ignored
+        return ignored
+
+    def is_ignored(self, path, is_dir=None):
+        """判断路径是否被忽略，path可以是绝对路径或相对于根目录的路径"""
+        rel = self.relpath(path) if os.path.isabs(path) else path.replace(os.sep, "/")
+        if not rel or rel.startswith("../"):
+            return False
+        if is_dir is None:
+            is_dir = os.path.isdir(os.path.join(self.root, rel))
+        if is_dir:
+            return self.is_dir_ignored(rel)
+        parent = rel.rsplit("/", 1)[0] if "/" in rel else ""
+        return self.is_dir_ignored(parent) or self.match(rel, False)
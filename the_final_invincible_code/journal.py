@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import uuid
+import queue
+from PyQt5.QtCore import QThread, QStandardPaths
+
+
+def recovery_dir():
+    """自动保存日志的存放目录"""
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericDataLocation)
+    return os.path.join(base, "lingxi", "recovery")
+
+
+class JournalWriter(QThread):
+    """所有文档共用的日志写入线程
+
+    界面线程只把写入任务放入队列，编码、写文件和fsync都在这里进行。
+    队列中积压的任务一次取出后批量写入，fsync最多每FSYNC_INTERVAL秒一次，
+    连续输入时每次按键只是一次入队操作。
+    """
+
+    FSYNC_INTERVAL = 1.0
+
+    def __init__(self, directory=None, parent=None):
+        super().__init__(parent)
+        self.directory = directory or recovery_dir()
+        self.tasks = queue.Queue()
+        self.files = {}  # 日志路径 -> 打开的文件
+        self.unsynced = set()
+        self.last_sync = time.monotonic()
+
+    def submit(self, task):
+        self.tasks.put(task)
+
+    def stop(self):
+        """写完队列中的任务并fsync后退出"""
+        if self.isRunning():
+            self.tasks.put(None)
+            self.wait()
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        running = True
+        while running:
+            try:
+                task = self.tasks.get(timeout=self.FSYNC_INTERVAL if self.unsynced else None)
+            except queue.Empty:
+                self.sync()
+                continue
+            batch = [task]
+            while True:
+                try:
+                    batch.append(self.tasks.get_nowait())
+                except queue.Empty:
+                    break
+            for task in batch:
+                if task is None:
+                    running = False
+                    break
+                try:
+                    self.handle(task)
+                except OSError as e:
+                    print(f"写入恢复日志失败: {e}")
+            for f in self.files.values():
+                f.flush()
+            if time.monotonic() - self.last_sync >= self.FSYNC_INTERVAL:
+                self.sync()
+        self.sync()
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+
+    def sync(self):
+        for path in self.unsynced:
+            f = self.files.get(path)
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+        self.unsynced.clear()
+        self.last_sync = time.monotonic()
+
+    def close_file(self, path):
+        f = self.files.pop(path, None)
+        if f is not None:
+            f.close()
+        self.unsynced.discard(path)
+
+    def remove(self, path):
+        self.close_file(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def handle(self, task):
+        action = task[0]
+        if action == "append":
+            _, path, record = task
+            f = self.files.get(path)
+            if f is None:
+                f = self.files[path] = open(path, 'a', encoding='utf-8')
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.unsynced.add(path)
+        elif action == "snapshot":
+            # 先写入新快照，再删除旧日志；中途崩溃时快照的版本号决定重放哪个日志
+            _, path, snapshot, old_journal = task
+            temp_path = path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            if old_journal:
+                self.remove(old_journal)
+        elif action == "discard":
+            for path in task[1:]:
+                self.remove(path)
+        elif action == "discard_key":
+            for path in [path for path in self.files if os.path.basename(path).startswith(task[1] + ".")]:
+                self.close_file(path)
+            discard_recovery_files(self.directory, task[1])
+
+
+class DocumentJournal:
+    """一个文档的快照和操作日志
+
+    第一次修改时写入完整快照，之后的修改以操作记录追加到日志，
+    记录数达到COMPACT_THRESHOLD时重新写快照并开始新的日志。
+    快照和日志文件名中的版本号保证压缩中途崩溃也不会重复重放。
+    """
+
+    COMPACT_THRESHOLD = 2000
+
+    def __init__(self, writer, kind, key=None):
+        self.writer = writer
+        self.kind = kind
+        self.key = key or uuid.uuid4().hex
+        self.generation = 0
+        self.count = 0
+        self.started = False
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.writer.directory, f"{self.key}.snapshot")
+
+    def journal_path(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.writer.directory, f"{self.key}.{generation}.journal")
+
+    def log(self, record, snapshot, file_path=None):
+        """记录一次修改；snapshot返回修改后的完整数据，只在需要写快照时调用"""
+        if not self.started or self.count >= self.COMPACT_THRESHOLD:
+            self.compact(snapshot(), file_path)
+        else:
+            self.count += 1
+            self.writer.submit(("append", self.journal_path(), record))
+
+    def compact(self, data, file_path=None):
+        old_journal = self.journal_path() if self.started else None
+        self.generation += 1
+        self.started = True
+        self.count = 0
+        snapshot = {"kind": self.kind, "generation": self.generation, "file_path": file_path, "data": data}
+        self.writer.submit(("snapshot", self.snapshot_path, snapshot, old_journal))
+
+    def reset(self):
+        """文档已保存或重新加载，删除快照和日志"""
+        if self.started:
+            self.writer.submit(("discard", self.snapshot_path, self.journal_path()))
+        self.started = False
+        self.count = 0
+
+
+def find_recoveries(directory=None):
+    """读取上次未保存的文档，返回快照及其后的操作记录
+
+    日志末尾可能有写到一半的记录，遇到无法解析的行时停止。
+    """
+    directory = directory or recovery_dir()
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    recoveries = []
+    for name in sorted(names):
+        if not name.endswith(".snapshot"):
+            continue
+        key = name[:-len(".snapshot")]
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        records = []
+        journal_path = os.path.join(directory, f"{key}.{snapshot.get('generation', 0)}.journal")
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        snapshot["key"] = key
+        snapshot["records"] = records
+        recoveries.append(snapshot)
+    return recoveries
+
+
+def discard_recovery_files(directory, key):
+    """删除某个文档的快照和所有日志"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(key + "."):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,316 @@
+import os
+import mmap
+import bisect
+from array import array
+from PyQt5.QtWidgets import QAbstractScrollArea, QInputDialog, QShortcut
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QFont, QKeySequence
+from style import Style
+from file_loader import detect_encoding
+
+
+class LineIndex:
+    """稀疏行索引
+
+    文件按固定大小分块，只记录每块之前的换行符个数。
+    定位某一行时先二分找到所在的块，再在块内查找换行符，
+    因此索引大小只与文件大小成正比且非常小，查找代价不超过一块。
+    """
+
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, mm):
+        self.mm = mm
+        self.size = len(mm)
+        self.counts = array('Q', [0])  # counts[i] 为第i块之前的换行符数
+        self.complete = self.size == 0
+
+    def build_step(self, max_blocks):
+        """继续建立索引，最多处理max_blocks块，返回是否已完成"""
+        mm = self.mm
+        for _ in range(max_blocks):
+            start = (len(self.counts) - 1) * self.BLOCK_SIZE
+            if start >= self.size:
+                self.complete = True
+                return True
+            end = min(start + self.BLOCK_SIZE, self.size)
+            self.counts.append(self.counts[-1] + mm[start:end].count(b"\n"))
+        return False
+
+    @property
+    def indexed_bytes(self):
+        return min((len(self.counts) - 1) * self.BLOCK_SIZE, self.size)
+
+    def line_count(self):
+        """已建立索引部分的行数，完成后为文件总行数"""
+        count = self.counts[-1]
+        if self.complete and self.size and self.mm[self.size - 1:self.size] != b"\n":
+            count += 1
+        return max(count, 1)
+
+    def line_offset(self, line):
+        """返回第line行（从0开始）的起始字节位置，超出已索引范围时返回None"""
+        if line == 0:
+            return 0
+        block = bisect.bisect_left(self.counts, line) - 1
+        if block < 0 or block >= len(self.counts) - 1:
+            return None
+        pos = block * self.BLOCK_SIZE
+        remaining = line - self.counts[block]
+        while remaining > 0:
+            pos = self.mm.find(b"\n", pos) + 1
+            if pos == 0:
+                return None
+            remaining -= 1
+        return pos
+
+    def line_at(self, offset):
+        """返回字节位置所在的行号"""
+        block = min(offset // self.BLOCK_SIZE, len(self.counts) - 1)
+        start = block * self.BLOCK_SIZE
+        return self.counts[block] + self.mm[start:offset].count(b"\n")
+
+
+class IndexBuilder(QThread):
+    """在后台建立行索引"""
+
+    progress = pyqtSignal(int, int)  # 已索引字节数, 总字节数
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        while not self._cancelled:
+            done = self.index.build_step(256)
+            self.progress.emit(self.index.indexed_bytes, self.index.size)
+            if done:
+                break
+
+
+class TextSearcher(QThread):
+    """在后台按块查找字节串，只在已建立索引的范围内查找，保证能换算出行号"""
+
+    progress = pyqtSignal(int, int)  # 已查找到的字节位置, 总字节数
+    search_finished = pyqtSignal(int)  # 所在行号，找不到时为-1
+
+    BLOCK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, index, pattern, start, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.pattern = pattern
+        self.start_offset = start
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        mm = self.index.mm
+        pos = self.start_offset
+        # 相邻的块重叠，跨越块边界的匹配也能找到
+        overlap = len(self.pattern) - 1
+        while not self._cancelled:
+            end = self.index.indexed_bytes
+            if pos >= end:
+                break
+            block_end = min(pos + self.BLOCK_SIZE, end)
+            offset = mm.find(self.pattern, pos, block_end)
+            if offset >= 0:
+                self.search_finished.emit(self.index.line_at(offset))
+                return
+            if block_end >= end:
+                break
+            pos = max(pos + 1, block_end - overlap)
+            self.progress.emit(pos, self.index.size)
+        if not self._cancelled:
+            self.search_finished.emit(-1)
+
+
+class LargeFileViewer(QAbstractScrollArea):
+    """基于内存映射的大文件只读查看器
+
+    只解码和绘制可见窗口内的行，内存占用与文件大小基本无关。
+    支持跳转到行（Ctrl+G）和查找（Ctrl+F，F3查找下一个）。
+    """
+
+    status_message = pyqtSignal(str)
+
+    MAX_LINE_BYTES = 4096  # 每行最多显示的字节数
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(file_path) else b""
+        self.encoding = detect_encoding(self.mm[:LineIndex.BLOCK_SIZE])
+        self.index = LineIndex(self.mm)
+        self.search_text = None
+        self.searcher = None
+        self.highlight_line = None
+        self.content_width = 0  # 已显示过的最长一行的宽度
+
+        font = QFont()
+        font.setFamily(Style.CODE_FONT_FAMILY.split(',')[0].strip())
+        font.setPointSize(Style.CODE_FONT_SIZE)
+        font.setFixedPitch(True)
+        self.setFont(font)
+        self.viewport().setStyleSheet(f"background-color: {Style.EDITOR_BG};")
+
+        QShortcut(QKeySequence("Ctrl+G"), self, self.prompt_goto_line)
+        QShortcut(QKeySequence.Find, self, self.prompt_find)
+        QShortcut(QKeySequence.FindNext, self, self.find_next)
+
+        self.builder = IndexBuilder(self.index, self)
+        self.builder.progress.connect(self.on_index_progress)
+        self.builder.start()
+        self.update_scrollbars()
+
+    @staticmethod
+    def supports(file_path):
+        """按字节查找换行符只适用于单字节换行的编码"""
+        with open(file_path, 'rb') as f:
+            encoding = detect_encoding(f.read(4096))
+        return encoding not in ("utf-16", "utf-32")
+
+    def close_file(self):
+        """停止建立索引和查找并释放映射，可以重复调用"""
+        self.cancel_search()
+        self.builder.cancel()
+        self.builder.wait()
+        if isinstance(self.mm, mmap.mmap) and not self.mm.closed:
+            self.mm.close()
+        self.file.close()
+
+    def line_height(self):
+        return self.fontMetrics().height()
+
+    def visible_line_count(self):
+        return max(1, self.viewport().height() // self.line_height())
+
+    def update_scrollbars(self):
+        lines = self.index.line_count()
+        self.verticalScrollBar().setRange(0, max(0, lines - self.visible_line_count()))
+        self.verticalScrollBar().setPageStep(self.visible_line_count())
+        width = self.viewport().width()
+        self.horizontalScrollBar().setRange(0, max(0, self.content_width + 10 - width))
+        self.horizontalScrollBar().setPageStep(width)
+
+    def on_index_progress(self, indexed, total):
+        self.update_scrollbars()
+        if self.index.complete:
+            self.status_message.emit(f"{os.path.basename(self.file_path)}: 共 {self.index.line_count()} 行 ({self.encoding}，只读)")
+        else:
+            percent = int(indexed * 100 / total) if total else 100
+            self.status_message.emit(f"正在建立行索引 {os.path.basename(self.file_path)}: {percent}%")
+        self.viewport().update()
+
+    def read_lines(self, first, count):
+        """读取从first行开始的最多count行"""
+        pos = self.index.line_offset(first)
+        if pos is None:
+            return []
+        lines = []
+        size = len(self.mm)
+        while len(lines) < count and pos < size:
+            end = self.mm.find(b"\n", pos)
+            if end < 0:
+                end = size
+            raw = self.mm[pos:min(end, pos + self.MAX_LINE_BYTES)].rstrip(b"\r")
+            lines.append(raw.decode(self.encoding, errors="replace").expandtabs(4))
+            pos = end + 1
+        return lines
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), QColor(Style.EDITOR_BG))
+        line_height = self.line_height()
+        ascent = self.fontMetrics().ascent()
+        first = self.verticalScrollBar().value()
+        x = 5 - self.horizontalScrollBar().value()
+
+        widest = 0
+        for i, text in enumerate(self.read_lines(first, self.visible_line_count() + 1)):
+            y = i * line_height
+            if first + i == self.highlight_line:
+                painter.fillRect(0, y, self.viewport().width(), line_height, QColor(Style.HIGHLIGHT_BG))
+            painter.setPen(QColor(Style.TEXT_COLOR))
+            painter.drawText(x, y + ascent, text)
+            widest = max(widest, self.fontMetrics().width(text))
+        painter.end()
+        # 水平滚动范围跟随显示过的最长一行，只增不减，滚动时不会跳动
+        if widest > self.content_width:
+            self.content_width = widest
+            self.update_scrollbars()
+
+    def goto_line(self, line):
+        """跳转到第line行（从0开始）"""
+        line = max(0, min(line, self.index.line_count() - 1))
+        self.highlight_line = line
+        self.verticalScrollBar().setValue(max(0, line - self.visible_line_count() // 2))
+        self.viewport().update()
+
+    def prompt_goto_line(self):
+        line, ok = QInputDialog.getInt(self, "跳转到行", "行号:", 1, 1, self.index.line_count())
+        if ok:
+            self.goto_line(line - 1)
+
+    def find(self, text, start_line=0):
+        """在后台从start_line行开始查找文本，结果由on_search_finished处理"""
+        self.cancel_search()
+        # utf-8-sig编码时会在开头加上BOM，文件中间的文本不带BOM
+        encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+        pattern = text.encode(encoding, errors="replace")
+        start = self.index.line_offset(start_line)
+        if not pattern or start is None:
+            self.status_message.emit(f"未找到: {text}")
+            return
+        self.searcher = TextSearcher(self.index, pattern, start, self)
+        self.searcher.progress.connect(self.on_search_progress)
+        self.searcher.search_finished.connect(self.on_search_finished)
+        self.searcher.finished.connect(self.searcher.deleteLater)
+        self.searcher.start()
+
+    def cancel_search(self):
+        if self.searcher:
+            self.searcher.cancel()
+            self.searcher.wait()
+            self.searcher = None
+
+    def on_search_progress(self, pos, total):
+        if self.sender() is not self.searcher:
+            return
+        percent = int(pos * 100 / total) if total else 100
+        self.status_message.emit(f"正在查找 {self.search_text}: {percent}%")
+
+    def on_search_finished(self, line):
+        # 已取消的查找仍可能有排队的结果，直接丢弃
+        if self.sender() is not self.searcher:
+            return
+        self.searcher = None
+        if line < 0:
+            self.status_message.emit(f"未找到: {self.search_text}")
+        else:
+            self.goto_line(line)
+
+    def prompt_find(self):
+        text, ok = QInputDialog.getText(self, "查找", "查找内容:", text=self.search_text or "")
+        if ok and text:
+            self.search_text = text
+            self.highlight_line = None
+            self.find_next()
+
+    def find_next(self):
+        if not self.search_text:
+            return self.prompt_find()
+        start = 0 if self.highlight_line is None else self.highlight_line + 1
+        self.find(self.search_text, start)
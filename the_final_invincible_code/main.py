@@ -44,24 +44,27 @@ class MainWindow(QMainWindow):
         new_action.setShortcut("Ctrl+N")
         open_action = QAction("打开", self)
         open_action.setShortcut("Ctrl+O")
-        save_action = QAction("保存", self)
-        save_action.setShortcut("Ctrl+S")
+        self.save_action = QAction("保存", self)
+        self.save_action.setShortcut("Ctrl+S")
+        self.quick_open_action = QAction("快速打开", self)
+        self.quick_open_action.setShortcut("Ctrl+P")
         exit_action = QAction("退出", self)
         exit_action.setShortcut("Ctrl+Q")
         exit_action.triggered.connect(self.close)
         
         file_menu.addAction(new_action)
         file_menu.addAction(open_action)
-        file_menu.addAction(save_action)
+        file_menu.addAction(self.save_action)
+        file_menu.addAction(self.quick_open_action)
         file_menu.addSeparator()
         file_menu.addAction(exit_action)
         
         # 编辑菜单
         edit_menu = menu_bar.addMenu("编辑")
-        undo_action = QAction("撤销", self)
-        undo_action.setShortcut("Ctrl+Z")
-        redo_action = QAction("重做", self)
-        redo_action.setShortcut("Ctrl+Y")
+        self.undo_action = QAction("撤销", self)
+        self.undo_action.setShortcut("Ctrl+Z")
+        self.redo_action = QAction("重做", self)
+        self.redo_action.setShortcut("Ctrl+Y")
         cut_action = QAction("剪切", self)
         cut_action.setShortcut("Ctrl+X")
         copy_action = QAction("复制", self)
@@ -69,8 +72,8 @@ class MainWindow(QMainWindow):
         paste_action = QAction("粘贴", self)
         paste_action.setShortcut("Ctrl+V")
         
-        edit_menu.addAction(undo_action)
-        edit_menu.addAction(redo_action)
+        edit_menu.addAction(self.undo_action)
+        edit_menu.addAction(self.redo_action)
         edit_menu.addSeparator()
         edit_menu.addAction(cut_action)
         edit_menu.addAction(copy_action)
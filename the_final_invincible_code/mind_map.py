@@ -1,155 +1,371 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGraphicsView, QGraphicsScene, QGraphicsLineItem, QGraphicsTextItem, QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsItem, QMenu, QInputDialog, QFileDialog, QMessageBox, QToolBar, QAction, QComboBox, QLabel, QHBoxLayout, QSizePolicy
-from PyQt5.QtCore import Qt, QPointF, QRectF, pyqtSignal, QSizeF
-from PyQt5.QtGui import QPen, QBrush, QColor, QFont, QIcon, QPainter
-import json
-import os
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGraphicsView, QGraphicsScene, QGraphicsLineItem, QGraphicsTextItem, QGraphicsObject, QGraphicsItem, QMenu, QInputDialog, QFileDialog, QMessageBox, QToolBar, QAction, QComboBox, QLabel, QHBoxLayout, QSizePolicy, QUndoStack
+from PyQt5.QtCore import Qt, QPointF, QRectF, pyqtSignal, QSizeF, QTimer
+from PyQt5.QtGui import QPen, QBrush, QColor, QFont, QIcon, QPainter, QPainterPath, QStaticText
+from contextlib import contextmanager
 from interaction_point import InteractionPoint
+from spatial_index import SpatialIndex
+from mind_map_model import MindMapModel, ModelObserver, ModelText
+from mind_map_layout import TreeLayout, TreeSnapshot, LayoutWorker, TIDY, RADIAL, BALANCED
+from mind_map_format import BinaryMapReader, is_binary_map
+from mind_map_commands import (AddSubtreeCommand, DeleteSubtreeCommand, AddLineCommand, DeleteLineCommand,
+                               MoveNodesCommand, ResizeNodeCommand, EditTextCommand, AddTextCommand,
+                               DeleteTextCommand, EditFreeTextCommand, CollapseCommand, ExpandCommand)
 
-class MindMapNode:
-    def __init__(self, text, pos, width=120, height=80, parent=None):
-        self.pos = pos
-        self.width = width
-        self.height = height
-        self.text = text
-        self.parent_node = None
-        self.child_nodes = []
-        self.lines = []
-        self.shape_item = None
-        self.text_item = None
-        self.interaction_points = []
-    
-    def add_child(self, child_node):
-        self.child_nodes.append(child_node)
-        child_node.parent_node = self
-    
-    def add_line(self, line):
-        self.lines.append(line)
+class NodeItem(QGraphicsObject):
+    """节点的图形项，形状、文字和交互点都在paint中绘制
+
+    每个可见节点在场景中只有这一个图形项，node为数据模型中的节点。文字排版由QStaticText缓存，
+    只在内容或宽度变化时重新排版；交互点只在节点选中或鼠标悬停时绘制和检测，
+    拖拽交互点调整大小或连线也由这里处理。
+    """
     
-    def get_data(self):
-        # 返回节点数据用于保存
-        data = {
-            "text": self.text,
-            "pos": {"x": self.pos.x(), "y": self.pos.y()},
-            "width": self.width,
-            "height": self.height,
-            "shape_type": self.get_shape_type(),
-            "children": []
-        }
-        for child in self.child_nodes:
-            data["children"].append(child.get_data())
-        return data
+    TEXT_MARGIN = 10
+    # 缩放比例低于此值时只绘制简单的方框，不绘制文字和交互点
+    DETAIL_LEVEL = 0.4
+    COLORS = {"ellipse": QColor(255, 255, 200), "rect": QColor(200, 255, 200)}
     
-    def get_shape_type(self):
-        return "base"
-
-class EllipseNode(MindMapNode):
-    def __init__(self, text, pos, width=120, height=80, parent=None):
-        super().__init__(text, pos, width, height, parent)
-        self.shape_item = QGraphicsEllipseItem(-width/2, -height/2, width, height)
-        self.shape_item.setPos(pos)
-        self.shape_item.setBrush(QBrush(QColor(255, 255, 200)))
-        self.shape_item.setPen(QPen(Qt.black, 2))
-        self.shape_item.setFlag(QGraphicsItem.ItemIsMovable)
-        self.shape_item.setFlag(QGraphicsItem.ItemIsSelectable)
-        self.shape_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
-        
-        # 添加文字
-        self.text_item = QGraphicsTextItem(text, self.shape_item)
-        self.text_item.setPos(-width/2 + 10, -height/2 + 10)
-        self.text_item.setFont(QFont("Arial", 10))
-        
-        # 存储原始对象的引用，用于事件处理
-        self.shape_item.node = self
+    def __init__(self, mind_map, node):
+        super().__init__()
+        self.mind_map = mind_map
+        self.node = node
+        self.shape_type = node.shape_type
+        self.rect = QRectF(-node.width/2, -node.height/2, node.width, node.height)
+        self.brush = QBrush(self.COLORS.get(node.shape_type, self.COLORS["ellipse"]))
+        self.pen = QPen(Qt.black, 2)
+        self.font = QFont("Arial", 10)
+        self.static_text = QStaticText()
+        self.static_text.setTextFormat(Qt.PlainText)
+        self.hovered = False
+        self.hover_point = None
+        self.hidden_count = 0  # 折叠时隐藏的节点数
+        self.points = InteractionPoint.all_for(node)
+        # 拖拽交互点时的状态
+        self.drag_point = None
+        self.drag_start_pos = None
+        self.drag_start_size = None
+        self.drag_line = None
+        # 按住Shift拖动时整个子树跟随移动
+        self.subtree_drag_pos = None
+        
+        self.setFlag(QGraphicsItem.ItemIsMovable)
+        self.setFlag(QGraphicsItem.ItemIsSelectable)
+        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
+        self.setAcceptHoverEvents(True)
+        # 节点内容很少变化，按设备坐标缓存绘制结果，平移时直接复用
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        self.setPos(node.x, node.y)
+        self.set_text(node.text)
+    
+    def set_text(self, text):
+        self.static_text.setText(text)
+        self.static_text.setTextWidth(max(0, self.rect.width() - 2 * self.TEXT_MARGIN))
+        self.update()
+    
+    def set_size(self, width, height):
+        self.prepareGeometryChange()
+        self.rect = QRectF(-width/2, -height/2, width, height)
+        self.static_text.setTextWidth(max(0, width - 2 * self.TEXT_MARGIN))
+        self.update()
+    
+    def handles_visible(self):
+        return self.isSelected() or self.hovered
+    
+    def boundingRect(self):
+        # 始终包含交互点和边框，显示交互点时不需要改变包围盒
+        margin = InteractionPoint.SIZE / 2 + 3
+        return self.rect.adjusted(-margin, -margin, margin, margin)
+    
+    def outline(self):
+        path = QPainterPath()
+        if self.shape_type == "rect":
+            path.addRect(self.rect)
+        else:
+            path.addEllipse(self.rect)
+        return path
+    
+    def shape(self):
+        # 交互点显示时才参与点击检测
+        path = self.outline()
+        if self.handles_visible():
+            for point in self.points:
+                path.addRect(point.rect())
+        return path
+    
+    def paint(self, painter, option, widget=None):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.DETAIL_LEVEL:
+            # 缩小显示时节点只有几个像素，画成无边框的方框即可
+            painter.fillRect(self.rect, Qt.darkGray if self.isSelected() else self.brush.color().darker(120))
+            return
+        
+        painter.setBrush(self.brush)
+        painter.setPen(self.pen)
+        if self.shape_type == "rect":
+            painter.drawRect(self.rect)
+        else:
+            painter.drawEllipse(self.rect)
+        
+        painter.setFont(self.font)
+        painter.save()
+        painter.setClipRect(self.rect)
+        painter.drawStaticText(QPointF(self.rect.left() + self.TEXT_MARGIN, self.rect.top() + self.TEXT_MARGIN),
+                               self.static_text)
+        painter.restore()
+        
+        if self.node.collapsed:
+            # 折叠的节点在右下角显示隐藏的节点数
+            painter.setPen(QPen(Qt.darkGray))
+            painter.drawText(self.rect.adjusted(0, 0, -self.TEXT_MARGIN, -4), Qt.AlignRight | Qt.AlignBottom,
+                             f"+{self.hidden_count}")
+        
+        if self.isSelected():
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(Qt.black, 1, Qt.DashLine))
+            painter.drawRect(self.rect)
+        
+        if self.handles_visible():
+            painter.setPen(Qt.NoPen)
+            for point in self.points:
+                painter.setBrush(point.color())
+                painter.drawEllipse(point.rect())
+    
+    def point_at(self, pos, point_type=None):
+        """返回节点坐标pos处可见的交互点"""
+        if not self.handles_visible():
+            return None
+        for point in self.points:
+            if (point_type is None or point.point_type == point_type) and point.contains(pos):
+                return point
+        return None
     
     def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemPositionChange and self.shape_item.scene():
-            # 更新连接线的位置
-            for line in self.lines:
-                line.update_position()
-        return value
-    
-    def get_shape_type(self):
-        return "ellipse"
+        if change == QGraphicsItem.ItemPositionHasChanged and self.scene():
+            self.mind_map.node_item_moved(self)
+            if self.subtree_drag_pos is not None:
+                delta = self.pos() - self.subtree_drag_pos
+                self.subtree_drag_pos = self.pos()
+                self.mind_map.move_subtree(self.node, delta.x(), delta.y())
+        elif change == QGraphicsItem.ItemSelectedHasChanged:
+            self.update()
+        return super().itemChange(change, value)
+    
+    def hoverEnterEvent(self, event):
+        self.hovered = True
+        self.update()
+        super().hoverEnterEvent(event)
+    
+    def hoverMoveEvent(self, event):
+        point = self.point_at(event.pos())
+        if point is not self.hover_point:
+            self.hover_point = point
+            if point:
+                self.setCursor(point.cursor_shape())
+            else:
+                self.unsetCursor()
+        super().hoverMoveEvent(event)
+    
+    def hoverLeaveEvent(self, event):
+        self.hovered = False
+        self.hover_point = None
+        self.unsetCursor()
+        self.update()
+        super().hoverLeaveEvent(event)
+    
+    def mousePressEvent(self, event):
+        point = self.point_at(event.pos()) if event.button() == Qt.LeftButton else None
+        self.mind_map.begin_gesture()
+        if point is None:
+            if event.button() == Qt.LeftButton and event.modifiers() & Qt.ShiftModifier:
+                self.subtree_drag_pos = self.pos()
+            super().mousePressEvent(event)
+            return
+        self.drag_point = point
+        self.drag_start_pos = event.scenePos()
+        self.drag_start_size = (self.node.width, self.node.height)
+        if point.point_type == InteractionPoint.CONNECT:
+            # 创建临时连线
+            start = self.mapToScene(point.offset())
+            self.drag_line = QGraphicsLineItem(start.x(), start.y(), start.x(), start.y())
+            self.drag_line.setPen(QPen(Qt.DashLine))
+            self.scene().addItem(self.drag_line)
+        event.accept()
+    
+    def mouseMoveEvent(self, event):
+        point = self.drag_point
+        if point is None:
+            super().mouseMoveEvent(event)
+            return
+        if point.point_type == InteractionPoint.RESIZE:
+            dx = event.scenePos().x() - self.drag_start_pos.x()
+            dy = event.scenePos().y() - self.drag_start_pos.y()
+            new_width, new_height = point.resized(dx, dy, *self.drag_start_size)
+            if new_width != self.node.width or new_height != self.node.height:
+                self.mind_map.push_resize(self.node, new_width, new_height)
+        elif self.drag_line:
+            line = self.drag_line.line()
+            self.drag_line.setLine(line.x1(), line.y1(), event.scenePos().x(), event.scenePos().y())
+    
+    def mouseReleaseEvent(self, event):
+        point = self.drag_point
+        if point is None:
+            self.subtree_drag_pos = None
+            super().mouseReleaseEvent(event)
+            # 拖动结束后把移动记录为一条命令
+            self.mind_map.end_move()
+            return
+        if self.drag_line:
+            self.scene().removeItem(self.drag_line)
+            self.drag_line = None
+            # 释放在其他节点上时创建连线
+            target = self.mind_map.node_at(event.scenePos())
+            if target and target is not self.node:
+                self.mind_map.create_line(self.node, target)
+        self.drag_point = None
+        self.drag_start_pos = None
+        self.drag_start_size = None
 
-class RectNode(MindMapNode):
-    def __init__(self, text, pos, width=120, height=80, parent=None):
-        super().__init__(text, pos, width, height, parent)
-        self.shape_item = QGraphicsRectItem(-width/2, -height/2, width, height)
-        self.shape_item.setPos(pos)
-        self.shape_item.setBrush(QBrush(QColor(200, 255, 200)))
-        self.shape_item.setPen(QPen(Qt.black, 2))
-        self.shape_item.setFlag(QGraphicsItem.ItemIsMovable)
-        self.shape_item.setFlag(QGraphicsItem.ItemIsSelectable)
-        self.shape_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
-        
-        # 添加文字
-        self.text_item = QGraphicsTextItem(text, self.shape_item)
-        self.text_item.setPos(-width/2 + 10, -height/2 + 10)
-        self.text_item.setFont(QFont("Arial", 10))
-        
-        # 存储原始对象的引用，用于事件处理
-        self.shape_item.node = self
+class MindMapView(QGraphicsView):
+    """思维导图视图：滚轮缩放，中键拖动平移"""
     
-    def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemPositionChange and self.shape_item.scene():
-            # 更新连接线的位置
-            for line in self.lines:
-                line.update_position()
-        return value
-    
-    def get_shape_type(self):
-        return "rect"
+    MIN_SCALE = 0.05
+    MAX_SCALE = 4.0
+    ZOOM_STEP = 1.15
+    
+    def __init__(self, scene, parent=None):
+        super().__init__(scene, parent)
+        self.pan_start = None
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        # 只重绘变化区域的包围矩形，大量节点移动或平移时比逐项计算更新区域更快
+        self.setViewportUpdateMode(QGraphicsView.BoundingRectViewportUpdate)
+        # 节点的包围盒已留出边框的余量
+        self.setOptimizationFlag(QGraphicsView.DontAdjustForAntialiasing)
+        self.update_render_hints()
+    
+    def current_scale(self):
+        return self.transform().m11()
+    
+    def zoom(self, factor):
+        scale = self.current_scale()
+        factor = max(self.MIN_SCALE / scale, min(self.MAX_SCALE / scale, factor))
+        self.scale(factor, factor)
+        self.update_render_hints()
+    
+    def reset_zoom(self):
+        self.resetTransform()
+        self.update_render_hints()
+    
+    def update_render_hints(self):
+        # 缩小到只绘制简单方框时关闭抗锯齿
+        self.setRenderHint(QPainter.Antialiasing, self.current_scale() >= NodeItem.DETAIL_LEVEL)
+    
+    def wheelEvent(self, event):
+        delta = event.angleDelta().y()
+        if delta == 0:
+            super().wheelEvent(event)
+            return
+        self.zoom(self.ZOOM_STEP ** (delta / 120))
+        event.accept()
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MiddleButton:
+            self.pan_start = event.pos()
+            self.viewport().setCursor(Qt.ClosedHandCursor)
+            event.accept()
+            return
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        if self.pan_start is not None:
+            delta = event.pos() - self.pan_start
+            self.pan_start = event.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+            event.accept()
+            return
+        super().mouseMoveEvent(event)
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MiddleButton and self.pan_start is not None:
+            self.pan_start = None
+            self.viewport().unsetCursor()
+            event.accept()
+            return
+        super().mouseReleaseEvent(event)
+    
+    def keyPressEvent(self, event):
+        if event.modifiers() & Qt.ControlModifier and event.key() == Qt.Key_0:
+            self.reset_zoom()
+            return
+        super().keyPressEvent(event)
 
 class MindMapLine(QGraphicsLineItem):
-    def __init__(self, start_node, end_node, parent=None):
+    """连线的图形项，model_line为数据模型中的连线，两端位置从模型节点读取"""
+    
+    def __init__(self, model_line, parent=None):
         super().__init__(parent)
-        self.start_node = start_node
-        self.end_node = end_node
+        self.model_line = model_line
         self.setPen(QPen(Qt.black, 2))
         self.update_position()
-        
-        # 将线添加到节点
-        start_node.add_line(self)
-        end_node.add_line(self)
     
     def update_position(self):
         # 更新线的位置
-        if hasattr(self.start_node, 'shape_item'):
-            start_pos = self.start_node.shape_item.pos()
-        else:
-            start_pos = self.start_node.pos()
-            
-        if hasattr(self.end_node, 'shape_item'):
-            end_pos = self.end_node.shape_item.pos()
-        else:
-            end_pos = self.end_node.pos()
-            
-        self.setLine(start_pos.x(), start_pos.y(), end_pos.x(), end_pos.y())
+        start = self.model_line.start
+        end = self.model_line.end
+        self.setLine(start.x, start.y, end.x, end.y)
         
     def get_data(self):
         # 返回连线数据用于保存
-        return {
-            "start_node_id": id(self.start_node),
-            "end_node_id": id(self.end_node)
-        }
+        return self.model_line.get_data()
 
 class FreeText(QGraphicsTextItem):
-    def __init__(self, text, pos, parent=None):
-        super().__init__(text, parent)
-        self.setPos(pos)
+    """独立文本的图形项，拖动和直接输入的修改写回数据模型"""
+    
+    def __init__(self, mind_map, model_text, parent=None):
+        super().__init__(model_text.text, parent)
+        self.mind_map = mind_map
+        self.model_text = model_text
+        self.setPos(model_text.x, model_text.y)
         self.setFont(QFont("Arial", 10))
         self.setFlag(QGraphicsItem.ItemIsMovable)
         self.setFlag(QGraphicsItem.ItemIsSelectable)
+        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
         self.setTextInteractionFlags(Qt.TextEditorInteraction)
+        self.document().contentsChanged.connect(self.on_contents_changed)
+    
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            self.mind_map.model.move_free_text(self.model_text, self.pos().x(), self.pos().y())
+        return super().itemChange(change, value)
+    
+    def on_contents_changed(self):
+        self.mind_map.model.edit_free_text(self.model_text, self.toPlainText())
         
     def get_data(self):
         # 返回文本数据用于保存
-        return {
-            "text": self.toPlainText(),
-            "pos": {"x": self.pos().x(), "y": self.pos().y()}
-        }
+        return self.model_text.get_data()
 
-class MindMap(QWidget):
+class MindMap(QWidget, ModelObserver):
+    """思维导图的视图
+
+    数据保存在MindMapModel中，这里只根据模型的通知维护图形项：
+    只为未被折叠的节点和两端都可见的连线创建图形项，用户操作以命令的形式修改模型。
+    """
+    
+    # 分批加载时每批创建的节点或连线数
+    LOAD_BATCH_SIZE = 2000
+    # 拖动节点时连线的更新间隔（毫秒），约为一帧
+    EDGE_UPDATE_INTERVAL = 16
+    # 默认保留的撤销步数
+    HISTORY_LIMIT = 200
+    # 节点数达到此值时在后台线程中计算布局
+    LAYOUT_THREAD_THRESHOLD = 2000
+    # 布局动画的帧数；移动的节点超过ANIMATION_LIMIT时不做动画，分批直接移动
+    ANIMATION_FRAMES = 12
+    ANIMATION_LIMIT = 3000
+    # 布局方式，与工具栏中的选项对应，None为手动布局
+    LAYOUT_MODES = [None, TIDY, RADIAL, BALANCED]
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
@@ -166,13 +382,74 @@ class MindMap(QWidget):
         
         # 创建图形视图和场景
         self.scene = QGraphicsScene()
-        self.view = QGraphicsView(self.scene)
-        self.view.setRenderHint(QPainter.Antialiasing)
+        self.view = MindMapView(self.scene)
         self.view.setDragMode(QGraphicsView.RubberBandDrag)
         self.layout.addWidget(self.view)
         
+        # 数据模型，图形项按编号索引，只包含可见的部分
+        self.model = MindMapModel()
+        self.model.add_observer(self)
+        self.node_items = {}  # 节点编号 -> NodeItem
+        self.line_items = {}  # 连线编号 -> MindMapLine
+        self.text_items = {}  # ModelText -> FreeText
+        # 节点和连线图形项的包围盒索引，用于点击检测
+        self.spatial_index = SpatialIndex()
+        
+        # 撤销栈，命令只保存变化的部分
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(self.HISTORY_LIMIT)
+        self.replay_depth = 0  # 大于0时正在执行命令，不记录移动
+        self.gesture = 0  # 当前鼠标操作的序号，同一次操作的命令才合并
+        self.move_start = {}  # 本次拖动中移动过的节点编号 -> 原位置
+        # 自动保存日志，由应用设置
+        self.journal = None
+        
+        # 移动过的模型节点，连线在下一帧统一更新
+        self.dirty_nodes = set()
+        self.edge_timer = QTimer(self)
+        self.edge_timer.setSingleShot(True)
+        self.edge_timer.setInterval(self.EDGE_UPDATE_INTERVAL)
+        self.edge_timer.timeout.connect(self.update_edges)
+        # 需要重新统计隐藏节点数的折叠节点
+        self.count_dirty = set()
+        self.count_timer = QTimer(self)
+        self.count_timer.setSingleShot(True)
+        self.count_timer.timeout.connect(self.refresh_hidden_counts)
+        
+        # 自动布局，节点较多时在后台线程计算，结果分帧移动到新位置
+        self.layout_mode = None
+        self.layout_engine = TreeLayout()
+        self.layout_serial = 0  # 清空思维导图后丢弃仍在计算的旧结果
+        self.layout_pending = False
+        self.layout_worker = LayoutWorker(self)
+        self.layout_worker.layout_finished.connect(self.on_layout_finished)
+        self.layout_worker.finished.connect(self.on_layout_worker_done)
+        self.layout_timer = QTimer(self)
+        self.layout_timer.setSingleShot(True)
+        self.layout_timer.timeout.connect(self.run_layout)
+        # 布局引擎保存整棵树，之后只交给它上次布局以来的变化；
+        # layout_full为True时下次布局交给完整的树，此时不必记录变化
+        self.layout_full = True
+        self.layout_changes = set()  # 子节点、折叠状态或大小变化的模型节点
+        self.layout_removed = set()  # 删除的节点编号
+        self.layout_moved = set()  # 不是由布局移动的节点编号
+        self.layout_depth = 0  # 大于0时正在按布局结果移动节点
+        self.animation = {}  # 节点编号 -> ((起始x, 起始y), (目标x, 目标y))
+        self.animation_queue = []  # 不做动画时尚未移动的节点
+        self.animation_recorded = False  # 动画的移动是否已由命令记录
+        self.animation_frame = 0
+        self.animation_timer = QTimer(self)
+        self.animation_timer.setInterval(self.EDGE_UPDATE_INTERVAL)
+        self.animation_timer.timeout.connect(self.next_animation_frame)
+        
+        # 二进制文件分批加载的状态，load_steps为模型逐批读取的生成器
+        self.loader = None
+        self.load_steps = None
+        self.load_progress = None
+        self.load_timer = QTimer(self)
+        self.load_timer.timeout.connect(self.load_next_batch)
+        
         # 设置初始节点
-        self.root_node = None
         self.create_root_node("中心主题")
         
         # 当前选中的节点
@@ -181,11 +458,6 @@ class MindMap(QWidget):
         # 文件路径
         self.current_file_path = None
         
-        # 存储所有节点、连线和文本
-        self.nodes = []
-        self.lines = []
-        self.texts = []
-        
         # 连接事件
         self.view.setContextMenuPolicy(Qt.CustomContextMenu)
         self.view.customContextMenuRequested.connect(self.show_context_menu)
@@ -280,6 +552,22 @@ class MindMap(QWidget):
         self.load_action.triggered.connect(self.load_mind_map)
         self.toolbar.addAction(self.load_action)
         
+        # 自动布局
+        layout_label = QLabel("布局: ")
+        self.toolbar.addWidget(layout_label)
+        
+        self.layout_combo = QComboBox()
+        for name in ["手动", "树形", "径向", "左右平衡"]:
+            self.layout_combo.addItem(name)
+        self.layout_combo.currentIndexChanged.connect(self.layout_changed)
+        self.toolbar.addWidget(self.layout_combo)
+        
+        self.toolbar.addSeparator()
+        
+        # 加载进度
+        self.load_label = QLabel("")
+        self.toolbar.addWidget(self.load_label)
+        
         self.layout.addWidget(self.toolbar)
         
     def set_mode(self, mode):
@@ -303,6 +591,181 @@ class MindMap(QWidget):
         else:
             self.current_shape = "rect"
     
+    def layout_changed(self, index):
+        self.layout_mode = self.LAYOUT_MODES[index]
+        if not self.layout_mode:
+            # 手动布局时不记录变化，重新开启时完整布局
+            self.reset_layout_changes()
+        self.schedule_layout()
+    
+    def schedule_layout(self):
+        # 自动布局时，结构变化后在事件循环空闲时重新布局，多次变化合并为一次
+        if self.layout_mode:
+            self.layout_timer.start(0)
+    
+    def reset_layout_changes(self):
+        self.layout_full = True
+        self.layout_changes = set()
+        self.layout_removed = set()
+        self.layout_moved = set()
+    
+    def track_layout(self, *nodes):
+        # 记录需要交给布局的变化；将要完整布局时不必记录
+        if self.layout_mode and not self.layout_full:
+            self.layout_changes.update(nodes)
+    
+    def take_layout_snapshot(self):
+        # 第一次布局或清空后交给布局完整的树，之后只交给变化的部分
+        root = self.model.root
+        if self.layout_full:
+            snapshot = TreeSnapshot.from_node(root)
+        else:
+            snapshot = TreeSnapshot.from_changes(root, self.layout_changes, self.layout_removed, self.layout_moved)
+        self.reset_layout_changes()
+        self.layout_full = False
+        return snapshot
+    
+    def can_layout(self):
+        return bool(self.layout_mode and self.model.root and not self.loader
+                    and not self.layout_worker.isRunning())
+    
+    def layout_in_background(self):
+        # 完整布局和径向布局要处理所有节点，节点较多时交给后台线程；
+        # 增量布局只重新计算变化的部分，直接在当前线程完成
+        return ((self.layout_full or self.layout_mode == RADIAL)
+                and len(self.model.nodes) >= self.LAYOUT_THREAD_THRESHOLD)
+    
+    def run_layout(self):
+        if not self.layout_mode or not self.model.root or self.loader:
+            return
+        if self.layout_worker.isRunning():
+            self.layout_pending = True
+            return
+        if self.layout_in_background():
+            self.layout_worker.start_layout(self.layout_serial, self.layout_engine,
+                                            self.take_layout_snapshot(), self.layout_mode)
+        else:
+            self.animate_to(self.layout_engine.compute(self.take_layout_snapshot(), self.layout_mode))
+    
+    def on_layout_finished(self, serial, positions):
+        if serial == self.layout_serial:
+            self.animate_to(positions)
+    
+    def on_layout_worker_done(self):
+        if self.layout_pending:
+            self.layout_pending = False
+            self.run_layout()
+    
+    def push_with_layout(self, text, *commands):
+        # 执行修改结构的命令；自动布局时随后的布局移动与命令合为一条宏命令，撤销时一起撤销
+        self.finish_animation()
+        if not self.can_layout() or self.layout_in_background():
+            if len(commands) == 1:
+                self.undo_stack.push(commands[0])
+            else:
+                self.undo_stack.beginMacro(text)
+                for command in commands:
+                    self.undo_stack.push(command)
+                self.undo_stack.endMacro()
+            self.schedule_layout()
+            return
+        self.undo_stack.beginMacro(text)
+        for command in commands:
+            self.undo_stack.push(command)
+        moves = self.layout_moves(self.layout_engine.compute(self.take_layout_snapshot(), self.layout_mode))
+        if moves:
+            self.gesture += 1
+            with self.applying_layout():
+                self.undo_stack.push(MoveNodesCommand(self, moves, self.gesture, "自动布局"))
+        self.undo_stack.endMacro()
+        self.start_animation(moves, True)
+    
+    def layout_moves(self, positions):
+        # 只移动位置发生变化的节点
+        moves = {}
+        for node_id, (x, y) in positions.items():
+            node = self.model.nodes.get(node_id)
+            if node is not None and (abs(node.x - x) > 0.5 or abs(node.y - y) > 0.5):
+                moves[node_id] = ((node.x, node.y), (x, y))
+        return moves
+    
+    def animate_to(self, positions):
+        # 没有对应命令的布局，动画结束时记录为一条移动命令
+        self.finish_animation()
+        self.start_animation(self.layout_moves(positions), False)
+    
+    def start_animation(self, moves, recorded):
+        if not moves:
+            return
+        if len(moves) > self.ANIMATION_LIMIT:
+            if recorded:
+                # 命令已经把节点移到目标位置
+                return
+            self.animation_queue = list(moves)
+        else:
+            self.animation_queue = []
+            if recorded:
+                # 命令已经把节点移到目标位置，先放回起始位置再播放动画
+                with self.applying_layout():
+                    for node_id, (start, _) in moves.items():
+                        self.model.move_node(self.model.nodes[node_id], *start)
+        self.animation = moves
+        self.animation_recorded = recorded
+        self.animation_frame = 0
+        self.animation_timer.start()
+    
+    def next_animation_frame(self):
+        # 每帧移动所有节点一小步；节点太多时每帧直接移动一批节点
+        nodes = self.model.nodes
+        with self.applying_layout():
+            if self.animation_queue:
+                batch = self.animation_queue[-self.LOAD_BATCH_SIZE:]
+                del self.animation_queue[-self.LOAD_BATCH_SIZE:]
+                for node_id in batch:
+                    node = nodes.get(node_id)
+                    if node is not None:
+                        self.model.move_node(node, *self.animation[node_id][1])
+                done = not self.animation_queue
+            else:
+                self.animation_frame += 1
+                t = self.animation_frame / self.ANIMATION_FRAMES
+                eased = 1 - (1 - t) ** 3
+                for node_id, ((start_x, start_y), (end_x, end_y)) in self.animation.items():
+                    node = nodes.get(node_id)
+                    if node is not None:
+                        self.model.move_node(node, start_x + (end_x - start_x) * eased,
+                                             start_y + (end_y - start_y) * eased)
+                done = self.animation_frame >= self.ANIMATION_FRAMES
+        if done:
+            self.finish_animation()
+    
+    def finish_animation(self):
+        # 把所有节点移动到目标位置；还没有命令记录时，整次布局记录为一条移动命令
+        if not self.animation:
+            return
+        self.animation_timer.stop()
+        moves = {}
+        with self.applying_layout():
+            for node_id, (start, end) in self.animation.items():
+                node = self.model.nodes.get(node_id)
+                if node is not None:
+                    self.model.move_node(node, *end)
+                    moves[node_id] = (start, end)
+        self.animation = {}
+        self.animation_queue = []
+        if moves and not self.animation_recorded:
+            self.gesture += 1
+            self.undo_stack.push(MoveNodesCommand(self, moves, self.gesture, "自动布局"))
+    
+    def undo(self):
+        # 先完成布局动画，命令按最终位置撤销
+        self.finish_animation()
+        self.undo_stack.undo()
+    
+    def redo(self):
+        self.finish_animation()
+        self.undo_stack.redo()
+    
     def size_changed(self):
         try:
             self.node_width = int(self.width_combo.currentText())
@@ -310,48 +773,339 @@ class MindMap(QWidget):
         except ValueError:
             pass
     
+    def clear_map(self):
+        # 清空数据模型，图形项和索引在model_reset中清除
+        self.cancel_loading()
+        self.layout_timer.stop()
+        self.animation_timer.stop()
+        self.animation = {}
+        self.animation_queue = []
+        self.layout_serial += 1
+        self.layout_engine = TreeLayout()
+        self.reset_layout_changes()
+        self.undo_stack.clear()
+        if self.journal:
+            self.journal.reset()
+        self.move_start.clear()
+        self.model.clear()
+    
+    def model_reset(self, model):
+        # 模型被清空，删除所有图形项和索引
+        self.edge_timer.stop()
+        self.dirty_nodes.clear()
+        self.count_dirty.clear()
+        self.scene.clear()
+        self.node_items = {}
+        self.line_items = {}
+        self.text_items = {}
+        self.spatial_index.clear()
+        self.reset_layout_changes()
+    
+    def node_added(self, node):
+        # 父节点可见且未折叠时为节点创建图形项
+        parent = node.parent
+        if parent is None:
+            self.show_subtree(node)
+        elif parent.node_id in self.node_items and not parent.collapsed:
+            self.show_subtree(node)
+            self.track_layout(node, parent)
+        elif parent.node_id in self.node_items:
+            self.mark_count_dirty(parent)
+    
+    def node_removed(self, node):
+        if self.hide_node(node) and self.layout_mode and not self.layout_full:
+            self.layout_removed.add(node.node_id)
+    
+    def node_moved(self, node):
+        # 立即更新节点的索引，连线留到下一帧统一更新
+        # 同时拖动多个节点时，每条连线每帧只计算一次
+        item = self.node_items.get(node.node_id)
+        if item is None:
+            return
+        if not self.layout_depth and self.layout_mode and not self.layout_full:
+            self.layout_moved.add(node.node_id)
+        if item.x() != node.x or item.y() != node.y:
+            item.setPos(node.x, node.y)
+        self.spatial_index.update(item, item.sceneBoundingRect())
+        if node.lines:
+            self.dirty_nodes.add(node)
+            if not self.edge_timer.isActive():
+                self.edge_timer.start()
+    
+    def node_resized(self, node):
+        # 只修改现有图形项的几何形状
+        item = self.node_items.get(node.node_id)
+        if item is not None:
+            item.set_size(node.width, node.height)
+            self.spatial_index.update(item, item.sceneBoundingRect())
+            self.track_layout(node)
+    
+    def node_text_changed(self, node):
+        item = self.node_items.get(node.node_id)
+        if item is not None:
+            item.set_text(node.text)
+    
+    def node_collapsed_changed(self, node):
+        # 折叠时删除子孙的图形项，展开时重新创建，其中折叠的节点仍保持折叠
+        item = self.node_items.get(node.node_id)
+        if item is None:
+            return
+        for child in node.children:
+            if node.collapsed:
+                self.hide_subtree(child)
+            else:
+                # 重新可见的子孙交给布局
+                self.track_layout(*self.show_subtree(child))
+        if node.collapsed:
+            self.mark_count_dirty(node)
+        self.track_layout(node)
+        item.update()
+    
+    def line_added(self, line):
+        self.show_line(line)
+    
+    def line_removed(self, line):
+        self.hide_line(line)
+    
+    def text_added(self, text):
+        text_item = FreeText(self, text)
+        self.scene.addItem(text_item)
+        self.text_items[text] = text_item
+    
+    def text_removed(self, text):
+        text_item = self.text_items.pop(text, None)
+        if text_item is not None:
+            self.scene.removeItem(text_item)
+    
+    def text_changed(self, text):
+        # 修改来自文本项本身时内容和位置已经一致
+        text_item = self.text_items.get(text)
+        if text_item is None:
+            return
+        if text_item.toPlainText() != text.text:
+            text_item.setPlainText(text.text)
+        if text_item.x() != text.x or text_item.y() != text.y:
+            text_item.setPos(text.x, text.y)
+    
+    def show_subtree(self, node):
+        # 为节点及其未折叠的子孙创建图形项，已有图形项的子树不再重复遍历
+        shown = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.node_id in self.node_items:
+                continue
+            item = NodeItem(self, current)
+            self.scene.addItem(item)
+            self.node_items[current.node_id] = item
+            self.spatial_index.update(item, item.sceneBoundingRect())
+            shown.append(current)
+            if current.collapsed:
+                self.mark_count_dirty(current)
+            else:
+                stack.extend(current.children)
+        # 两端都可见的连线
+        for current in shown:
+            for line in current.lines:
+                self.show_line(line)
+        return shown
+    
+    def hide_subtree(self, node):
+        # 没有图形项的节点其子孙也没有图形项，不再继续遍历
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if self.hide_node(current):
+                stack.extend(current.children)
+    
+    def hide_node(self, node):
+        # 删除节点及其连线的图形项，返回节点原来是否有图形项
+        item = self.node_items.pop(node.node_id, None)
+        if item is None:
+            return False
+        for line in node.lines:
+            self.hide_line(line)
+        self.dirty_nodes.discard(node)
+        self.count_dirty.discard(node)
+        self.spatial_index.remove(item)
+        self.scene.removeItem(item)
+        return True
+    
+    def show_line(self, line):
+        if line.line_id in self.line_items:
+            return
+        if line.start.node_id not in self.node_items or line.end.node_id not in self.node_items:
+            return
+        item = MindMapLine(line)
+        self.scene.addItem(item)
+        self.line_items[line.line_id] = item
+        self.spatial_index.update(item, item.sceneBoundingRect())
+    
+    def hide_line(self, line):
+        item = self.line_items.pop(line.line_id, None)
+        if item is not None:
+            self.spatial_index.remove(item)
+            self.scene.removeItem(item)
+    
+    def mark_count_dirty(self, node):
+        # 折叠节点显示的隐藏节点数在事件循环空闲时统一重新统计
+        self.count_dirty.add(node)
+        if not self.count_timer.isActive():
+            self.count_timer.start(0)
+    
+    def refresh_hidden_counts(self):
+        # 分批加载时子孙还没有读完，等加载结束再统计
+        if self.loader:
+            return
+        for node in self.count_dirty:
+            item = self.node_items.get(node.node_id)
+            if item is not None and node.collapsed:
+                item.hidden_count = self.model.descendant_count(node)
+                item.update()
+        self.count_dirty.clear()
+    
+    def node_item_moved(self, item):
+        # 图形项被拖动后写回模型，模型的通知再更新索引和连线
+        node = item.node
+        self.record_move_start(node)
+        self.model.move_node(node, item.x(), item.y())
+    
+    def record_move_start(self, node):
+        # 记录用户本次拖动前的位置，执行命令和布局动画时不记录
+        if not self.replay_depth and node.node_id not in self.move_start:
+            self.move_start[node.node_id] = (node.x, node.y)
+    
+    def set_history_limit(self, limit):
+        # 修改撤销步数会清空已有的历史
+        self.undo_stack.clear()
+        self.undo_stack.setUndoLimit(limit)
+    
+    @contextmanager
+    def replaying(self):
+        # 执行命令期间的改动由命令本身记录
+        self.replay_depth += 1
+        try:
+            yield
+        finally:
+            self.replay_depth -= 1
+    
+    @contextmanager
+    def applying_layout(self):
+        # 按布局结果移动节点，不记录为用户的移动
+        self.layout_depth += 1
+        try:
+            with self.replaying():
+                yield
+        finally:
+            self.layout_depth -= 1
+    
+    def set_journal(self, journal):
+        self.journal = journal
+    
+    def log_change(self, command, forward):
+        # 命令执行或撤销后写入自动保存日志
+        if self.journal:
+            self.journal.log(command.change(forward), self.model.get_data, self.current_file_path)
+    
+    def restore_from_journal(self, recovery):
+        # 从快照和之后的日志恢复未保存的内容，日志末尾损坏的记录被忽略
+        self.load_map_data(recovery["data"])
+        with self.replaying(), self.model.batch():
+            for record in recovery["records"]:
+                try:
+                    self.model.apply_change(record)
+                except (KeyError, TypeError, ValueError):
+                    break
+        self.current_file_path = recovery.get("file_path")
+        if self.journal:
+            self.journal.compact(self.model.get_data(), self.current_file_path)
+    
+    def begin_gesture(self):
+        # 用户开始操作时先完成布局动画
+        self.finish_animation()
+        self.gesture += 1
+    
+    def end_move(self):
+        # 把本次拖动中位置变化的节点记录为一条移动命令
+        moves = {}
+        for node_id, old_pos in self.move_start.items():
+            node = self.model.nodes.get(node_id)
+            if node is not None and (node.x, node.y) != old_pos:
+                moves[node_id] = (old_pos, (node.x, node.y))
+        self.move_start.clear()
+        if moves:
+            self.undo_stack.push(MoveNodesCommand(self, moves, self.gesture))
+    
+    def push_resize(self, node, new_width, new_height):
+        # 调整节点大小并记录命令，同一次拖动中的调整合并
+        self.undo_stack.push(ResizeNodeCommand(self, node.node_id, (node.width, node.height),
+                                               (new_width, new_height), self.gesture))
+    
+    def toggle_collapsed(self, node):
+        # 折叠或展开后重新布局，与布局移动一起撤销
+        if node.collapsed:
+            self.push_with_layout("展开子节点", ExpandCommand(self, node.node_id))
+        elif node.children:
+            self.push_with_layout("折叠子节点", CollapseCommand(self, node.node_id))
+    
+    def move_subtree(self, node, dx, dy):
+        # 子孙跟随父节点移动，包括折叠隐藏的部分；已选中的节点由视图一起拖动，不重复移动
+        for child in node.children:
+            for current in self.model.subtree(child):
+                item = self.node_items.get(current.node_id)
+                if item is None or not item.isSelected():
+                    self.record_move_start(current)
+                    self.model.move_node(current, current.x + dx, current.y + dy)
+    
+    def update_edges(self):
+        # 更新移动过的节点的所有连线，两端都移动的连线只更新一次
+        self.edge_timer.stop()
+        lines = set()
+        for node in self.dirty_nodes:
+            lines |= node.lines
+        self.dirty_nodes.clear()
+        for line in lines:
+            item = self.line_items.get(line.line_id)
+            if item is not None:
+                item.update_position()
+                self.spatial_index.update(item, item.sceneBoundingRect())
+    
+    def new_node_data(self, node_id, text, pos, parent_node=None):
+        # 按当前的形状和大小设置生成新节点的数据
+        return {
+            "id": node_id,
+            "parent_id": parent_node.node_id if parent_node else None,
+            "text": text,
+            "pos": {"x": pos.x(), "y": pos.y()},
+            "width": self.node_width,
+            "height": self.node_height,
+            "shape_type": self.current_shape
+        }
+    
     def create_root_node(self, text):
         # 创建根节点
-        self.scene.clear()
-        self.nodes = []
-        self.lines = []
-        self.texts = []
-        
-        if self.current_shape == "ellipse":
-            self.root_node = EllipseNode(text, QPointF(0, 0), self.node_width, self.node_height)
-        else:
-            self.root_node = RectNode(text, QPointF(0, 0), self.node_width, self.node_height)
-            
-        self.scene.addItem(self.root_node.shape_item)
-        self.nodes.append(self.root_node)
-        
-        # 添加交互点
-        self.update_interaction_points(self.root_node)
-        
-        self.view.centerOn(self.root_node.shape_item)
-        return self.root_node
+        self.clear_map()
+        root = self.model.add_nodes([self.new_node_data(self.model.next_id, text, QPointF(0, 0))])[0]
+        self.model.root = root
+        self.center_on_root()
+        return root
     
     def create_node(self, text, pos, parent_node=None):
-        # 创建节点
-        if self.current_shape == "ellipse":
-            node = EllipseNode(text, pos, self.node_width, self.node_height)
-        else:
-            node = RectNode(text, pos, self.node_width, self.node_height)
-            
-        self.scene.addItem(node.shape_item)
-        self.nodes.append(node)
-        
-        # 添加交互点
-        self.update_interaction_points(node)
-        
-        # 如果有父节点，创建连接线并建立关系
+        # 创建节点，如果有父节点同时创建连接线，作为一条命令记录
+        node_id = self.model.next_id
+        nodes = [self.new_node_data(node_id, text, pos, parent_node)]
+        lines = []
         if parent_node:
-            parent_node.add_child(node)
-            line = MindMapLine(parent_node, node)
-            self.scene.addItem(line)
-            self.lines.append(line)
-        
-        return node
+            lines.append({"id": node_id + 1, "start_node_id": parent_node.node_id, "end_node_id": node_id})
+        add_command = AddSubtreeCommand(self, {"index": None, "nodes": nodes, "lines": lines})
+        if parent_node and parent_node.collapsed:
+            # 向折叠的节点添加子节点时先展开，撤销时一起撤销
+            self.push_with_layout("添加子节点", ExpandCommand(self, parent_node.node_id), add_command)
+        elif parent_node:
+            self.push_with_layout("添加节点", add_command)
+        else:
+            self.undo_stack.push(add_command)
+        return self.model.nodes[node_id]
         
     def create_free_node(self, pos):
         # 创建独立节点（不与其他节点相连）
@@ -365,45 +1119,18 @@ class MindMap(QWidget):
         # 创建独立文本
         text, ok = QInputDialog.getText(self, "添加文本", "请输入文本内容:")
         if ok and text:
-            text_item = FreeText(text, pos)
-            self.scene.addItem(text_item)
-            self.texts.append(text_item)
-            return text_item
+            model_text = ModelText(text, pos.x(), pos.y())
+            self.undo_stack.push(AddTextCommand(self, model_text))
+            return model_text
         return None
         
     def create_line(self, start_node, end_node):
         # 创建连接线
-        line = MindMapLine(start_node, end_node)
-        self.scene.addItem(line)
-        self.lines.append(line)
-        return line
-        
-    def update_interaction_points(self, node):
-        # 清除旧的交互点
-        scene = None
-        for point in node.interaction_points:
-            try:
-                if point.scene():
-                    scene = point.scene()
-                    scene.removeItem(point)
-            except RuntimeError:
-                # 对象可能已被删除，忽略错误
-                pass
-        node.interaction_points.clear()
-        
-        # 添加新的交互点
-        # 四角添加调整大小的交互点
-        resize_positions = ['top_left', 'top_right', 'bottom_right', 'bottom_left']
-        for pos in resize_positions:
-            point = InteractionPoint(node, pos, InteractionPoint.RESIZE, node.shape_item)
-            node.interaction_points.append(point)
-        
-        # 四边中点添加连接线的交互点
-        connect_positions = ['top', 'right', 'bottom', 'left']
-        for pos in connect_positions:
-            point = InteractionPoint(node, pos, InteractionPoint.CONNECT, node.shape_item)
-            node.interaction_points.append(point)
-    
+        line_id = self.model.next_id
+        self.undo_stack.push(AddLineCommand(self, {
+            "id": line_id, "start_node_id": start_node.node_id, "end_node_id": end_node.node_id}))
+        return self.model.lines[line_id]
+        
     def add_child_node(self):
         # 添加子节点
         items = self.scene.selectedItems()
@@ -414,11 +1141,10 @@ class MindMap(QWidget):
                 parent_node = item.node
                 # 计算新节点位置
                 offset_x = 150
-                offset_y = len(parent_node.child_nodes) * 80
-                if len(parent_node.child_nodes) % 2 == 0:
+                offset_y = len(parent_node.children) * 80
+                if len(parent_node.children) % 2 == 0:
                     offset_y = -offset_y
-                new_pos = QPointF(parent_node.shape_item.pos().x() + offset_x, 
-                                 parent_node.shape_item.pos().y() + offset_y)
+                new_pos = QPointF(parent_node.x + offset_x, parent_node.y + offset_y)
                 
                 # 创建新节点
                 text, ok = QInputDialog.getText(self, "添加子节点", "请输入节点内容:")
@@ -435,14 +1161,14 @@ class MindMap(QWidget):
             if hasattr(item, 'node'):
                 node = item.node
                 text, ok = QInputDialog.getText(self, "编辑节点", "请输入节点内容:", text=node.text)
-                if ok and text:
-                    node.text = text
-                    node.text_item.setPlainText(text)
+                if ok and text and text != node.text:
+                    self.undo_stack.push(EditTextCommand(self, node.node_id, node.text, text))
             # 如果是独立文本
             elif isinstance(item, FreeText):
-                text, ok = QInputDialog.getText(self, "编辑文本", "请输入文本内容:", text=item.toPlainText())
-                if ok and text:
-                    item.setPlainText(text)
+                old_text = item.toPlainText()
+                text, ok = QInputDialog.getText(self, "编辑文本", "请输入文本内容:", text=old_text)
+                if ok and text and text != old_text:
+                    self.undo_stack.push(EditFreeTextCommand(self, item.model_text, old_text, text))
     
     def delete_item(self):
         # 删除选中的项（节点、连线或文本）
@@ -453,56 +1179,55 @@ class MindMap(QWidget):
             # 如果是节点
             if hasattr(item, 'node'):
                 node = item.node
-                if node != self.root_node:
-                    self.delete_node(node)
+                if node is not self.model.root:
+                    self.push_with_layout("删除节点", DeleteSubtreeCommand(self, self.model.snapshot_subtree(node)))
             # 如果是连线
-            elif isinstance(item, QGraphicsLineItem):
-                # 从节点中移除连线
-                for line in self.lines:
-                    if line == item:
-                        if line in line.start_node.lines:
-                            line.start_node.lines.remove(line)
-                        if line in line.end_node.lines:
-                            line.end_node.lines.remove(line)
-                        self.scene.removeItem(line)
-                        self.lines.remove(line)
-                        break
+            elif isinstance(item, MindMapLine):
+                self.undo_stack.push(DeleteLineCommand(self, item.get_data()))
             # 如果是文本
             elif isinstance(item, FreeText):
-                self.scene.removeItem(item)
-                if item in self.texts:
-                    self.texts.remove(item)
-    
-    def delete_node(self, node):
-        # 删除节点
-        # 递归删除子节点
-        for child in node.child_nodes.copy():
-            self.delete_node(child)
-        
-        # 删除连接线
-        for line in node.lines.copy():
-            if line in self.lines:
-                self.lines.remove(line)
-            self.scene.removeItem(line)
-        
-        # 从父节点中移除
-        if node.parent_node:
-            node.parent_node.child_nodes.remove(node)
-        
-        # 从节点列表中移除
-        if node in self.nodes:
-            self.nodes.remove(node)
-        
-        # 删除节点
-        self.scene.removeItem(node.shape_item)
-        item.start_node.lines.remove(line)
+                self.undo_stack.push(DeleteTextCommand(self, item.model_text))
+    
+    def node_at(self, scene_pos):
+        # 返回位置上最上层的节点，只检查索引中同一格子的图形项
+        best = None
+        for obj in self.spatial_index.query_point(scene_pos):
+            if isinstance(obj, NodeItem) and obj.contains(obj.mapFromScene(scene_pos)):
+                if best is None or obj.node.node_id > best.node_id:
+                    best = obj.node
+        return best
+    
+    def interaction_point_at(self, scene_pos, point_type):
+        # 返回位置上指定类型的交互点，只有选中或悬停的节点显示交互点
+        for obj in self.spatial_index.query_point(scene_pos):
+            if isinstance(obj, NodeItem):
+                point = obj.point_at(obj.mapFromScene(scene_pos), point_type)
+                if point:
+                    return point
+        return None
+    
+    def line_at(self, scene_pos):
+        # 返回位置上的连线，先完成尚未更新的连线
+        if self.dirty_nodes:
+            self.update_edges()
+        for obj in self.spatial_index.query_point(scene_pos):
+            if isinstance(obj, MindMapLine) and obj.contains(obj.mapFromScene(scene_pos)):
+                return obj
+        return None
+    
+    def text_at(self, scene_pos):
+        # 返回位置上的独立文本
+        for text in reversed(self.model.texts):
+            text_item = self.text_items.get(text)
+            if text_item is not None and text_item.contains(text_item.mapFromScene(scene_pos)):
+                return text_item
+        return None
     
     def mousePressEvent(self, event):
         # 处理鼠标按下事件
         if event.button() == Qt.LeftButton:
             # 获取场景坐标
             scene_pos = self.view.mapToScene(event.pos())
-            items = self.scene.items(scene_pos)
             
             # 根据当前模式处理
             if self.current_mode == "node":
@@ -513,28 +1238,29 @@ class MindMap(QWidget):
                 self.create_free_text(scene_pos)
             elif self.current_mode == "line":
                 # 检查是否点击了交互点
-                for item in items:
-                    if isinstance(item, InteractionPoint) and item.point_type == InteractionPoint.CONNECT:
-                        self.line_start_node = item.parent_node
-                        self.line_start_point = item
-                        return
+                point = self.interaction_point_at(scene_pos, InteractionPoint.CONNECT)
+                if point:
+                    self.line_start_node = point.parent_node
+                    self.line_start_point = point
+                    return
                 
                 # 如果没有点击交互点，检查是否点击了节点
-                for item in items:
-                    if hasattr(item, 'node'):
-                        self.line_start_node = item.node
-                        self.line_start_point = None
-                        return
+                node = self.node_at(scene_pos)
+                if node:
+                    self.line_start_node = node
+                    self.line_start_point = None
+                    return
             elif self.current_mode == "select":
                 # 检查是否点击了调整大小的交互点
-                for item in items:
-                    if isinstance(item, InteractionPoint) and item.point_type == InteractionPoint.RESIZE:
-                        self.resize_node = item.parent_node
-                        self.resize_point = item
-                        self.resize_start_pos = scene_pos
-                        self.resize_start_width = item.parent_node.width
-                        self.resize_start_height = item.parent_node.height
-                        return
+                point = self.interaction_point_at(scene_pos, InteractionPoint.RESIZE)
+                if point:
+                    self.begin_gesture()
+                    self.resize_node = point.parent_node
+                    self.resize_point = point
+                    self.resize_start_pos = scene_pos
+                    self.resize_start_width = point.parent_node.width
+                    self.resize_start_height = point.parent_node.height
+                    return
         
         # 调用父类方法
         super().mousePressEvent(event)
@@ -551,66 +1277,11 @@ class MindMap(QWidget):
             dx = scene_pos.x() - self.resize_start_pos.x()
             dy = scene_pos.y() - self.resize_start_pos.y()
             
-            # 根据交互点位置调整大小
-            new_width = self.resize_start_width
-            new_height = self.resize_start_height
-            
-            if point.position in ["top_right", "bottom_right"]:
-                new_width = max(60, self.resize_start_width + dx * 2)
-            if point.position in ["top_left", "bottom_left"]:
-                new_width = max(60, self.resize_start_width - dx * 2)
-            if point.position in ["bottom_left", "bottom_right"]:
-                new_height = max(40, self.resize_start_height + dy * 2)
-            if point.position in ["top_left", "top_right"]:
-                new_height = max(40, self.resize_start_height - dy * 2)
+            new_width, new_height = point.resized(dx, dy, self.resize_start_width, self.resize_start_height)
             
             # 更新节点大小
             if new_width != node.width or new_height != node.height:
-                # 保存原始位置
-                pos = node.shape_item.pos()
-                
-                # 移除旧形状
-                scene = node.shape_item.scene()
-                if scene:
-                    scene.removeItem(node.shape_item)
-                
-                # 创建新形状
-                node.width = new_width
-                node.height = new_height
-                
-                if isinstance(node, EllipseNode):
-                    node.shape_item = QGraphicsEllipseItem(-new_width/2, -new_height/2, new_width, new_height)
-                else:  # RectNode
-                    node.shape_item = QGraphicsRectItem(-new_width/2, -new_height/2, new_width, new_height)
-                
-                # 设置属性
-                node.shape_item.setPos(pos)
-                if isinstance(node, EllipseNode):
-                    node.shape_item.setBrush(QBrush(QColor(255, 255, 200)))
-                else:  # RectNode
-                    node.shape_item.setBrush(QBrush(QColor(200, 255, 200)))
-                node.shape_item.setPen(QPen(Qt.black, 2))
-                node.shape_item.setFlag(QGraphicsItem.ItemIsMovable)
-                node.shape_item.setFlag(QGraphicsItem.ItemIsSelectable)
-                node.shape_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
-                
-                # 重新添加文字
-                node.text_item = QGraphicsTextItem(node.text, node.shape_item)
-                node.text_item.setPos(-new_width/2 + 10, -new_height/2 + 10)
-                node.text_item.setFont(QFont("Arial", 10))
-                
-                # 存储原始对象的引用
-                node.shape_item.node = node
-                
-                # 添加到场景
-                scene.addItem(node.shape_item)
-                
-                # 更新交互点
-                self.update_interaction_points(node)
-                
-                # 更新连接线
-                for line in node.lines:
-                    line.update_position()
+                self.push_resize(node, new_width, new_height)
             
             return
         
@@ -624,30 +1295,18 @@ class MindMap(QWidget):
             if self.current_mode == "line" and hasattr(self, 'line_start_node'):
                 # 获取场景坐标
                 scene_pos = self.view.mapToScene(event.pos())
-                items = self.scene.items(scene_pos)
-                
-                # 检查是否释放在交互点上
-                for item in items:
-                    if isinstance(item, InteractionPoint) and item.point_type == InteractionPoint.CONNECT:
-                        if item.parent_node != self.line_start_node:
-                            # 创建连线
-                            self.create_line(self.line_start_node, item.parent_node)
-                            # 清除临时变量
-                            delattr(self, 'line_start_node')
-                            if hasattr(self, 'line_start_point'):
-                                delattr(self, 'line_start_point')
-                            return
                 
-                # 如果没有释放在交互点上，检查是否释放在节点上
-                for item in items:
-                    if hasattr(item, 'node') and item.node != self.line_start_node:
-                        # 创建连线
-                        self.create_line(self.line_start_node, item.node)
-                        # 清除临时变量
-                        delattr(self, 'line_start_node')
-                        if hasattr(self, 'line_start_point'):
-                            delattr(self, 'line_start_point')
-                        return
+                # 检查是否释放在交互点上，否则检查是否释放在节点上
+                point = self.interaction_point_at(scene_pos, InteractionPoint.CONNECT)
+                target = point.parent_node if point else self.node_at(scene_pos)
+                if target and target != self.line_start_node:
+                    # 创建连线
+                    self.create_line(self.line_start_node, target)
+                    # 清除临时变量
+                    delattr(self, 'line_start_node')
+                    if hasattr(self, 'line_start_point'):
+                        delattr(self, 'line_start_point')
+                    return
                 
                 # 如果没有释放在有效目标上，清除临时变量
                 if hasattr(self, 'line_start_node'):
@@ -673,19 +1332,24 @@ class MindMap(QWidget):
     def show_context_menu(self, pos):
         # 显示上下文菜单
         scene_pos = self.view.mapToScene(pos)
-        items = self.scene.items(scene_pos)
+        node = self.node_at(scene_pos)
+        item = self.node_items[node.node_id] if node else self.text_at(scene_pos) or self.line_at(scene_pos)
         
         menu = QMenu(self)
         
-        if items:
-            item = items[0]
+        if item:
             # 节点菜单
             if hasattr(item, 'node'):
                 node = item.node
                 add_action = menu.addAction("添加子节点")
                 edit_action = menu.addAction("编辑节点")
+                fold_action = None
+                if node.collapsed:
+                    fold_action = menu.addAction("展开子节点")
+                elif node.children:
+                    fold_action = menu.addAction("折叠子节点")
                 delete_action = None
-                if node != self.root_node:
+                if node is not self.model.root:
                     delete_action = menu.addAction("删除节点")
                 
                 action = menu.exec_(self.view.mapToGlobal(pos))
@@ -696,6 +1360,8 @@ class MindMap(QWidget):
                 elif action == edit_action:
                     item.setSelected(True)
                     self.edit_node()
+                elif fold_action and action == fold_action:
+                    self.toggle_collapsed(node)
                 elif delete_action and action == delete_action:
                     item.setSelected(True)
                     self.delete_item()
@@ -713,7 +1379,7 @@ class MindMap(QWidget):
                     item.setSelected(True)
                     self.delete_item()
             # 连线菜单
-            elif isinstance(item, QGraphicsLineItem):
+            elif isinstance(item, MindMapLine):
                 delete_action = menu.addAction("删除连线")
                 
                 action = menu.exec_(self.view.mapToGlobal(pos))
@@ -738,181 +1404,94 @@ class MindMap(QWidget):
             elif action == add_text_action:
                 self.create_free_text(scene_pos)
     
+    def load_map_data(self, data):
+        # 从保存的数据重建思维导图，图形项由模型的通知创建
+        self.clear_map()
+        self.model.load_data(data)
+        self.center_on_root()
+    
+    def center_on_root(self):
+        root = self.model.root
+        item = self.node_items.get(root.node_id) if root else None
+        if item:
+            self.view.centerOn(item)
+    
+    def load_binary_map(self, file_path):
+        # 开始分批加载二进制文件，每次事件循环空闲时读入一批并创建其中可见部分的图形项
+        self.clear_map()
+        self.loader = BinaryMapReader(file_path)
+        self.load_steps = self.model.read_binary(self.loader, self.LOAD_BATCH_SIZE)
+        self.update_load_label()
+        self.load_timer.start(0)
+    
+    def load_next_batch(self):
+        if self.load_steps is None:
+            self.load_timer.stop()
+            return
+        centered = self.model.root is not None
+        try:
+            self.load_progress = next(self.load_steps)
+        except StopIteration:
+            self.cancel_loading()
+            self.refresh_hidden_counts()
+            return
+        except Exception as e:
+            self.cancel_loading()
+            QMessageBox.critical(self, "加载失败", f"加载思维导图时出错: {str(e)}")
+            return
+        if not centered:
+            self.center_on_root()
+        self.update_load_label()
+    
+    def update_load_label(self):
+        stage, position, total = self.load_progress or ("nodes", 0, self.loader.node_count)
+        name = "节点" if stage == "nodes" else "连线"
+        self.load_label.setText(f"  正在加载{name} {position}/{total}")
+    
+    def cancel_loading(self):
+        # 停止分批加载并关闭文件
+        self.load_timer.stop()
+        if self.load_steps is not None:
+            self.load_steps.close()
+            self.load_steps = None
+        if self.loader:
+            self.loader.close()
+            self.loader = None
+        self.load_progress = None
+        self.load_label.setText("")
+    
     def save_mind_map(self):
-        # 保存思维导图
-        if not self.root_node:
+        # 保存思维导图，.mindmap为二进制格式，.json用于导出
+        if not self.model.root or self.loader:
             return
         
-        file_path, _ = QFileDialog.getSaveFileName(self, "保存思维导图", "", "思维导图文件 (*.mindmap)")
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存思维导图", "", "思维导图文件 (*.mindmap);;JSON文件 (*.json)")
         if file_path:
             try:
-                # 准备数据
-                data = {
-                    "root": self.root_node.get_data(),
-                    "nodes": [],
-                    "texts": [],
-                    "node_id_map": {}
-                }
-                
-                # 保存独立节点（非根节点及其子节点）
-                for node in self.nodes:
-                    if node != self.root_node and not node.parent_node:
-                        data["nodes"].append(node.get_data())
-                
-                # 保存独立文本
-                for text in self.texts:
-                    data["texts"].append(text.get_data())
-                
                 # 保存到文件
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                self.model.save_file(file_path)
                 
                 self.current_file_path = file_path
+                if self.journal:
+                    self.journal.reset()
                 QMessageBox.information(self, "保存成功", "思维导图已保存。")
             except Exception as e:
                 QMessageBox.critical(self, "保存失败", f"保存思维导图时出错: {str(e)}")
     
     def load_mind_map(self):
         # 加载思维导图
-        file_path, _ = QFileDialog.getOpenFileName(self, "加载思维导图", "", "思维导图文件 (*.mindmap)")
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "加载思维导图", "", "思维导图文件 (*.mindmap *.json)")
         if file_path:
             try:
-                # 从文件加载数据
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # 清除场景
-                self.scene.clear()
-                self.nodes = []
-                self.lines = []
-                self.texts = []
-                
-                # 加载根节点及其子节点
-                if "root" in data:
-                    self.load_node_recursive(data["root"], None)
-                
-                # 加载独立节点
-                if "nodes" in data:
-                    for node_data in data["nodes"]:
-                        self.load_node_data(node_data)
-                
-                # 加载独立文本
-                if "texts" in data:
-                    for text_data in data["texts"]:
-                        pos = QPointF(text_data["pos"]["x"], text_data["pos"]["y"])
-                        text_item = FreeText(text_data["text"], pos)
-                        self.scene.addItem(text_item)
-                        self.texts.append(text_item)
-                
+                if is_binary_map(file_path):
+                    self.load_binary_map(file_path)
+                else:
+                    # JSON格式（包括旧版的.mindmap文件）整体读取后导入
+                    self.clear_map()
+                    self.model.load_file(file_path)
+                    self.center_on_root()
                 self.current_file_path = file_path
-                if self.root_node:
-                    self.view.centerOn(self.root_node.shape_item)
             except Exception as e:
                 QMessageBox.critical(self, "加载失败", f"加载思维导图时出错: {str(e)}")
-    
-    def load_node_recursive(self, data, parent_node):
-        # 递归加载节点
-        pos = QPointF(data["pos"]["x"], data["pos"]["y"])
-        width = data.get("width", 120)
-        height = data.get("height", 80)
-        shape_type = data.get("shape_type", "ellipse")
-        
-        # 根据形状类型创建节点
-        if shape_type == "rect":
-            node = RectNode(data["text"], pos, width, height)
-        else:  # 默认为椭圆
-            node = EllipseNode(data["text"], pos, width, height)
-        
-        self.scene.addItem(node.shape_item)
-        self.nodes.append(node)
-        
-        # 添加交互点
-        self.update_interaction_points(node)
-        
-        # 如果有父节点，创建连接线并建立关系
-        if parent_node:
-            parent_node.add_child(node)
-            line = MindMapLine(parent_node, node)
-            self.scene.addItem(line)
-            self.lines.append(line)
-        else:
-            # 如果是根节点
-            self.root_node = node
-        
-        # 加载子节点
-        for child_data in data["children"]:
-            self.load_node_recursive(child_data, node)
-        
-        return node
-    
-    def load_node_data(self, data):
-        # 加载独立节点数据
-        pos = QPointF(data["pos"]["x"], data["pos"]["y"])
-        width = data.get("width", 120)
-        height = data.get("height", 80)
-        shape_type = data.get("shape_type", "ellipse")
-        
-        # 根据形状类型创建节点
-        if shape_type == "rect":
-            node = RectNode(data["text"], pos, width, height)
-        else:  # 默认为椭圆
-            node = EllipseNode(data["text"], pos, width, height)
-        
-        self.scene.addItem(node.shape_item)
-        self.nodes.append(node)
-        
-        # 添加交互点
-        self.update_interaction_points(node)
-        
-        # 加载子节点
-        for child_data in data["children"]:
-            child = self.load_node_recursive(child_data, node)
-        
-        return node
-    
-    def resize_node_to(self, node, new_width, new_height):
-        # 保存原始位置
-        pos = node.shape_item.pos()
-        
-        # 移除旧形状
-        scene = node.shape_item.scene()
-        if scene:
-            scene.removeItem(node.shape_item)
-        
-        # 创建新形状
-        node.width = new_width
-        node.height = new_height
-        
-        if isinstance(node, EllipseNode):
-            node.shape_item = QGraphicsEllipseItem(-new_width/2, -new_height/2, new_width, new_height)
-        else:  # RectNode
-            node.shape_item = QGraphicsRectItem(-new_width/2, -new_height/2, new_width, new_height)
-        
-        # 设置属性
-        node.shape_item.setPos(pos)
-        if isinstance(node, EllipseNode):
-            node.shape_item.setBrush(QBrush(QColor(255, 255, 200)))
-        else:  # RectNode
-            node.shape_item.setBrush(QBrush(QColor(200, 255, 200)))
-        node.shape_item.setPen(QPen(Qt.black, 2))
-        node.shape_item.setFlag(QGraphicsItem.ItemIsMovable)
-        node.shape_item.setFlag(QGraphicsItem.ItemIsSelectable)
-        node.shape_item.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
-        
-        # 重新添加文字
-        node.text_item = QGraphicsTextItem(node.text, node.shape_item)
-        node.text_item.setPos(-new_width/2 + 10, -new_height/2 + 10)
-        node.text_item.setFont(QFont("Arial", 10))
-        
-        # 存储原始对象的引用
-        node.shape_item.node = node
-        
-        # 添加到场景
-        scene.addItem(node.shape_item)
-        
-        # 更新交互点
-        self.update_interaction_points(node)
-        
-        # 更新连接线
-        for line in node.lines:
-            line.update_position()
\ No newline at end of file
@@ -0,0 +1,266 @@
+from PyQt5.QtWidgets import QUndoCommand
+
+# 可合并命令的编号，QUndoStack只合并编号相同的相邻命令
+MOVE_COMMAND_ID = 1
+RESIZE_COMMAND_ID = 2
+
+
+class MindMapCommand(QUndoCommand):
+    """思维导图命令的基类
+
+    命令只修改数据模型，图形项由视图根据模型的通知更新。
+    命令只保存变化的部分，节点和连线通过编号引用，
+    删除后重新创建的节点沿用原编号，后续命令仍然有效。
+    执行和撤销后的效果以change返回的记录写入自动保存日志。
+    """
+
+    def __init__(self, mind_map, text):
+        super().__init__(text)
+        self.mind_map = mind_map
+        self.model = mind_map.model
+
+    def redo(self):
+        with self.mind_map.replaying():
+            self.apply()
+        self.mind_map.log_change(self, True)
+
+    def undo(self):
+        with self.mind_map.replaying():
+            self.revert()
+        self.mind_map.log_change(self, False)
+
+    def apply(self):
+        pass
+
+    def revert(self):
+        pass
+
+    def change(self, forward):
+        """执行(forward为True)或撤销后的效果，可由MindMap.apply_change重放"""
+        return None
+
+
+class AddSubtreeCommand(MindMapCommand):
+    """添加节点（或恢复子树），撤销时删除"""
+
+    def __init__(self, mind_map, subtree, text="添加节点"):
+        super().__init__(mind_map, text)
+        self.subtree = subtree
+
+    def apply(self):
+        self.model.restore_subtree(self.subtree)
+
+    def revert(self):
+        self.model.remove_subtree(self.model.nodes[self.subtree["nodes"][0]["id"]])
+
+    def change(self, forward):
+        if forward:
+            return {"op": "add_subtree", "subtree": self.subtree}
+        return {"op": "delete_node", "id": self.subtree["nodes"][0]["id"]}
+
+
+class DeleteSubtreeCommand(AddSubtreeCommand):
+    """删除节点及其子树，撤销时按保存的数据恢复"""
+
+    def __init__(self, mind_map, subtree, text="删除节点"):
+        super().__init__(mind_map, subtree, text)
+
+    def apply(self):
+        AddSubtreeCommand.revert(self)
+
+    def revert(self):
+        AddSubtreeCommand.apply(self)
+
+    def change(self, forward):
+        return AddSubtreeCommand.change(self, not forward)
+
+
+class AddLineCommand(MindMapCommand):
+    def __init__(self, mind_map, line_data, text="添加连线"):
+        super().__init__(mind_map, text)
+        self.line_data = line_data
+
+    def apply(self):
+        line_data = self.line_data
+        self.model.add_line(line_data["id"], line_data["start_node_id"], line_data["end_node_id"])
+
+    def revert(self):
+        self.model.remove_line(self.model.lines[self.line_data["id"]])
+
+    def change(self, forward):
+        if forward:
+            return {"op": "add_line", "line": self.line_data}
+        return {"op": "delete_line", "id": self.line_data["id"]}
+
+
+class DeleteLineCommand(AddLineCommand):
+    def __init__(self, mind_map, line_data, text="删除连线"):
+        super().__init__(mind_map, line_data, text)
+
+    def apply(self):
+        AddLineCommand.revert(self)
+
+    def revert(self):
+        AddLineCommand.apply(self)
+
+    def change(self, forward):
+        return AddLineCommand.change(self, not forward)
+
+
+class MoveNodesCommand(MindMapCommand):
+    """移动一个或多个节点，moves为 节点编号 -> ((原x, 原y), (新x, 新y))
+
+    同一次拖动中连续记录的移动合并为一条命令。
+    """
+
+    def __init__(self, mind_map, moves, gesture, text="移动节点"):
+        super().__init__(mind_map, text)
+        self.moves = moves
+        self.gesture = gesture
+
+    def id(self):
+        return MOVE_COMMAND_ID
+
+    def mergeWith(self, other):
+        if other.gesture != self.gesture:
+            return False
+        for node_id, (old_pos, new_pos) in other.moves.items():
+            self.moves[node_id] = (self.moves.get(node_id, (old_pos,))[0], new_pos)
+        return True
+
+    def apply(self):
+        with self.model.batch():
+            for node_id, (_, new_pos) in self.moves.items():
+                self.model.move_node(self.model.nodes[node_id], *new_pos)
+
+    def revert(self):
+        with self.model.batch():
+            for node_id, (old_pos, _) in self.moves.items():
+                self.model.move_node(self.model.nodes[node_id], *old_pos)
+
+    def change(self, forward):
+        index = 1 if forward else 0
+        return {"op": "move", "moves": [[node_id, *pos[index]] for node_id, pos in self.moves.items()]}
+
+
+class ResizeNodeCommand(MindMapCommand):
+    """调整节点大小，同一次拖动中的连续调整合并为一条命令"""
+
+    def __init__(self, mind_map, node_id, old_size, new_size, gesture, text="调整大小"):
+        super().__init__(mind_map, text)
+        self.node_id = node_id
+        self.old_size = old_size
+        self.new_size = new_size
+        self.gesture = gesture
+
+    def id(self):
+        return RESIZE_COMMAND_ID
+
+    def mergeWith(self, other):
+        if other.node_id != self.node_id or other.gesture != self.gesture:
+            return False
+        self.new_size = other.new_size
+        return True
+
+    def apply(self):
+        self.model.resize_node(self.model.nodes[self.node_id], *self.new_size)
+
+    def revert(self):
+        self.model.resize_node(self.model.nodes[self.node_id], *self.old_size)
+
+    def change(self, forward):
+        return {"op": "resize", "id": self.node_id, "size": list(self.new_size if forward else self.old_size)}
+
+
+class EditTextCommand(MindMapCommand):
+    def __init__(self, mind_map, node_id, old_text, new_text, text="编辑节点"):
+        super().__init__(mind_map, text)
+        self.node_id = node_id
+        self.old_text = old_text
+        self.new_text = new_text
+
+    def apply(self):
+        self.model.set_node_text(self.model.nodes[self.node_id], self.new_text)
+
+    def revert(self):
+        self.model.set_node_text(self.model.nodes[self.node_id], self.old_text)
+
+    def change(self, forward):
+        return {"op": "text", "id": self.node_id, "text": self.new_text if forward else self.old_text}
+
+
+class AddTextCommand(MindMapCommand):
+    """添加独立文本；文本没有编号，从模型中移除后由命令保留"""
+
+    def __init__(self, mind_map, model_text, text="添加文本"):
+        super().__init__(mind_map, text)
+        self.model_text = model_text
+
+    def apply(self):
+        self.model.add_free_text(self.model_text)
+
+    def revert(self):
+        self.model.remove_free_text(self.model_text)
+
+    def change(self, forward):
+        # 独立文本没有编号，记录全部独立文本
+        return {"op": "texts", "texts": [text.get_data() for text in self.model.texts]}
+
+
+class DeleteTextCommand(AddTextCommand):
+    def __init__(self, mind_map, model_text, text="删除文本"):
+        super().__init__(mind_map, model_text, text)
+
+    def apply(self):
+        AddTextCommand.revert(self)
+
+    def revert(self):
+        AddTextCommand.apply(self)
+
+
+class EditFreeTextCommand(MindMapCommand):
+    def __init__(self, mind_map, model_text, old_text, new_text, text="编辑文本"):
+        super().__init__(mind_map, text)
+        self.model_text = model_text
+        self.old_text = old_text
+        self.new_text = new_text
+
+    def apply(self):
+        self.model.edit_free_text(self.model_text, self.new_text)
+
+    def revert(self):
+        self.model.edit_free_text(self.model_text, self.old_text)
+
+    def change(self, forward):
+        return {"op": "texts", "texts": [text.get_data() for text in self.model.texts]}
+
+
+class CollapseCommand(MindMapCommand):
+    """折叠节点的子树，撤销时展开"""
+
+    def __init__(self, mind_map, node_id, text="折叠子节点"):
+        super().__init__(mind_map, text)
+        self.node_id = node_id
+
+    def apply(self):
+        self.model.set_collapsed(self.model.nodes[self.node_id], True)
+
+    def revert(self):
+        self.model.set_collapsed(self.model.nodes[self.node_id], False)
+
+    def change(self, forward):
+        return {"op": "collapse" if forward else "expand", "id": self.node_id}
+
+
+class ExpandCommand(CollapseCommand):
+    def __init__(self, mind_map, node_id, text="展开子节点"):
+        super().__init__(mind_map, node_id, text)
+
+    def apply(self):
+        CollapseCommand.revert(self)
+
+    def revert(self):
+        CollapseCommand.apply(self)
+
+    def change(self, forward):
+        return CollapseCommand.change(self, not forward)
@@ -0,0 +1,152 @@
+import os
+import mmap
+import struct
+
+# 二进制 .mindmap 文件格式
+#
+#   文件头 | 节点记录 | 连线记录 | 文本记录 | 字符串表
+#
+# 所有整数均为小端序。节点、连线和文本都是定长记录，可以直接按下标定位；
+# 节点内容等字符串集中保存在字符串表中，记录里只保存字符串的下标。
+# 编号从1开始，0表示没有（如根节点的父节点）。
+
+MAGIC = b"LXMM"
+BINARY_VERSION = 1
+
+# 魔数, 版本, 保留, 节点数, 连线数, 文本数, 字符串数, 下一个编号, 根节点编号
+HEADER = struct.Struct("<4sHHIIIIII")
+# 编号, 父节点编号, 内容字符串下标, x, y, 宽度, 高度, 形状, 标志
+# 标志占用原来的填充字节，旧文件中为0，不影响读取
+NODE_RECORD = struct.Struct("<IIIffffBB2x")
+NODE_COLLAPSED = 1  # 节点的子树已折叠
+# 编号, 起点节点编号, 终点节点编号
+LINE_RECORD = struct.Struct("<III")
+# 内容字符串下标, x, y
+TEXT_RECORD = struct.Struct("<Iff")
+# 字符串表中每个字符串的结束偏移
+STRING_OFFSET = struct.Struct("<I")
+
+SHAPES = ["ellipse", "rect"]
+
+
+def is_binary_map(path):
+    """根据魔数判断文件是否为二进制格式"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_binary_map(path, data):
+    """把 MindMapModel.get_data 返回的数据写成二进制文件
+
+    先写入临时文件再替换，保存中途出错不会损坏原文件。
+    """
+    strings = []
+    string_ids = {}
+
+    def intern(text):
+        index = string_ids.get(text)
+        if index is None:
+            index = len(strings)
+            strings.append(text)
+            string_ids[text] = index
+        return index
+
+    node_records = bytearray()
+    for node in data["nodes"]:
+        node_records += NODE_RECORD.pack(
+            node["id"], node["parent_id"] or 0, intern(node["text"]),
+            node["pos"]["x"], node["pos"]["y"], node["width"], node["height"],
+            SHAPES.index(node["shape_type"]) if node["shape_type"] in SHAPES else 0,
+            NODE_COLLAPSED if node.get("collapsed") else 0)
+    line_records = bytearray()
+    for line in data["lines"]:
+        line_records += LINE_RECORD.pack(line["id"] or 0, line["start_node_id"], line["end_node_id"])
+    text_records = bytearray()
+    for text in data["texts"]:
+        text_records += TEXT_RECORD.pack(intern(text["text"]), text["pos"]["x"], text["pos"]["y"])
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = bytearray()
+    end = 0
+    for chunk in encoded:
+        end += len(chunk)
+        offsets += STRING_OFFSET.pack(end)
+
+    header = HEADER.pack(MAGIC, BINARY_VERSION, 0, len(data["nodes"]), len(data["lines"]),
+                         len(data["texts"]), len(strings), data.get("next_id", 1), data.get("root_id") or 0)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(node_records)
+        f.write(line_records)
+        f.write(text_records)
+        f.write(offsets)
+        for chunk in encoded:
+            f.write(chunk)
+    os.replace(temp_path, path)
+
+
+class BinaryMapReader:
+    """通过内存映射读取二进制思维导图文件
+
+    只解析文件头，记录和字符串在需要时才从映射中解码，
+    加载大文件时不需要把整个文件读入内存。
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError("文件为空")
+        try:
+            (magic, version, _, self.node_count, self.line_count, self.text_count,
+             self.string_count, self.next_id, root_id) = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC:
+                raise ValueError("不是思维导图文件")
+            if version > BINARY_VERSION:
+                raise ValueError(f"不支持的文件版本: {version}")
+            self.root_id = root_id or None
+
+            self.nodes_offset = HEADER.size
+            self.lines_offset = self.nodes_offset + self.node_count * NODE_RECORD.size
+            self.texts_offset = self.lines_offset + self.line_count * LINE_RECORD.size
+            self.offsets_offset = self.texts_offset + self.text_count * TEXT_RECORD.size
+            self.strings_offset = self.offsets_offset + self.string_count * STRING_OFFSET.size
+            if self.strings_offset > len(self.mm):
+                raise ValueError("文件已损坏")
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def string(self, index):
+        end = STRING_OFFSET.unpack_from(self.mm, self.offsets_offset + index * STRING_OFFSET.size)[0]
+        start = 0 if index == 0 else STRING_OFFSET.unpack_from(
+            self.mm, self.offsets_offset + (index - 1) * STRING_OFFSET.size)[0]
+        return self.mm[self.strings_offset + start:self.strings_offset + end].decode("utf-8", errors="replace")
+
+    def records(self, record, offset, first, count):
+        start = offset + first * record.size
+        return record.iter_unpack(self.mm[start:start + count * record.size])
+
+    def nodes(self, first, count):
+        """返回(编号, 父节点编号或None, 内容, x, y, 宽度, 高度, 形状, 是否折叠)"""
+        for node_id, parent_id, text_index, x, y, width, height, shape, flags in self.records(
+                NODE_RECORD, self.nodes_offset, first, count):
+            yield (node_id, parent_id or None, self.string(text_index), x, y, width, height,
+                   SHAPES[shape] if shape < len(SHAPES) else SHAPES[0], bool(flags & NODE_COLLAPSED))
+
+    def lines(self, first, count):
+        """返回(编号, 起点节点编号, 终点节点编号)"""
+        for line_id, start_id, end_id in self.records(LINE_RECORD, self.lines_offset, first, count):
+            yield line_id or None, start_id, end_id
+
+    def texts(self, first, count):
+        """返回(内容, x, y)"""
+        for text_index, x, y in self.records(TEXT_RECORD, self.texts_offset, first, count):
+            yield self.string(text_index), x, y
@@ -0,0 +1,456 @@
+import math
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# 布局方式
+TIDY = "tidy"
+RADIAL = "radial"
+BALANCED = "balanced"
+
+LEVEL_GAP = 60  # 相邻两层之间的水平间距
+SIBLING_GAP = 20  # 同层相邻节点之间的垂直间距
+RADIAL_GAP = 40  # 径向布局中相邻两圈之间的间距
+
+
+class TreeSnapshot:
+    """布局使用的树结构快照
+
+    只保存编号、子节点顺序和节点大小，不引用模型节点，可以交给后台线程使用。
+    full为False时只包含结构或大小变化的节点，removed和moved为删除的节点和
+    不是由布局移动的节点，由TreeLayout合并到它保存的整棵树中。
+    """
+
+    __slots__ = ("root", "root_pos", "children", "size", "removed", "moved", "full")
+
+    def __init__(self, root, root_pos, children, size, removed=(), moved=(), full=True):
+        self.root = root
+        self.root_pos = root_pos  # 根节点位置(x, y)，布局后保持不变
+        self.children = children  # 编号 -> 子节点编号元组
+        self.size = size  # 编号 -> (宽度, 高度)
+        self.removed = removed
+        self.moved = moved
+        self.full = full
+
+    def __len__(self):
+        return len(self.size)
+
+    @classmethod
+    def from_node(cls, root_node):
+        # root_node为数据模型中的节点，折叠的子树不参与布局
+        children = {}
+        size = {}
+        queue = [root_node]
+        for node in queue:
+            visible = () if node.collapsed else node.children
+            children[node.node_id] = tuple(child.node_id for child in visible)
+            size[node.node_id] = (node.width, node.height)
+            queue.extend(visible)
+        return cls(root_node.node_id, (root_node.x, root_node.y), children, size)
+
+    @classmethod
+    def from_changes(cls, root_node, nodes, removed, moved):
+        # nodes为子节点、折叠状态或大小变化的节点，以及新添加或重新可见的节点
+        children = {}
+        size = {}
+        for node in nodes:
+            visible = () if node.collapsed else node.children
+            children[node.node_id] = tuple(child.node_id for child in visible)
+            size[node.node_id] = (node.width, node.height)
+        return cls(root_node.node_id, (root_node.x, root_node.y), children, size,
+                   tuple(removed), tuple(moved), False)
+
+
+class SubtreeLayout:
+    """一棵子树的布局结果
+
+    offsets为各子节点中心相对子树根节点中心的纵向偏移，top和bottom为整棵子树
+    相对根节点中心的上下边界。threads记录合并子节点时设置的轮廓线索，
+    子树需要重新计算时先删除这些线索。
+    """
+
+    __slots__ = ("offsets", "top", "bottom", "threads")
+
+    def __init__(self, offsets, top, bottom, threads):
+        self.offsets = offsets
+        self.top = top
+        self.bottom = bottom
+        self.threads = threads
+
+
+class TreeLayout:
+    """思维导图的自动布局
+
+    保存整棵树的结构，之后每次只合并快照中的变化。树形布局按Walker算法合并子树：
+    子树的上、下轮廓是从根节点出发逐层向下的节点链，子节点链走完后沿线索接到
+    更深一层的节点，线索保存相邻两层节点的纵向距离，合并时不复制轮廓。
+    每棵子树的合并结果缓存在cache中，结构或大小变化的节点及其祖先才重新合并，
+    位置和内部都没有变化的子树放置时整体跳过。
+    """
+
+    def __init__(self):
+        self.root = None
+        self.root_pos = None
+        self.children = {}  # 节点编号 -> 子节点编号元组
+        self.size = {}  # 节点编号 -> (宽度, 高度)
+        self.parent = {}
+        self.depth = {}
+        self.levels = []  # 每层 节点宽度 -> 节点数
+        self.xs = None  # 各层的横坐标，层宽变化时重新计算
+        self.cache = {}  # 节点编号 -> SubtreeLayout，根节点每次重新合并
+        # 轮廓线索，节点编号 -> (下一层轮廓上的节点编号, 相对该节点的纵向偏移)
+        self.top_threads = {}
+        self.bottom_threads = {}
+        self.dirty = set()  # 需要重新合并的节点，其祖先同样在内
+        self.visit = set()  # 被移动过的节点及其祖先，放置时不能跳过
+        self.placed = {}  # 节点编号 -> 上次输出的相对根节点的位置
+        self.placed_xs = []
+
+    def __len__(self):
+        return len(self.size)
+
+    def compute(self, snapshot, mode=TIDY):
+        """合并快照，返回 节点编号 -> (x, y)，根节点保持原位置
+
+        只包含位置可能变化的节点，其余节点仍在上次布局的位置。
+        """
+        self.update_tree(snapshot)
+        if mode == RADIAL:
+            offsets = self.radial()
+            self.placed.clear()
+        else:
+            self.update_subtrees()
+            xs = self.columns()
+            if xs[:len(self.placed_xs)] != self.placed_xs[:len(xs)]:
+                # 某一层的列宽变化，这一层以下的节点都要重新放置
+                self.placed.clear()
+            self.placed_xs = xs
+            if mode == BALANCED:
+                offsets = self.balanced(xs)
+            else:
+                offsets = self.tidy(xs)
+            self.dirty.clear()
+            self.visit.clear()
+        root_x, root_y = self.root_pos
+        return {node_id: (root_x + x, root_y + y) for node_id, (x, y) in offsets.items()}
+
+    def update_tree(self, snapshot):
+        # 合并快照中的变化，标记需要重新合并的节点
+        if snapshot.full or snapshot.root != self.root:
+            self.__init__()
+            self.root = snapshot.root
+            self.root_pos = snapshot.root_pos
+            self.levels.append({})
+            self.attach(snapshot.root, None, snapshot)
+            return
+        if snapshot.root_pos != self.root_pos:
+            self.root_pos = snapshot.root_pos
+            self.placed.clear()
+        for node_id in snapshot.removed:
+            parent = self.parent.get(node_id)
+            if parent is not None:
+                self.children[parent] = tuple(child for child in self.children[parent] if child != node_id)
+                self.drop(node_id)
+                self.mark(parent)
+        for node_id, children in snapshot.children.items():
+            if node_id not in self.size:
+                # 不可见的节点，或者新节点，由父节点添加
+                continue
+            old = self.children[node_id]
+            if children != old:
+                for child in set(old).difference(children):
+                    self.drop(child)
+                for child in children:
+                    if child not in self.size:
+                        self.attach(child, node_id, snapshot)
+                self.children[node_id] = tuple(child for child in children if child in self.size)
+                self.mark(node_id)
+            size = snapshot.size[node_id]
+            if size != self.size[node_id]:
+                widths = self.levels[self.depth[node_id]]
+                self.count_width(widths, self.size[node_id][0], -1)
+                self.count_width(widths, size[0], 1)
+                self.size[node_id] = size
+                self.mark(node_id)
+        for node_id in snapshot.moved:
+            if node_id in self.size:
+                self.placed.pop(node_id, None)
+                self.mark(node_id, self.visit)
+
+    def count_width(self, widths, width, count):
+        widths[width] = widths.get(width, 0) + count
+        if not widths[width]:
+            del widths[width]
+        self.xs = None
+
+    def mark(self, node_id, marks=None):
+        # 节点变化时其所有祖先都需要重新处理，遇到已标记的祖先时不再继续向上
+        marks = self.dirty if marks is None else marks
+        parent = self.parent
+        while node_id is not None and node_id not in marks:
+            marks.add(node_id)
+            node_id = parent[node_id]
+
+    def attach(self, node_id, parent_id, snapshot):
+        # 按快照添加节点及其子树，快照中没有数据的子节点不参与布局
+        depth = self.depth[parent_id] + 1 if parent_id is not None else 0
+        stack = [(node_id, parent_id, depth)]
+        while stack:
+            current, parent, depth = stack.pop()
+            children = tuple(child for child in snapshot.children.get(current, ()) if child in snapshot.size)
+            self.children[current] = children
+            self.size[current] = snapshot.size[current]
+            self.parent[current] = parent
+            self.depth[current] = depth
+            while len(self.levels) <= depth:
+                self.levels.append({})
+            self.count_width(self.levels[depth], self.size[current][0], 1)
+            self.dirty.add(current)
+            stack.extend((child, current, depth + 1) for child in children)
+        self.mark(parent_id)
+
+    def drop(self, node_id):
+        # 删除节点及其子树的所有记录
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            stack.extend(self.children.pop(current))
+            self.count_width(self.levels[self.depth.pop(current)], self.size.pop(current)[0], -1)
+            del self.parent[current]
+            self.cache.pop(current, None)
+            self.top_threads.pop(current, None)
+            self.bottom_threads.pop(current, None)
+            self.placed.pop(current, None)
+            self.dirty.discard(current)
+            self.visit.discard(current)
+
+    def update_subtrees(self):
+        # 先删除需要重新合并的子树设置过的线索，再从深到浅重新合并
+        for node_id in self.dirty:
+            layout = self.cache.pop(node_id, None)
+            if layout is not None:
+                self.drop_threads(layout.threads)
+        depth = self.depth
+        for node_id in sorted(self.dirty, key=depth.__getitem__, reverse=True):
+            if node_id != self.root:
+                self.cache[node_id] = self.merge(node_id)
+
+    def drop_threads(self, threads):
+        for table, node_id in threads:
+            table.pop(node_id, None)
+
+    def merge(self, node_id):
+        # 排列子节点的子树，子节点整体以中间位置为准与父节点对齐
+        children = self.children[node_id]
+        half = self.size[node_id][1] / 2
+        if not children:
+            return SubtreeLayout((), -half, half, [])
+        offsets, threads = self.stack_subtrees(children)
+        cache = self.cache
+        top = min(-half, min(offset + cache[child].top for child, offset in zip(children, offsets)))
+        bottom = max(half, max(offset + cache[child].bottom for child, offset in zip(children, offsets)))
+        return SubtreeLayout(offsets, top, bottom, threads)
+
+    def next_top(self, node_id):
+        # 上轮廓的下一层：第一个子节点，没有子节点时沿线索
+        children = self.children[node_id]
+        if children:
+            return children[0], self.cache[node_id].offsets[0]
+        return self.top_threads.get(node_id)
+
+    def next_bottom(self, node_id):
+        children = self.children[node_id]
+        if children:
+            return children[-1], self.cache[node_id].offsets[-1]
+        return self.bottom_threads.get(node_id)
+
+    def stack_subtrees(self, group):
+        """把若干子树从上到下依次排列，相邻子树的轮廓在每一层都至少相隔SIBLING_GAP
+
+        已排好部分的下轮廓与新子树的上轮廓逐层比较，只走两者共同的层数；
+        较深一侧的轮廓继续向下时，在较浅一侧轮廓的末端设置线索，
+        之后再合并子树时沿线索直接走到更深的层，总耗时与节点数成正比。
+        返回居中后的偏移和设置的线索。
+        """
+        size = self.size
+        threads = []
+        first = group[0]
+        positions = [0.0]
+        for index in range(1, len(group)):
+            # upper和outer为已排好部分的下、上轮廓，inner和lower为新子树的上、下轮廓；
+            # 前两者的坐标相对第一棵子树的根，后两者相对新子树的根
+            upper, upper_y = group[index - 1], positions[-1]
+            outer, outer_y = first, 0.0
+            inner = lower = group[index]
+            inner_y = lower_y = 0.0
+            shift = upper_y + (size[upper][1] + size[inner][1]) / 2 + SIBLING_GAP
+            while True:
+                next_upper = self.next_bottom(upper)
+                next_inner = self.next_top(inner)
+                if next_upper is None or next_inner is None:
+                    break
+                upper, offset = next_upper
+                upper_y += offset
+                inner, offset = next_inner
+                inner_y += offset
+                outer, offset = self.next_top(outer)
+                outer_y += offset
+                lower, offset = self.next_bottom(lower)
+                lower_y += offset
+                shift = max(shift, upper_y - inner_y + (size[upper][1] + size[inner][1]) / 2 + SIBLING_GAP)
+            positions.append(shift)
+            if next_upper is not None:
+                # 新子树较浅，它的下轮廓接到已排好部分更深的一层
+                target, offset = next_upper
+                self.bottom_threads[lower] = (target, upper_y + offset - shift - lower_y)
+                threads.append((self.bottom_threads, lower))
+            elif next_inner is not None:
+                # 已排好部分较浅，它的上轮廓接到新子树更深的一层
+                target, offset = next_inner
+                self.top_threads[outer] = (target, shift + inner_y + offset - outer_y)
+                threads.append((self.top_threads, outer))
+        middle = (positions[0] + positions[-1]) / 2
+        return [position - middle for position in positions], threads
+
+    def columns(self):
+        """根节点及以下各层节点中心的横坐标，同一层对齐，列宽取该层最宽的节点"""
+        if self.xs is None:
+            xs = [0.0]
+            previous = self.size[self.root][0]
+            for widths in self.levels[1:]:
+                if not widths:
+                    break
+                width = max(widths)
+                xs.append(xs[-1] + previous / 2 + LEVEL_GAP + width / 2)
+                previous = width
+            self.xs = xs
+        return self.xs
+
+    def place(self, node_id, y, depth, xs, direction, offsets):
+        # 先序遍历，按缓存的偏移计算子树中节点的位置；
+        # 位置与上次相同且内部没有变化的子树整体跳过
+        placed = self.placed
+        dirty = self.dirty
+        visit = self.visit
+        stack = [(node_id, y, depth)]
+        while stack:
+            current, current_y, current_depth = stack.pop()
+            pos = (direction * xs[current_depth], current_y)
+            if placed.get(current) == pos and current not in dirty and current not in visit:
+                continue
+            placed[current] = pos
+            offsets[current] = pos
+            for child, offset in zip(self.children[current], self.cache[current].offsets):
+                stack.append((child, current_y + offset, current_depth + 1))
+
+    def place_group(self, group, xs, direction, offsets):
+        # 根节点上方没有需要合并的子树，合并根节点的子节点时设置的线索用完即删
+        group_offsets, threads = self.stack_subtrees(group)
+        self.drop_threads(threads)
+        for child, offset in zip(group, group_offsets):
+            self.place(child, offset, 1, xs, direction, offsets)
+
+    def place_root(self, offsets):
+        if self.placed.get(self.root) != (0.0, 0.0):
+            self.placed[self.root] = offsets[self.root] = (0.0, 0.0)
+
+    def tidy(self, xs):
+        offsets = {}
+        self.place_root(offsets)
+        children = self.children[self.root]
+        if children:
+            self.place_group(children, xs, 1, offsets)
+        return offsets
+
+    def balanced(self, xs):
+        # 根节点的子节点按顺序分为左右两组，两组子树的总高度尽量接近，两侧的列宽相同
+        children = self.children[self.root]
+        offsets = {}
+        self.place_root(offsets)
+        if not children:
+            return offsets
+        heights = [self.cache[child].bottom - self.cache[child].top for child in children]
+        total = sum(heights)
+        split = 0
+        right_height = 0
+        while split < len(children) - 1 and right_height + heights[split] / 2 < total / 2:
+            right_height += heights[split]
+            split += 1
+        split = max(split, 1)
+        for group, direction in ((children[:split], 1), (children[split:], -1)):
+            if group:
+                self.place_group(group, xs, direction, offsets)
+        return offsets
+
+    def post_order(self):
+        """子节点在父节点之前，非递归"""
+        order = []
+        stack = [self.root]
+        while stack:
+            node_id = stack.pop()
+            order.append(node_id)
+            stack.extend(self.children[node_id])
+        order.reverse()
+        return order
+
+    def radial(self):
+        # 每个子树按叶子数分得父节点角度范围中的一段，每圈的半径保证节点不重叠
+        leaves = {}
+        for node_id in self.post_order():
+            children = self.children[node_id]
+            leaves[node_id] = sum(leaves[child] for child in children) if children else 1
+
+        wedges = {self.root: (0.0, 2 * math.pi)}
+        depth = {self.root: 0}
+        radii = [0.0]
+        level = [self.root]
+        while level:
+            next_level = []
+            for node_id in level:
+                start, span = wedges[node_id]
+                children = self.children[node_id]
+                for child in children:
+                    child_span = span * leaves[child] / leaves[node_id]
+                    wedges[child] = (start, child_span)
+                    depth[child] = depth[node_id] + 1
+                    start += child_span
+                    next_level.append(child)
+            if next_level:
+                # 节点所占的弧长不小于它的对角线长度
+                radius = (radii[-1] + max(max(self.size[node_id]) for node_id in level) / 2 + RADIAL_GAP
+                          + max(max(self.size[node_id]) for node_id in next_level) / 2)
+                for node_id in next_level:
+                    width, height = self.size[node_id]
+                    radius = max(radius, math.hypot(width, height) / wedges[node_id][1])
+                radii.append(radius)
+            level = next_level
+
+        offsets = {}
+        for node_id, (start, span) in wedges.items():
+            radius = radii[depth[node_id]]
+            angle = start + span / 2
+            offsets[node_id] = (radius * math.cos(angle), radius * math.sin(angle))
+        offsets[self.root] = (0.0, 0.0)
+        return offsets
+
+
+class LayoutWorker(QThread):
+    """在后台线程中计算大型思维导图的布局"""
+
+    layout_finished = pyqtSignal(int, object)  # 请求序号, 节点编号 -> (x, y)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.job = None
+
+    def start_layout(self, serial, layout, snapshot, mode):
+        self.job = (serial, layout, snapshot, mode)
+        self.start()
+
+    def run(self):
+        serial, layout, snapshot, mode = self.job
+        self.job = None
+        try:
+            positions = layout.compute(snapshot, mode)
+        except Exception as e:
+            print(f"计算布局时出错: {e}")
+            return
+        self.layout_finished.emit(serial, positions)
@@ -0,0 +1,510 @@
+import json
+from contextlib import contextmanager
+from mind_map_format import BinaryMapReader, write_binary_map, is_binary_map
+
+# .mindmap文件格式版本：1为嵌套的树结构，2为扁平的节点和连线数组
+MAP_FORMAT_VERSION = 2
+
+def convert_tree_data(data):
+    """把旧版嵌套格式转换为扁平格式，使用显式栈遍历，不受递归深度限制
+
+    旧版文件没有保存手动创建的连线，这里只能恢复父子之间的连线。
+    """
+    nodes = []
+    lines = []
+    next_id = 1
+    # 根节点最后入栈，最先处理
+    stack = [(node_data, None) for node_data in reversed(data.get("nodes", []))]
+    if "root" in data:
+        stack.append((data["root"], None))
+    root_id = None
+    while stack:
+        node_data, parent_id = stack.pop()
+        node_id = next_id
+        next_id += 1
+        if root_id is None and "root" in data:
+            root_id = node_id
+        nodes.append({
+            "id": node_id,
+            "parent_id": parent_id,
+            "text": node_data["text"],
+            "pos": node_data["pos"],
+            "width": node_data.get("width", 120),
+            "height": node_data.get("height", 80),
+            "shape_type": node_data.get("shape_type", "ellipse")
+        })
+        if parent_id is not None:
+            lines.append({"id": None, "start_node_id": parent_id, "end_node_id": node_id})
+        # 逆序入栈，保持子节点的原有顺序
+        for child_data in reversed(node_data.get("children", [])):
+            stack.append((child_data, node_id))
+    return {
+        "version": MAP_FORMAT_VERSION,
+        "next_id": next_id,
+        "root_id": root_id,
+        "nodes": nodes,
+        "lines": lines,
+        "texts": data.get("texts", [])
+    }
+
+
+class ModelNode:
+    """思维导图的节点数据，不引用任何图形项"""
+
+    __slots__ = ("node_id", "text", "x", "y", "width", "height", "shape_type",
+                 "parent", "children", "lines", "collapsed")
+
+    def __init__(self, node_id, text, x, y, width=120, height=80, shape_type="ellipse"):
+        self.node_id = node_id
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.shape_type = shape_type
+        self.parent = None
+        self.children = []
+        self.lines = set()
+        self.collapsed = False  # 子树已折叠，视图不为其中的节点创建图形项
+
+    def get_data(self):
+        # 返回节点数据用于保存，子节点通过parent_id关联，不递归
+        return {
+            "id": self.node_id,
+            "parent_id": self.parent.node_id if self.parent else None,
+            "text": self.text,
+            "pos": {"x": self.x, "y": self.y},
+            "width": self.width,
+            "height": self.height,
+            "shape_type": self.shape_type,
+            "collapsed": self.collapsed
+        }
+
+
+class ModelLine:
+    """两个节点之间的连线，包括父子之间的连线和手动创建的连线"""
+
+    __slots__ = ("line_id", "start", "end")
+
+    def __init__(self, line_id, start, end):
+        self.line_id = line_id
+        self.start = start
+        self.end = end
+
+    def get_data(self):
+        return {
+            "id": self.line_id,
+            "start_node_id": self.start.node_id,
+            "end_node_id": self.end.node_id
+        }
+
+
+class ModelText:
+    """独立文本，没有编号"""
+
+    __slots__ = ("text", "x", "y")
+
+    def __init__(self, text, x, y):
+        self.text = text
+        self.x = x
+        self.y = y
+
+    def get_data(self):
+        return {"text": self.text, "pos": {"x": self.x, "y": self.y}}
+
+
+class ModelObserver:
+    """接收模型变化的通知，视图等按需覆盖其中的方法
+
+    通知在修改完成后发出，此时模型已处于修改后的状态。
+    """
+
+    def model_reset(self, model):
+        pass
+
+    def node_added(self, node):
+        pass
+
+    def node_removed(self, node):
+        pass
+
+    def node_moved(self, node):
+        pass
+
+    def node_resized(self, node):
+        pass
+
+    def node_text_changed(self, node):
+        pass
+
+    def node_collapsed_changed(self, node):
+        pass
+
+    def line_added(self, line):
+        pass
+
+    def line_removed(self, line):
+        pass
+
+    def text_added(self, text):
+        pass
+
+    def text_removed(self, text):
+        pass
+
+    def text_changed(self, text):
+        pass
+
+
+class MindMapModel:
+    """思维导图的数据模型，不依赖Qt
+
+    节点和连线按编号索引，所有修改都通过这里的方法进行并通知观察者。
+    没有界面时也可以加载、修改、保存和重放自动保存日志；
+    batch期间的通知暂存合并，结束时每个对象的每种变化只通知一次。
+    """
+
+    def __init__(self):
+        self.nodes = {}  # 节点编号 -> ModelNode
+        self.lines = {}  # 连线编号 -> ModelLine
+        self.texts = []
+        self.root = None
+        self.next_id = 1
+        self.observers = []
+        self.batch_depth = 0
+        self.pending = {}  # 批量修改期间暂存的通知，(事件, 对象标识) -> (事件, 对象)
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def notify(self, event, obj):
+        if self.batch_depth:
+            if event == "model_reset":
+                self.pending.clear()
+            self.pending.setdefault((event, id(obj)), (event, obj))
+            return
+        for observer in list(self.observers):
+            getattr(observer, event)(obj)
+
+    @contextmanager
+    def batch(self):
+        """批量修改，结束时按首次发生的顺序发出合并后的通知"""
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                pending = list(self.pending.values())
+                self.pending.clear()
+                for event, obj in pending:
+                    self.notify(event, obj)
+
+    def reserve_id(self, obj_id):
+        # 加载或恢复时沿用保存的编号，之后分配的编号不会重复
+        self.next_id = max(self.next_id, obj_id + 1)
+
+    def clear(self):
+        self.nodes = {}
+        self.lines = {}
+        self.texts = []
+        self.root = None
+        self.next_id = 1
+        self.notify("model_reset", self)
+
+    # 查询
+
+    def roots(self):
+        """根节点在前，其后是其他没有父节点的节点"""
+        roots = [self.root] if self.root else []
+        return roots + [node for node in self.nodes.values() if node is not self.root and node.parent is None]
+
+    def subtree(self, node):
+        """先序遍历子树，父节点在前，非递归以支持很深的树"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield current
+            stack.extend(reversed(current.children))
+
+    def is_visible(self, node):
+        # 所有祖先都未折叠时节点可见
+        parent = node.parent
+        while parent is not None:
+            if parent.collapsed:
+                return False
+            parent = parent.parent
+        return True
+
+    def descendant_count(self, node):
+        return sum(1 for _ in self.subtree(node)) - 1
+
+    # 节点
+
+    def add_nodes(self, nodes_data, index=None, pending_links=None):
+        """按数据添加节点，数据中父节点通常在前
+
+        index不为None时，第一个节点插入父节点子节点列表的该位置。父节点排在后面的节点
+        最后再建立关系；分批加载时由调用者传入pending_links，全部读完后调用link_pending。
+        所有关系建立后才发出通知，观察者可以据此判断节点是否可见。
+        """
+        resolve_links = pending_links is None
+        if resolve_links:
+            pending_links = []
+        added = []
+        for i, node_data in enumerate(nodes_data):
+            node = ModelNode(node_data["id"], node_data["text"], node_data["pos"]["x"], node_data["pos"]["y"],
+                             node_data.get("width", 120), node_data.get("height", 80),
+                             node_data.get("shape_type", "ellipse"))
+            node.collapsed = bool(node_data.get("collapsed"))
+            self.reserve_id(node.node_id)
+            self.nodes[node.node_id] = node
+            added.append(node)
+            parent_id = node_data.get("parent_id")
+            if parent_id is None:
+                continue
+            parent = self.nodes.get(parent_id)
+            if parent is None:
+                pending_links.append((parent_id, node))
+            elif i == 0 and index is not None:
+                parent.children.insert(index, node)
+                node.parent = parent
+            else:
+                parent.children.append(node)
+                node.parent = parent
+        if resolve_links:
+            self.link_pending(pending_links)
+        for node in added:
+            self.notify("node_added", node)
+        return added
+
+    def link_pending(self, pending_links):
+        for parent_id, node in pending_links:
+            parent = self.nodes.get(parent_id)
+            if parent is not None:
+                parent.children.append(node)
+                node.parent = parent
+
+    def remove_subtree(self, node):
+        """删除节点及其整个子树和相关连线"""
+        if node.parent is not None:
+            node.parent.children.remove(node)
+            node.parent = None
+        for current in self.subtree(node):
+            for line in list(current.lines):
+                self.remove_line(line)
+            self.nodes.pop(current.node_id, None)
+            if current is self.root:
+                self.root = None
+            self.notify("node_removed", current)
+
+    def snapshot_subtree(self, node):
+        """保存子树的节点和相关连线，用于删除后恢复，折叠的部分同样保存"""
+        nodes = []
+        lines = set()
+        for current in self.subtree(node):
+            nodes.append(current.get_data())
+            lines |= current.lines
+        index = node.parent.children.index(node) if node.parent else None
+        return {"index": index, "nodes": nodes, "lines": [line.get_data() for line in lines]}
+
+    def restore_subtree(self, subtree):
+        # 按保存的编号重新创建子树，子树的根插回父节点原来的位置
+        self.add_nodes(subtree["nodes"], subtree["index"])
+        self.add_lines(subtree["lines"])
+
+    def move_node(self, node, x, y):
+        if node.x == x and node.y == y:
+            return
+        node.x = x
+        node.y = y
+        self.notify("node_moved", node)
+
+    def resize_node(self, node, width, height):
+        if node.width == width and node.height == height:
+            return
+        node.width = width
+        node.height = height
+        self.notify("node_resized", node)
+
+    def set_node_text(self, node, text):
+        if node.text == text:
+            return
+        node.text = text
+        self.notify("node_text_changed", node)
+
+    def set_collapsed(self, node, collapsed):
+        # 没有子节点的节点不能折叠
+        collapsed = collapsed and bool(node.children)
+        if node.collapsed == collapsed:
+            return
+        node.collapsed = collapsed
+        self.notify("node_collapsed_changed", node)
+
+    # 连线
+
+    def add_line(self, line_id, start_id, end_id):
+        """两端节点都存在时添加连线，line_id为None时分配新编号"""
+        start = self.nodes.get(start_id)
+        end = self.nodes.get(end_id)
+        if start is None or end is None:
+            return None
+        line = ModelLine(line_id if line_id is not None else self.next_id, start, end)
+        self.reserve_id(line.line_id)
+        self.lines[line.line_id] = line
+        start.lines.add(line)
+        end.lines.add(line)
+        self.notify("line_added", line)
+        return line
+
+    def add_lines(self, lines_data):
+        for line_data in lines_data:
+            self.add_line(line_data.get("id"), line_data["start_node_id"], line_data["end_node_id"])
+
+    def remove_line(self, line):
+        line.start.lines.discard(line)
+        line.end.lines.discard(line)
+        if self.lines.pop(line.line_id, None) is not None:
+            self.notify("line_removed", line)
+
+    # 独立文本
+
+    def add_free_text(self, text):
+        self.texts.append(text)
+        self.notify("text_added", text)
+        return text
+
+    def remove_free_text(self, text):
+        if text in self.texts:
+            self.texts.remove(text)
+            self.notify("text_removed", text)
+
+    def edit_free_text(self, text, content):
+        if text.text != content:
+            text.text = content
+            self.notify("text_changed", text)
+
+    def move_free_text(self, text, x, y):
+        if text.x != x or text.y != y:
+            text.x = x
+            text.y = y
+            self.notify("text_changed", text)
+
+    # 导入导出
+
+    def get_data(self):
+        # 导出为扁平的节点和连线数组，节点按父节点在前的顺序排列，包括折叠的部分
+        nodes = []
+        for root in self.roots():
+            queue = [root]
+            for node in queue:
+                nodes.append(node.get_data())
+                queue.extend(node.children)
+        return {
+            "version": MAP_FORMAT_VERSION,
+            "next_id": self.next_id,
+            "root_id": self.root.node_id if self.root else None,
+            "nodes": nodes,
+            "lines": [line.get_data() for line in self.lines.values()],
+            "texts": [text.get_data() for text in self.texts]
+        }
+
+    def load_data(self, data):
+        # 从扁平数组重建，每个节点和连线只处理一次
+        if data.get("version", 1) < 2:
+            data = convert_tree_data(data)
+        self.clear()
+        self.add_nodes(data["nodes"])
+        self.add_lines(data.get("lines", []))
+        for text_data in data.get("texts", []):
+            self.add_free_text(ModelText(text_data["text"], text_data["pos"]["x"], text_data["pos"]["y"]))
+        self.next_id = max(self.next_id, data.get("next_id", 1))
+        self.root = self.nodes.get(data.get("root_id"))
+
+    def read_binary(self, reader, batch_size=2000):
+        """从BinaryMapReader分批读取，每读完一批产生一次(阶段, 已读数量, 总数)
+
+        界面可以在两批之间处理事件；不需要分批时直接遍历到结束即可。
+        """
+        pending_links = []
+        position = 0
+        while position < reader.node_count:
+            count = min(batch_size, reader.node_count - position)
+            # 保存时父节点在前，通常可以立即建立关系
+            self.add_nodes([{"id": node_id, "parent_id": parent_id, "text": text, "pos": {"x": x, "y": y},
+                             "width": width, "height": height, "shape_type": shape_type, "collapsed": collapsed}
+                            for node_id, parent_id, text, x, y, width, height, shape_type, collapsed
+                            in reader.nodes(position, count)], pending_links=pending_links)
+            if self.root is None:
+                self.root = self.nodes.get(reader.root_id)
+            position += count
+            yield "nodes", position, reader.node_count
+        self.link_pending(pending_links)
+
+        position = 0
+        while position < reader.line_count:
+            count = min(batch_size, reader.line_count - position)
+            for line_id, start_id, end_id in reader.lines(position, count):
+                self.add_line(line_id, start_id, end_id)
+            position += count
+            yield "lines", position, reader.line_count
+
+        for text, x, y in reader.texts(0, reader.text_count):
+            self.add_free_text(ModelText(text, x, y))
+        self.next_id = max(self.next_id, reader.next_id)
+
+    def load_file(self, path):
+        """一次读入整个文件，二进制格式也在这里读完"""
+        if is_binary_map(path):
+            reader = BinaryMapReader(path)
+            try:
+                self.clear()
+                for _ in self.read_binary(reader):
+                    pass
+            finally:
+                reader.close()
+        else:
+            # JSON格式（包括旧版的.mindmap文件）整体读取后导入
+            with open(path, 'r', encoding='utf-8') as f:
+                self.load_data(json.load(f))
+
+    def save_file(self, path):
+        # .mindmap为二进制格式，.json用于导出
+        if path.lower().endswith(".json"):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.get_data(), f, ensure_ascii=False, indent=2)
+        else:
+            write_binary_map(path, self.get_data())
+
+    def apply_change(self, record):
+        # 重放自动保存日志中的一条记录
+        op = record["op"]
+        if op == "add_subtree":
+            self.restore_subtree(record["subtree"])
+        elif op == "delete_node":
+            self.remove_subtree(self.nodes[record["id"]])
+        elif op == "add_line":
+            line = record["line"]
+            self.add_line(line.get("id"), line["start_node_id"], line["end_node_id"])
+        elif op == "delete_line":
+            self.remove_line(self.lines[record["id"]])
+        elif op == "move":
+            for node_id, x, y in record["moves"]:
+                self.move_node(self.nodes[node_id], x, y)
+        elif op == "resize":
+            self.resize_node(self.nodes[record["id"]], *record["size"])
+        elif op == "text":
+            self.set_node_text(self.nodes[record["id"]], record["text"])
+        elif op == "collapse":
+            self.set_collapsed(self.nodes[record["id"]], True)
+        elif op == "expand":
+            self.set_collapsed(self.nodes[record["id"]], False)
+        elif op == "texts":
+            for text in list(self.texts):
+                self.remove_free_text(text)
+            for text_data in record["texts"]:
+                self.add_free_text(ModelText(text_data["text"], text_data["pos"]["x"], text_data["pos"]["y"]))
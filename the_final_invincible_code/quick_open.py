@@ -0,0 +1,503 @@
+import os
+import re
+import sys
+import queue
+import bisect
+import heapq
+import operator
+from array import array
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem, QLabel
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QFont, QColor
+from style import Style
+from gitignore import GitIgnore
+
+
+class PathChunk:
+    """一组文件拼接成的小写字符串，文件名和完整路径各一个
+
+    每块最多PathTable.CHUNK_SIZE个文件，文件变化时只重建所在的块。
+    已删除的文件在重建之前仍留在块中，匹配时跳过。
+    """
+
+    __slots__ = ("name_blob", "path_blob", "name_starts", "path_starts", "ids", "dead")
+
+    def __init__(self, table, ids):
+        self.ids = array('I', ids)
+        self.dead = 0
+        # 先逐项转为小写再拼接，个别字符转为小写后长度会变化
+        names = [table.names[index].lower() for index in self.ids]
+        paths = [table.path(index).lower() for index in self.ids]
+        self.name_blob = "\n".join(names)
+        self.path_blob = "\n".join(paths)
+        # 文件名和路径按相同顺序排列，分别记录每一项的起始位置
+        self.name_starts = array('I', [0])
+        self.path_starts = array('I', [0])
+        for name, rel_path in zip(names, paths):
+            self.name_starts.append(self.name_starts[-1] + len(name) + 1)
+            self.path_starts.append(self.path_starts[-1] + len(rel_path) + 1)
+
+
+class PathTable:
+    """紧凑的工作区路径表
+
+    目录前缀只保存一份，每个文件只记录所在目录的编号和文件名（文件名同样驻留），
+    50万个路径只占用几十MB。文件按编号分块拼接成小写的大字符串，
+    用正则表达式在C代码中完成子序列匹配，每个路径最多产生一次匹配，所有匹配都参与评分。
+    路径变化时只重建受影响的块，查询可以在块之间中止。
+    """
+
+    CHUNK_SIZE = 4096
+
+    def __init__(self):
+        self.dirs = []  # 目录编号 -> 相对目录
+        self.dir_ids = {}  # 相对目录 -> 目录编号
+        self.parents = array('I')  # 文件编号 -> 目录编号
+        self.names = []  # 文件编号 -> 文件名，已删除的为None
+        self.by_dir = {}  # 目录编号 -> [文件编号]
+        self.count = 0
+        self.chunks = []  # 按文件编号排列，各块的编号范围不重叠
+        self.chunk_starts = []  # 每块的第一个文件编号
+        self.chunked = 0  # 编号小于该值的文件已经分块
+        self._history = []  # 当前查询的各级前缀: [(查询, 块 -> {级别: 扫描状态})]
+
+    def __len__(self):
+        return self.count
+
+    def dir_id(self, rel_dir):
+        dir_id = self.dir_ids.get(rel_dir)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self.dirs.append(rel_dir)
+            self.dir_ids[rel_dir] = dir_id
+        return dir_id
+
+    def add(self, rel_path):
+        rel_dir, _, name = rel_path.rpartition("/")
+        dir_id = self.dir_id(rel_dir)
+        index = len(self.names)
+        self.parents.append(dir_id)
+        self.names.append(sys.intern(name))
+        self.by_dir.setdefault(dir_id, []).append(index)
+        self.count += 1
+
+    def path(self, index):
+        rel_dir = self.dirs[self.parents[index]]
+        return f"{rel_dir}/{self.names[index]}" if rel_dir else self.names[index]
+
+    def paths(self):
+        return [self.path(i) for i, name in enumerate(self.names) if name is not None]
+
+    def replace_tree(self, rel_dir, rel_paths):
+        """用重新扫描的结果替换rel_dir下的所有文件"""
+        prefix = rel_dir + "/" if rel_dir else ""
+        for dir_id, indexes in list(self.by_dir.items()):
+            current = self.dirs[dir_id]
+            if rel_dir and current != rel_dir and not current.startswith(prefix):
+                continue
+            for index in indexes:
+                self.names[index] = None
+                if index < self.chunked:
+                    self.chunk_of(index).dead += 1
+            self.count -= len(indexes)
+            del self.by_dir[dir_id]
+        for rel_path in rel_paths:
+            self.add(rel_path)
+        # 删除的条目过多时压缩
+        if len(self.names) > 2 * self.count + 1024:
+            self.compact()
+        else:
+            self.update_chunks()
+
+    def compact(self):
+        paths = self.paths()
+        self.__init__()
+        for rel_path in paths:
+            self.add(rel_path)
+        self.update_chunks()
+
+    def chunk_of(self, index):
+        return self.chunks[bisect.bisect_right(self.chunk_starts, index) - 1]
+
+    def update_chunks(self):
+        """重建删除过半的块，新增的文件并入末尾未满的块"""
+        names = self.names
+        chunks = []
+        for chunk in self.chunks:
+            if chunk.dead * 2 > len(chunk.ids):
+                ids = [index for index in chunk.ids if names[index] is not None]
+                if ids:
+                    chunks.append(PathChunk(self, ids))
+            else:
+                chunks.append(chunk)
+        if self.chunked < len(names):
+            ids = [index for index in range(self.chunked, len(names)) if names[index] is not None]
+            if chunks and len(chunks[-1].ids) < self.CHUNK_SIZE:
+                last = chunks.pop()
+                ids = [index for index in last.ids if names[index] is not None] + ids
+            for i in range(0, len(ids), self.CHUNK_SIZE):
+                chunks.append(PathChunk(self, ids[i:i + self.CHUNK_SIZE]))
+            self.chunked = len(names)
+        self.chunks = chunks
+        self.chunk_starts = [chunk.ids[0] for chunk in chunks]
+        # 已重建的块没有扫描状态，查询时只重新扫描这些块
+        current = set(chunks)
+        for _, states in self._history:
+            for chunk in [chunk for chunk in states if chunk not in current]:
+                del states[chunk]
+
+    def scan_tier(self, pattern, chunk, tier, state, size):
+        """在一块的一级字符串中匹配，返回(文件编号 -> 得分, 扫描状态)
+
+        匹配范围越紧凑越好，连续匹配时跨度等于查询长度(size)；
+        从开头匹配和更短的名称略微加分。
+        扫描状态为上一次查询的全部匹配位置。查询追加字符后，新的匹配一定在其中，
+        只需逐个复查，不必重新扫描整个字符串。
+        """
+        blob = chunk.path_blob if tier else chunk.name_blob
+        starts = chunk.path_starts if tier else chunk.name_starts
+        ids = chunk.ids
+        names = self.names
+        found = {}
+        positions = []
+        if state is not None:
+            search = pattern.search
+            for position in state:
+                start = starts[position]
+                end = starts[position + 1] - 1
+                m = search(blob, start, end)
+                if m:
+                    first, last = m.span(1)
+                    positions.append(position)
+                    found[ids[position]] = (tier, last - first - size, first != start, end - start)
+        else:
+            # 模式匹配到行尾，每一行只产生一次匹配
+            locate = bisect.bisect_right
+            for m in pattern.finditer(blob):
+                first, last = m.span(1)
+                position = locate(starts, first) - 1
+                index = ids[position]
+                if names[index] is None:
+                    continue
+                start = starts[position]
+                positions.append(position)
+                found[index] = (tier, last - first - size, first != start,
+                                starts[position + 1] - start - 1)
+        return found, positions
+
+    def match(self, query, limit=50, cancelled=None):
+        """模糊匹配，返回最多limit个[(文件编号, 得分)]，得分越小越好
+
+        cancelled返回True时在块之间中止并返回None。
+        """
+        query = query.strip().lower().replace("\\", "/").replace(" ", "")
+        if not query or not self.count:
+            return []
+        # 各字符按顺序出现即可，中间不能跨过换行符。
+        # 每个字符前只跳过不是该字符的内容，匹配唯一确定，不会回溯
+        pattern = re.compile("(" + re.escape(query[0]) + "".join(
+            f"[^\\n{re.escape(c)}]*{re.escape(c)}" for c in query[1:]) + ")[^\\n]*")
+
+        # 本次查询的匹配一定在其任一前缀的匹配之中，从最长的前缀继续；
+        # 删除字符时也能回到之前的前缀
+        history = [entry for entry in self._history if query.startswith(entry[0])]
+        previous = history[-1][1] if history else {}
+
+        scores = {}
+        states = {chunk: {} for chunk in self.chunks}
+        # 文件名中的匹配优先于跨目录的匹配，同一文件取较好的得分
+        tiers = [1] if "/" in query else [0, 1]
+        for tier in tiers:
+            if len(scores) >= limit:
+                # 级别是得分的第一项，前一级已有足够结果时后面的级别不会入选。
+                # 跳过的级别沿用前缀的扫描状态，它仍是之后查询的候选范围
+                for chunk, chunk_states in states.items():
+                    state = previous.get(chunk, {}).get(tier)
+                    if state is not None:
+                        chunk_states[tier] = state
+                continue
+            found = {}
+            for chunk in self.chunks:
+                if cancelled is not None and cancelled():
+                    return None
+                chunk_found, states[chunk][tier] = self.scan_tier(
+                    pattern, chunk, tier, previous.get(chunk, {}).get(tier), len(query))
+                found.update(chunk_found)
+            # 前一级的得分总是更好，覆盖本级的结果
+            found.update(scores)
+            scores = found
+        if not history or history[-1][0] != query:
+            history.append((query, states))
+        else:
+            history[-1] = (query, states)
+        self._history = history
+
+        # 所有匹配都已评分，用大小为limit的堆取出最好的结果
+        return heapq.nsmallest(limit, scores.items(), key=operator.itemgetter(1))
+
+
+class PathScanner(QThread):
+    """在后台扫描工作区文件路径并维护路径表，跳过 .gitignore 中忽略的路径
+
+    首次扫描整个工作区，之后只重新扫描发生变化的目录。
+    查询也在这个线程中执行，只有最新的查询会返回结果：
+    输入新的字符后，正在执行的旧查询在块之间中止，扫描大目录时也会及时响应查询。
+    """
+
+    tree_updated = pyqtSignal(int)  # 路径表变化后的文件总数
+    results_ready = pyqtSignal(int, list, int)  # 查询编号, [(相对路径, 得分)], 文件总数
+
+    # 扫描多少个目录后检查一次新的查询
+    QUERY_POLL_DIRS = 64
+
+    def __init__(self, root, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.ignore = GitIgnore(root)
+        self.table = PathTable()
+        self.tasks = queue.Queue()
+        self.tasks.put(("scan", ""))
+        self._query = (0, "", 0)  # (查询编号, 查询, 结果数)
+        self._answered = 0
+        self._stopped = False
+
+    def update_paths(self, paths):
+        """重新扫描发生变化的目录"""
+        for path in paths:
+            path = path if os.path.isdir(path) else os.path.dirname(path)
+            rel = self.ignore.relpath(path)
+            if not rel.startswith(".."):
+                self.tasks.put(("scan", rel))
+
+    def query(self, seq, text, limit):
+        """请求查询，编号递增，较旧的查询不再返回结果"""
+        self._query = (seq, text, limit)
+        self.tasks.put(("query", ""))
+
+    def stop(self):
+        self._stopped = True
+        self.tasks.put(None)
+        self.wait()
+
+    def is_outdated(self, seq):
+        return self._stopped or self._query[0] != seq
+
+    def answer_query(self):
+        """执行最新的查询，被更新的查询打断时不返回结果"""
+        seq, text, limit = self._query
+        if seq == self._answered:
+            return
+        matches = self.table.match(text, limit, lambda: self.is_outdated(seq))
+        if matches is None or self.is_outdated(seq):
+            return
+        self._answered = seq
+        results = [(self.table.path(index), score) for index, score in matches]
+        self.results_ready.emit(seq, results, len(self.table))
+
+    def scan(self, rel_dir):
+        """返回rel_dir下所有未被忽略的文件"""
+        files = []
+        stack = [rel_dir]
+        scanned = 0
+        while stack and not self._stopped:
+            current = stack.pop()
+            scanned += 1
+            if scanned % self.QUERY_POLL_DIRS == 0:
+                self.answer_query()
+            try:
+                entries = list(os.scandir(os.path.join(self.root, current)))
+            except OSError:
+                continue
+            for entry in entries:
+                rel = f"{current}/{entry.name}" if current else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if self.ignore.is_ignored(rel, is_dir):
+                    continue
+                if is_dir:
+                    stack.append(rel)
+                else:
+                    files.append(rel)
+        return files
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None or self._stopped:
+                break
+            # 合并排队中的任务，只扫描最上层的目录，子目录已包含在内
+            pending = {task}
+            while not self.tasks.empty():
+                extra = self.tasks.get()
+                if extra is None:
+                    self._stopped = True
+                    break
+                pending.add(extra)
+            if self._stopped:
+                break
+            tops = []
+            for kind, rel_dir in sorted(pending):
+                if kind != "scan":
+                    continue
+                if not any(top == "" or rel_dir == top or rel_dir.startswith(top + "/") for top in tops):
+                    tops.append(rel_dir)
+            if tops:
+                self.ignore.invalidate()
+            for rel_dir in tops:
+                files = self.scan(rel_dir)
+                if self._stopped:
+                    break
+                self.table.replace_tree(rel_dir, files)
+                self.tree_updated.emit(len(self.table))
+            self.answer_query()
+
+
+class QuickOpenDialog(QDialog):
+    """快速打开文件（Ctrl+P），按文件名模糊匹配"""
+
+    file_selected = pyqtSignal(str)
+
+    MAX_RESULTS = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = None
+        self.scanner = None
+        self.query_seq = 0
+
+        self.setWindowFlags(Qt.Popup)
+        self.setMinimumWidth(500)
+        self.setStyleSheet(f"background-color: {Style.DARKER_BG}; border: 1px solid {Style.BORDER_COLOR};")
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(5, 5, 5, 5)
+        self.layout.setSpacing(5)
+
+        font = QFont()
+        font.setFamily(Style.UI_FONT_FAMILY.split(',')[0].strip())
+        font.setPointSize(Style.UI_FONT_SIZE)
+
+        # 创建输入框
+        self.input = QLineEdit()
+        self.input.setPlaceholderText("按名称搜索文件...")
+        self.input.setFont(font)
+        self.input.setStyleSheet(f"""
+            QLineEdit {{
+                background-color: {Style.EDITOR_BG};
+                color: {Style.TEXT_COLOR};
+                border: 1px solid {Style.HIGHLIGHT_BG};
+                border-radius: 2px;
+                padding: 4px 8px;
+                selection-background-color: {Style.HIGHLIGHT_BG};
+            }}
+        """)
+
+        # 创建结果列表
+        self.result_list = QListWidget()
+        self.result_list.setFont(font)
+        self.result_list.setUniformItemSizes(True)
+        self.result_list.setStyleSheet(f"""
+            QListWidget {{
+                background-color: {Style.DARKER_BG};
+                color: {Style.TEXT_COLOR};
+                border: none;
+                outline: none;
+            }}
+            QListWidget::item:selected {{
+                background-color: {Style.SELECTION_BG};
+            }}
+        """)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {Style.INACTIVE_TEXT}; border: none; padding: 2px;")
+
+        self.layout.addWidget(self.input)
+        self.layout.addWidget(self.result_list)
+        self.layout.addWidget(self.status_label)
+
+        # 连接信号
+        self.input.textChanged.connect(self.update_results)
+        self.input.returnPressed.connect(self.accept_current)
+        self.result_list.itemActivated.connect(self.accept_item)
+
+    def set_root_path(self, path):
+        """切换工作区并在后台重新扫描"""
+        path = os.path.abspath(path)
+        if path == self.root:
+            return
+        self.stop()
+        self.root = path
+        self.scanner = PathScanner(path, self)
+        self.scanner.tree_updated.connect(self.on_tree_updated)
+        self.scanner.results_ready.connect(self.on_results_ready)
+        self.scanner.start()
+
+    def update_paths(self, paths):
+        if self.scanner:
+            self.scanner.update_paths(paths)
+
+    def stop(self):
+        if self.scanner:
+            self.scanner.tree_updated.disconnect(self.on_tree_updated)
+            self.scanner.results_ready.disconnect(self.on_results_ready)
+            self.scanner.stop()
+            self.scanner = None
+
+    def on_tree_updated(self, count):
+        if self.isVisible():
+            self.update_results()
+
+    def popup(self):
+        """在父窗口顶部居中显示"""
+        parent = self.parentWidget()
+        if parent:
+            width = max(self.minimumWidth(), parent.width() // 2)
+            self.resize(width, 400)
+            top = parent.mapToGlobal(parent.rect().topLeft())
+            self.move(top.x() + (parent.width() - width) // 2, top.y() + 60)
+        self.input.selectAll()
+        self.show()
+        self.input.setFocus()
+        self.update_results()
+
+    def update_results(self):
+        """在扫描线程中查询，结果返回后再显示"""
+        self.query_seq += 1
+        if self.scanner:
+            self.scanner.query(self.query_seq, self.input.text(), self.MAX_RESULTS)
+        else:
+            self.result_list.clear()
+
+    def on_results_ready(self, seq, matches, count):
+        # 期间又输入了字符时丢弃旧的结果
+        if seq != self.query_seq:
+            return
+        self.result_list.clear()
+        for rel_path, score in matches:
+            name = rel_path.rsplit("/", 1)[-1]
+            item = QListWidgetItem(f"{name}    {rel_path}")
+            item.setData(Qt.UserRole, rel_path)
+            item.setForeground(QColor(Style.TEXT_COLOR))
+            self.result_list.addItem(item)
+        if matches:
+            self.result_list.setCurrentRow(0)
+        self.status_label.setText(f"共 {count} 个文件")
+
+    def keyPressEvent(self, event):
+        # 在输入框中用上下键选择结果
+        if event.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            self.result_list.keyPressEvent(event)
+            return
+        super().keyPressEvent(event)
+
+    def accept_current(self):
+        item = self.result_list.currentItem()
+        if item:
+            self.accept_item(item)
+
+    def accept_item(self, item):
+        rel_path = item.data(Qt.UserRole)
+        self.hide()
+        self.file_selected.emit(os.path.join(self.root, rel_path))
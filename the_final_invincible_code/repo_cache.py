@@ -0,0 +1,73 @@
+import os
+import threading
+import git
+
+
+class RepoCache:
+    """按仓库路径和线程缓存git.Repo对象
+
+    GitPython的Repo不是线程安全的，每个线程各自使用一个Repo，
+    同一线程内复用其常驻的 git cat-file 进程。
+    .git目录被移动或删除后，缓存的对象会在下次访问时被丢弃。
+    """
+
+    def __init__(self):
+        self._repos = {}  # (规范化路径, 线程标识) -> (Repo, .git目录标识)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(path):
+        return os.path.normcase(os.path.realpath(path))
+
+    @staticmethod
+    def _git_dir_identity(git_dir):
+        """返回.git目录的标识，目录不存在时返回None"""
+        try:
+            st = os.stat(git_dir)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def get(self, path):
+        """获取当前线程中路径对应的Repo，不是Git仓库时抛出与git.Repo相同的异常"""
+        key = (self._normalize(path), threading.get_ident())
+        with self._lock:
+            entry = self._repos.get(key)
+            if entry:
+                repo, identity = entry
+                if identity is not None and self._git_dir_identity(repo.git_dir) == identity:
+                    return repo
+                # .git已被移动或删除，丢弃旧的句柄
+                del self._repos[key]
+                self._close_repo(repo)
+
+            repo = git.Repo(path)
+            # 刷新状态时不写入索引，避免自身操作触发文件监视
+            repo.git.update_environment(GIT_OPTIONAL_LOCKS="0")
+            self._repos[key] = (repo, self._git_dir_identity(repo.git_dir))
+            return repo
+
+    def close(self, path):
+        """关闭并移除指定路径在所有线程中的Repo，调用者需确保它们已不再使用"""
+        path = self._normalize(path)
+        with self._lock:
+            keys = [key for key in self._repos if key[0] == path]
+            entries = [self._repos.pop(key) for key in keys]
+        for repo, _ in entries:
+            self._close_repo(repo)
+
+    def clear(self):
+        """关闭所有缓存的Repo"""
+        with self._lock:
+            entries = list(self._repos.values())
+            self._repos.clear()
+        for repo, _ in entries:
+            self._close_repo(repo)
+
+    @staticmethod
+    def _close_repo(repo):
+        try:
+            # 结束常驻的 cat-file 进程
+            repo.close()
+        except Exception:
+            pass
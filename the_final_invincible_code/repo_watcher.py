@@ -0,0 +1,202 @@
+import os
+from collections import deque
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+
+class RepoWatcher(QObject):
+    """监视工作区和.git中的关键文件，合并短时间内的多次变化后发出changed信号
+
+    整个应用共用一个实例：搜索面板通过set_tree设置工作区目录，Git面板通过set_git_dir
+    设置.git目录，两部分可以分别切换。ignore可以设置为判断路径是否应跳过的函数。
+    工作区目录超过MAX_WATCHED_DIRS时truncated为True，使用者需要定期完整同步。
+    目录监视收不到文件的原地修改（Linux），应用自己写入的文件通过file_changed报告。
+    """
+
+    changed = pyqtSignal()  # 工作区或.git发生了变化
+    paths_changed = pyqtSignal(list)  # 工作区中确实发生变化的路径，不包括.git
+
+    # 最多监视的工作区目录数，超出部分依赖定时刷新兜底
+    MAX_WATCHED_DIRS = 2000
+    # 合并变化事件的等待时间（毫秒）
+    DEBOUNCE_MS = 300
+    # .git 中需要监视的文件，另外监视.git目录本身和refs下的所有目录
+    GIT_FILES = ["index", "HEAD", "packed-refs"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.repo_path = None
+        self.git_dir = None
+        self.ignore = None
+        self.pending_paths = set()
+        self.watched_paths = set()
+        self.stats = {}  # 路径 -> 上次看到的(mtime, size)
+        self.truncated = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_path_changed)
+        self.watcher.directoryChanged.connect(self.on_path_changed)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(self.DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.flush)
+
+    def set_tree(self, repo_path):
+        """切换监视的工作区目录，传入None时停止监视工作区"""
+        self.unwatch(lambda path: not self.is_git_path(path))
+        self.truncated = False
+        self.repo_path = repo_path
+        if repo_path:
+            self.watch_tree(repo_path)
+
+    def set_git_dir(self, git_dir):
+        """切换监视的.git目录，传入None时停止监视"""
+        if git_dir == self.git_dir:
+            return
+        self.unwatch(self.is_git_path)
+        self.git_dir = git_dir
+        if git_dir:
+            self.watch_git_files()
+            self.watch(git_dir)
+            self.watch_refs(os.path.join(git_dir, "refs"))
+
+    def watch_git_files(self):
+        """监视.git中的关键文件，被替换后失去监视的会重新添加"""
+        watched = set(self.watcher.files())
+        for name in self.GIT_FILES:
+            path = os.path.join(self.git_dir, name)
+            if path not in watched:
+                self.watch(path, rewatch=True)
+
+    def watch_refs(self, root):
+        """监视引用目录及其所有子目录，如 refs/heads/feature/x 所在的目录"""
+        for path, _, _ in os.walk(root):
+            if path not in self.watched_paths:
+                self.watch(path)
+
+    def is_refs_path(self, path):
+        refs = os.path.join(self.git_dir, "refs") if self.git_dir else None
+        return refs is not None and (path == refs or path.startswith(refs + os.sep))
+
+    def is_skipped(self, entry):
+        if entry.name == ".git" or not entry.is_dir(follow_symlinks=False):
+            return True
+        return self.ignore is not None and self.ignore(entry.path)
+
+    def unwatch(self, predicate):
+        """停止监视满足条件的路径，并丢弃它们尚未处理的变化"""
+        paths = [path for path in self.watched_paths if predicate(path)]
+        if paths:
+            self.watcher.removePaths(paths)
+        self.watched_paths.difference_update(paths)
+        for path in paths:
+            self.stats.pop(path, None)
+        self.pending_paths = {path for path in self.pending_paths if not predicate(path)}
+
+    def watch(self, path, rewatch=False):
+        """监视单个路径，并记录其当前状态"""
+        if not os.path.exists(path):
+            return
+        if rewatch and path in self.watched_paths:
+            self.watcher.removePath(path)
+            self.watched_paths.discard(path)
+        if path not in self.watched_paths:
+            self.watcher.addPath(path)
+            self.watched_paths.add(path)
+        self.stats[path] = self.stat(path)
+
+    def watch_tree(self, root):
+        """广度优先监视工作区目录，跳过.git并限制数量"""
+        queue = deque([root])
+        while queue:
+            if len(self.watched_paths) >= self.MAX_WATCHED_DIRS:
+                self.truncated = True
+                return
+            path = queue.popleft()
+            self.watch(path)
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if not self.is_skipped(entry):
+                            queue.append(entry.path)
+            except OSError:
+                continue
+
+    def watch_new_subdirs(self, path):
+        """监视目录中尚未监视的子目录"""
+        try:
+            with os.scandir(path) as entries:
+                subdirs = [entry.path for entry in entries if not self.is_skipped(entry)]
+        except OSError:
+            return
+        for subdir in subdirs:
+            if subdir not in self.watched_paths:
+                self.watch_tree(subdir)
+
+    @staticmethod
+    def stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def is_git_path(self, path):
+        if self.git_dir is None:
+            return False
+        return path == self.git_dir or path.startswith(self.git_dir + os.sep)
+
+    def file_changed(self, path):
+        """报告应用自己写入的工作区文件"""
+        path = os.path.normpath(path)
+        if self.repo_path and path.startswith(os.path.normpath(self.repo_path) + os.sep):
+            self.on_path_changed(path)
+
+    def on_path_changed(self, path):
+        """记录变化的路径并重新开始计时"""
+        self.pending_paths.add(path)
+        self.debounce_timer.start()
+
+    def flush(self):
+        """处理合并后的变化
+
+        .git中的路径只有状态确实改变时才算变化，避免Git读取时的噪声。
+        工作区的事件都算变化：目录的事件也可能来自其中文件的原地修改，
+        此时目录本身的状态不变。
+        """
+        pending = self.pending_paths
+        self.pending_paths = set()
+
+        changed = False
+        reported = []
+        for path in pending:
+            stat = self.stat(path)
+            git_path = self.is_git_path(path)
+            if not git_path:
+                changed = True
+                reported.append(path)
+            elif stat != self.stats.get(path):
+                changed = True
+            if stat is None:
+                self.stats.pop(path, None)
+                self.watched_paths.discard(path)
+                continue
+
+            if os.path.isdir(path):
+                self.stats[path] = stat
+                if not git_path:
+                    # 工作区新建的子目录也需要监视
+                    self.watch_new_subdirs(path)
+                elif self.is_refs_path(path):
+                    # 新建的引用命名空间目录
+                    self.watch_refs(path)
+                elif path == self.git_dir:
+                    # Git通过重命名替换index等文件，需要重新添加监视
+                    self.watch_git_files()
+            elif path in self.watched_paths:
+                self.watch(path, rewatch=True)
+
+        if changed:
+            self.changed.emit()
+        if reported:
+            self.paths_changed.emit(reported)
@@ -0,0 +1,244 @@
+import os
+import re
+import sqlite3
+import hashlib
+
+# 超过该大小的文件不建立索引
+MAX_FILE_SIZE = 1024 * 1024
+# 查询时最多使用的三元组个数，足以筛掉绝大多数文件
+MAX_QUERY_TRIGRAMS = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trigrams (
+    tri BLOB NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (tri, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trigrams_file ON trigrams (file_id);
+-- 按所在目录（去掉文件名后的路径，以/结尾，根目录为空串）查找文件
+CREATE INDEX IF NOT EXISTS files_dir ON files (rtrim(path, replace(path, '/', '')));
+"""
+
+
+def default_db_path(cache_dir, root):
+    """每个工作区根目录对应一个索引数据库"""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.db")
+
+
+def remove_db(db_path):
+    """删除索引数据库及其WAL文件"""
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def open_index(db_path):
+    """打开索引数据库，文件已损坏时删除后重新建立
+
+    数据库被锁定、磁盘已满等OperationalError不是文件本身的问题，原样抛出。
+    """
+    try:
+        return SearchIndex(db_path)
+    except sqlite3.OperationalError:
+        raise
+    except sqlite3.DatabaseError:
+        remove_db(db_path)
+        return SearchIndex(db_path)
+
+
+def file_trigrams(data):
+    """返回文件内容中出现的所有三元组，ASCII字母统一为小写"""
+    data = data.lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def is_binary(data):
+    return b"\0" in data[:8000]
+
+
+def query_trigrams(literal, case_sensitive=False):
+    """返回查询字符串必然包含的三元组
+
+    索引只对ASCII字母做了小写处理，不区分大小写时跳过含非ASCII字节的三元组。
+    """
+    data = literal.encode("utf-8").lower()
+    trigrams = set()
+    for i in range(len(data) - 2):
+        tri = data[i:i + 3]
+        if not case_sensitive and max(tri) >= 0x80:
+            continue
+        trigrams.add(tri)
+    return trigrams
+
+
+def required_literals(pattern):
+    """从正则表达式中提取所有匹配都必然包含的字面量
+
+    只做保守的分析：含有 | 时不提取；分组和字符类整体跳过；
+    被 ? * {m,n} 修饰的字符不算必需。
+    """
+    if "|" in pattern:
+        return []
+    literals = []
+    current = []
+
+    def flush():
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "\\" and i + 1 < n:
+            escaped = pattern[i + 1]
+            if escaped.isalnum():
+                # \d \w \b 等不是字面量
+                flush()
+            else:
+                current.append(escaped)
+            i += 2
+            continue
+        if c in "*?{":
+            if current:
+                current.pop()
+            flush()
+            if c == "{":
+                end = pattern.find("}", i)
+                i = end + 1 if end >= 0 else n
+                continue
+        elif c in "([":
+            flush()
+            # 跳过整个分组或字符类
+            close = ")" if c == "(" else "]"
+            depth = 0
+            while i < n:
+                if pattern[i] == "\\":
+                    i += 2
+                    continue
+                if pattern[i] == c and c == "(":
+                    depth += 1
+                elif pattern[i] == close:
+                    depth -= 1
+                    if depth <= 0:
+                        break
+                i += 1
+            # 分组后的量词使分组变为可选，这里分组本来就没有计入
+        elif c in ".^$+)":
+            flush()
+        else:
+            current.append(c)
+        i += 1
+    flush()
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+class SearchIndex:
+    """持久化的三元组倒排索引
+
+    每个线程应使用自己的实例。数据库使用WAL模式，建立索引的线程写入时，
+    查询线程仍可以同时读取。
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        try:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+        except sqlite3.Error:
+            self.db.close()
+            raise
+
+    def close(self):
+        self.db.close()
+
+    def commit(self):
+        self.db.commit()
+
+    def known_files(self, prefix=""):
+        """返回已索引的文件，path -> (id, mtime, size)，prefix为相对目录"""
+        if prefix:
+            # "0"紧接在"/"之后，范围查询可以使用路径上的索引
+            rows = self.db.execute(
+                "SELECT path, id, mtime, size FROM files WHERE path >= ? AND path < ?",
+                (prefix + "/", prefix + "0"))
+        else:
+            rows = self.db.execute("SELECT path, id, mtime, size FROM files")
+        return {path: (file_id, mtime, size) for path, file_id, mtime, size in rows}
+
+    def dir_files(self, rel_dir):
+        """返回直接位于rel_dir中的已索引文件，path -> (id, mtime, size)"""
+        rows = self.db.execute(
+            "SELECT path, id, mtime, size FROM files WHERE rtrim(path, replace(path, '/', '')) = ?",
+            (rel_dir + "/" if rel_dir else "",))
+        return {path: (file_id, mtime, size) for path, file_id, mtime, size in rows}
+
+    def file_entry(self, path):
+        """返回单个文件的(id, mtime, size)，未索引时返回None"""
+        return self.db.execute("SELECT id, mtime, size FROM files WHERE path = ?", (path,)).fetchone()
+
+    def has_files(self, rel_dir):
+        """目录下是否有已索引的文件"""
+        return self.db.execute("SELECT 1 FROM files WHERE path >= ? AND path < ? LIMIT 1",
+                               (rel_dir + "/", rel_dir + "0")).fetchone() is not None
+
+    def update_file(self, path, mtime, size, trigrams):
+        """写入一个文件的索引，trigrams为None表示不索引内容"""
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row:
+            file_id = row[0]
+            self.db.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (mtime, size, file_id))
+            self.db.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+        else:
+            file_id = self.db.execute(
+                "INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)", (path, mtime, size)).lastrowid
+        if trigrams:
+            self.db.executemany("INSERT INTO trigrams (tri, file_id) VALUES (?, ?)",
+                                ((tri, file_id) for tri in trigrams))
+
+    def remove_files(self, file_ids):
+        for file_id in file_ids:
+            self.db.execute("DELETE FROM trigrams WHERE file_id = ?", (file_id,))
+            self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def file_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def candidates(self, trigrams):
+        """返回包含所有给定三元组的文件路径"""
+        trigrams = sorted(trigrams)
+        if not trigrams:
+            return self.all_paths()
+        if len(trigrams) > MAX_QUERY_TRIGRAMS:
+            # 均匀选取一部分三元组
+            step = len(trigrams) / MAX_QUERY_TRIGRAMS
+            trigrams = [trigrams[int(i * step)] for i in range(MAX_QUERY_TRIGRAMS)]
+        query = " INTERSECT ".join(["SELECT file_id FROM trigrams WHERE tri = ?"] * len(trigrams))
+        rows = self.db.execute(
+            f"SELECT path FROM files WHERE id IN ({query}) ORDER BY path", trigrams)
+        return [row[0] for row in rows]
+
+    def all_paths(self):
+        return [row[0] for row in self.db.execute("SELECT path FROM files ORDER BY path")]
+
+
+def compile_query(text, is_regex=False, case_sensitive=False):
+    """编译查询并返回(正则表达式, 候选文件必须包含的三元组)"""
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    regex = re.compile(text if is_regex else re.escape(text), flags)
+    literals = required_literals(text) if is_regex else [text]
+    trigrams = set()
+    for literal in literals:
+        trigrams |= query_trigrams(literal, case_sensitive)
+    return regex, trigrams
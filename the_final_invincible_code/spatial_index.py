@@ -0,0 +1,76 @@
+import math
+
+
+class SpatialIndex:
+    """均匀网格空间索引
+
+    场景平面按固定大小划分为网格，每个对象登记到其包围盒覆盖的所有格子中。
+    查询某个点时只需检查该点所在格子里的对象，与场景中的对象总数无关。
+    对象移动或改变大小时调用update重新登记。
+    """
+
+    def __init__(self, cell_size=256):
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> 对象集合
+        self.objects = {}  # 对象 -> 覆盖的格子
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, obj):
+        return obj in self.objects
+
+    def cells_for(self, rect):
+        size = self.cell_size
+        left = math.floor(rect.left() / size)
+        right = math.floor(rect.right() / size)
+        top = math.floor(rect.top() / size)
+        bottom = math.floor(rect.bottom() / size)
+        return tuple((x, y) for x in range(left, right + 1) for y in range(top, bottom + 1))
+
+    def update(self, obj, rect):
+        """登记或更新对象的包围盒（场景坐标）"""
+        cells = self.cells_for(rect)
+        old = self.objects.get(obj)
+        if old == cells:
+            return
+        if old:
+            for cell in old:
+                bucket = self.cells.get(cell)
+                if bucket is not None:
+                    bucket.discard(obj)
+                    if not bucket:
+                        del self.cells[cell]
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(obj)
+        self.objects[obj] = cells
+
+    def remove(self, obj):
+        cells = self.objects.pop(obj, None)
+        if not cells:
+            return
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(obj)
+                if not bucket:
+                    del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.objects.clear()
+
+    def query_point(self, point):
+        """返回包围盒可能包含该点的对象"""
+        size = self.cell_size
+        cell = (math.floor(point.x() / size), math.floor(point.y() / size))
+        return self.cells.get(cell, ())
+
+    def query_rect(self, rect):
+        """返回包围盒可能与矩形相交的对象"""
+        result = set()
+        for cell in self.cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                result |= bucket
+        return result
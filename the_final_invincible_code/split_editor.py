@@ -97,6 +97,7 @@ class EditorContainer(QWidget):
     # 定义信号
     split_requested = pyqtSignal(QWidget, Qt.Orientation)
     close_requested = pyqtSignal(QWidget)
+    tab_closing = pyqtSignal(QWidget)  # 即将关闭的标签页部件
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -174,6 +175,7 @@ class EditorContainer(QWidget):
     
     def on_tab_close_requested(self, index):
         """关闭标签页"""
+        self.tab_closing.emit(self.tab_widget.widget(index))
         self.tab_widget.removeTab(index)
         
         # 如果没有标签页了，发出关闭信号
@@ -192,6 +194,7 @@ class EditorContainer(QWidget):
 
 class SplitEditorManager(QSplitter):
     tabDragged = pyqtSignal(int, QPoint)
+    tab_closing = pyqtSignal(QWidget)  # 任一容器中即将关闭的标签页部件
     """拆分编辑器管理器，用于管理所有拆分的编辑器容器"""
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -210,6 +213,7 @@ class SplitEditorManager(QSplitter):
         # 连接信号
         self.main_container.split_requested.connect(self.split_editor)
         self.main_container.close_requested.connect(self.close_editor)
+        self.main_container.tab_closing.connect(self.tab_closing)
         
         # 保存所有编辑器容器的引用
         self.containers = [self.main_container]
@@ -231,6 +235,7 @@ class SplitEditorManager(QSplitter):
         new_container = EditorContainer()
         new_container.split_requested.connect(self.split_editor)
         new_container.close_requested.connect(self.close_editor)
+        new_container.tab_closing.connect(self.tab_closing)
         
         # 创建可拖拽标签栏
         new_container.tab_widget.setTabBar(DraggableTabBar())
@@ -0,0 +1,93 @@
+from collections import namedtuple
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+# 一行状态：分类序号、路径、重命名前的路径
+StatusRow = namedtuple("StatusRow", ["rank", "path", "orig_path"])
+
+# 分类的显示顺序、标签和颜色
+CATEGORIES = [
+    ("conflicted", "冲突", "orange"),
+    ("staged", "已暂存", "green"),
+    ("modified", "已修改", "blue"),
+    ("untracked", "未跟踪", "red"),
+]
+
+
+class StatusListModel(QAbstractListModel):
+    """Git文件状态列表模型
+
+    每次刷新时与上一次的状态表做比较，只发出插入、删除和修改的信号，
+    未变化的行保持不变，选择和滚动位置不会丢失。
+    """
+
+    PathRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.colors = [QColor(color) for _, _, color in CATEGORIES]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            label = CATEGORIES[row.rank][1]
+            if row.orig_path:
+                return f"[{label}] {row.orig_path} -> {row.path}"
+            return f"[{label}] {row.path}"
+        if role == Qt.ForegroundRole:
+            return self.colors[row.rank]
+        if role == self.PathRole:
+            return row.path
+        return None
+
+    @staticmethod
+    def build_rows(table):
+        """将状态表转换为按显示顺序排序的行"""
+        rows = []
+        for rank, (name, _, _) in enumerate(CATEGORIES):
+            paths = getattr(table, name)
+            for path in sorted(paths):
+                orig_path = table.renamed.get(path) if name == "staged" else None
+                rows.append(StatusRow(rank, path, orig_path))
+        return rows
+
+    def set_status(self, table):
+        """用新的状态表更新模型，只通知发生变化的行"""
+        new_rows = self.build_rows(table)
+        rows = self.rows
+        i = j = 0
+        # 新旧两组行都按(分类, 路径)排序，合并遍历即可得到差异
+        while i < len(rows) or j < len(new_rows):
+            if j >= len(new_rows) or (i < len(rows) and rows[i][:2] < new_rows[j][:2]):
+                # 连续删除旧的行
+                end = i
+                while end < len(rows) and (j >= len(new_rows) or rows[end][:2] < new_rows[j][:2]):
+                    end += 1
+                self.beginRemoveRows(QModelIndex(), i, end - 1)
+                del rows[i:end]
+                self.endRemoveRows()
+            elif i >= len(rows) or new_rows[j][:2] < rows[i][:2]:
+                # 连续插入新的行
+                end = j
+                while end < len(new_rows) and (i >= len(rows) or new_rows[end][:2] < rows[i][:2]):
+                    end += 1
+                self.beginInsertRows(QModelIndex(), i, i + end - j - 1)
+                rows[i:i] = new_rows[j:end]
+                self.endInsertRows()
+                i += end - j
+                j = end
+            else:
+                if rows[i] != new_rows[j]:
+                    rows[i] = new_rows[j]
+                    index = self.index(i)
+                    self.dataChanged.emit(index, index)
+                i += 1
+                j += 1
@@ -0,0 +1,531 @@
+import os
+import time
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QCheckBox, QLabel, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, QThread, QTimer, QStandardPaths, pyqtSignal
+from PyQt5.QtGui import QFont, QColor
+from style import Style
+from gitignore import GitIgnore
+from search_index import (SearchIndex, MAX_FILE_SIZE, default_db_path, file_trigrams, is_binary, compile_query,
+                          open_index, remove_db)
+
+
+def search_cache_dir():
+    """搜索索引的存放目录"""
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return os.path.join(base, "lingxi", "search")
+
+
+def read_file_entry(path, rel_path, stat):
+    """在线程池中读取文件并计算三元组"""
+    mtime, size = stat
+    if size > MAX_FILE_SIZE:
+        return rel_path, mtime, size, None
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return rel_path, mtime, size, None
+    if is_binary(data):
+        return rel_path, mtime, size, None
+    return rel_path, mtime, size, file_trigrams(data)
+
+
+class IndexWorker(QThread):
+    """建立和增量更新工作区索引的后台线程
+
+    遍历文件时跳过 .gitignore 中忽略的路径，只重新读取修改时间或大小
+    发生变化的文件，读取和计算三元组在线程池中并行进行。
+    任务为(类型, 相对路径)：tree遍历整个目录树，dir只同步一个目录的直接内容，
+    file同步单个文件，gone删除已不存在的路径，restat重新检查所有已索引文件的状态。
+    """
+
+    progress = pyqtSignal(int, int)  # 已处理文件数, 待处理文件数
+    index_updated = pyqtSignal()
+    index_failed = pyqtSignal(str)  # 错误信息
+
+    BATCH_SIZE = 256
+
+    def __init__(self, root, db_path, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.db_path = db_path
+        self.ignore = GitIgnore(root)
+        self.tasks = queue.Queue()
+        self.empty_dirs = {}  # 遍历过但没有可索引文件的目录 -> 修改时间，父目录变化时不再重复遍历
+        self._stopped = False
+
+    def crawl(self):
+        """与磁盘上的整个工作区同步"""
+        self.tasks.put(("tree", ""))
+
+    def reconcile(self, full):
+        """定期兜底：full为True时重新遍历整个工作区，否则只重新检查已索引的文件"""
+        self.tasks.put(("tree", "") if full else ("restat", ""))
+
+    def update_paths(self, paths):
+        """重新同步发生变化的目录或文件，只处理变化的这一层"""
+        for path in paths:
+            rel = self.ignore.relpath(path)
+            if rel.startswith(".."):
+                continue
+            if os.path.isdir(path):
+                self.tasks.put(("dir", rel))
+            elif os.path.exists(path):
+                self.tasks.put(("file", rel))
+            else:
+                self.tasks.put(("gone", rel))
+
+    def stop(self):
+        self._stopped = True
+        self.tasks.put(None)
+        self.wait()
+
+    def walk(self, rel_dir):
+        """遍历目录，返回 相对路径 -> (修改时间, 大小)"""
+        files = {}
+        stack = [rel_dir]
+        while stack and not self._stopped:
+            current = stack.pop()
+            dir_files, subdirs = self.scan(current)
+            files.update(dir_files)
+            stack.extend(subdirs)
+        return files
+
+    def scan(self, rel_dir):
+        """读取一个目录，返回(文件 -> (修改时间, 大小), 子目录列表)，都不包括忽略的路径"""
+        files = {}
+        subdirs = []
+        try:
+            entries = list(os.scandir(os.path.join(self.root, rel_dir)))
+        except OSError:
+            return files, subdirs
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self.ignore.is_ignored(rel, True):
+                        subdirs.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    if not self.ignore.is_ignored(rel, False):
+                        st = entry.stat()
+                        files[rel] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return files, subdirs
+
+    def connect_index(self):
+        """打开索引数据库，失败时发出index_failed并返回None"""
+        try:
+            return open_index(self.db_path)
+        except (sqlite3.Error, OSError) as e:
+            self.index_failed.emit(f"无法打开搜索索引: {e}")
+            return None
+
+    def run(self):
+        index = self.connect_index()
+        if index is None:
+            return
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            while True:
+                task = self.tasks.get()
+                if task is None or self._stopped:
+                    break
+                # 合并排队中的任务，整体同步时其他任务都不需要了
+                tasks = {task}
+                while not self.tasks.empty():
+                    extra = self.tasks.get()
+                    if extra is None:
+                        self._stopped = True
+                        break
+                    tasks.add(extra)
+                if self._stopped:
+                    break
+                if ("tree", "") in tasks:
+                    tasks = {("tree", "")}
+                self.ignore.invalidate()
+                try:
+                    for kind, rel in sorted(tasks):
+                        getattr(self, "sync_" + kind)(index, pool, rel)
+                except sqlite3.OperationalError as e:
+                    # 数据库被锁定或磁盘已满，放弃这一批任务，定期兜底时会重新同步
+                    self.index_failed.emit(f"更新搜索索引失败: {e}")
+                    continue
+                except sqlite3.DatabaseError as e:
+                    # 数据库文件已损坏，删除后重新建立整个索引
+                    self.index_failed.emit(f"搜索索引已损坏，正在重新建立: {e}")
+                    index.close()
+                    try:
+                        remove_db(self.db_path)
+                    except OSError:
+                        pass
+                    index = self.connect_index()
+                    if index is None:
+                        return
+                    self.empty_dirs.clear()
+                    self.tasks.put(("tree", ""))
+                    continue
+                self.index_updated.emit()
+        index.close()
+
+    def sync_tree(self, index, pool, rel_dir):
+        """同步整个目录树：删除已不存在的文件，重新索引变化的文件"""
+        prefix = rel_dir + "/" if rel_dir else ""
+        self.empty_dirs = {d: mtime for d, mtime in self.empty_dirs.items()
+                           if d != rel_dir and not d.startswith(prefix)}
+        current = self.walk(rel_dir)
+        self.apply(index, pool, current, index.known_files(rel_dir))
+
+    def sync_dir(self, index, pool, rel_dir):
+        """只同步目录的直接内容；索引中还没有文件的子目录是新出现的，整体遍历
+
+        遍历后仍没有文件的子目录连同修改时间记录在empty_dirs中，修改时间不变时不再遍历，
+        它下层的变化会收到单独的事件。
+        """
+        self.empty_dirs.pop(rel_dir, None)
+        current, subdirs = self.scan(rel_dir)
+        self.apply(index, pool, current, index.dir_files(rel_dir))
+        for subdir in subdirs:
+            if self._stopped or index.has_files(subdir):
+                continue
+            try:
+                mtime = os.stat(os.path.join(self.root, subdir)).st_mtime_ns
+            except OSError:
+                continue
+            if self.empty_dirs.get(subdir) == mtime:
+                continue
+            self.sync_tree(index, pool, subdir)
+            if not index.has_files(subdir):
+                self.empty_dirs[subdir] = mtime
+
+    def sync_file(self, index, pool, rel_path):
+        current = {}
+        if not self.ignore.is_ignored(rel_path, False):
+            try:
+                st = os.stat(os.path.join(self.root, rel_path))
+                current[rel_path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+        entry = index.file_entry(rel_path)
+        self.apply(index, pool, current, {rel_path: entry} if entry else {})
+
+    def sync_gone(self, index, pool, rel_path):
+        known = index.known_files(rel_path)
+        entry = index.file_entry(rel_path)
+        if entry:
+            known[rel_path] = entry
+        self.apply(index, pool, {}, known)
+
+    def sync_restat(self, index, pool, rel_dir):
+        """重新检查已索引文件的状态，发现原地修改和没有被监视到的删除"""
+        known = index.known_files(rel_dir)
+        current = {}
+        for rel_path in known:
+            if self._stopped:
+                return
+            try:
+                st = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                continue
+            current[rel_path] = (st.st_mtime_ns, st.st_size)
+        self.apply(index, pool, current, known)
+
+    def apply(self, index, pool, current, known):
+        """current为磁盘上的文件，known为索引中对应范围的文件"""
+        removed = [known[path][0] for path in known if path not in current]
+        if removed:
+            index.remove_files(removed)
+            index.commit()
+
+        changed = [path for path, stat in current.items()
+                   if path not in known or tuple(known[path][1:]) != stat]
+        total = len(changed)
+        for start in range(0, total, self.BATCH_SIZE):
+            if self._stopped:
+                break
+            batch = changed[start:start + self.BATCH_SIZE]
+            results = pool.map(lambda rel: read_file_entry(os.path.join(self.root, rel), rel, current[rel]), batch)
+            for rel_path, mtime, size, trigrams in results:
+                index.update_file(rel_path, mtime, size, trigrams)
+            index.commit()
+            self.progress.emit(min(start + len(batch), total), total)
+
+
+class SearchJob(QThread):
+    """执行一次查询，找到的结果按文件分批发出"""
+
+    results_found = pyqtSignal(str, list)  # 相对路径, [(行号, 行内容)]
+    search_finished = pyqtSignal(int, float)  # 结果数, 耗时（秒）
+    search_failed = pyqtSignal(str)
+
+    MAX_RESULTS = 5000
+
+    def __init__(self, root, db_path, text, is_regex, case_sensitive, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.db_path = db_path
+        self.text = text
+        self.is_regex = is_regex
+        self.case_sensitive = case_sensitive
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            regex, trigrams = compile_query(self.text, self.is_regex, self.case_sensitive)
+        except Exception as e:
+            self.search_failed.emit(f"无效的正则表达式: {e}")
+            return
+
+        try:
+            index = SearchIndex(self.db_path)
+            try:
+                candidates = index.candidates(trigrams)
+            finally:
+                index.close()
+        except (sqlite3.Error, OSError) as e:
+            self.search_failed.emit(f"搜索索引不可用: {e}")
+            return
+
+        count = 0
+        for rel_path in candidates:
+            if self._cancelled or count >= self.MAX_RESULTS:
+                break
+            try:
+                with open(os.path.join(self.root, rel_path), 'rb') as f:
+                    content = f.read(MAX_FILE_SIZE + 1)
+            except OSError:
+                continue
+            if len(content) > MAX_FILE_SIZE or is_binary(content):
+                continue
+            content = content.decode("utf-8", errors="replace")
+
+            matches = []
+            line_no = 0
+            line_start = 0
+            last_line = -1
+            for match in regex.finditer(content):
+                # 增量计算匹配所在的行，同一行只记录一次
+                line_no += content.count("\n", line_start, match.start())
+                line_start = content.rfind("\n", 0, match.start()) + 1
+                if line_no == last_line:
+                    continue
+                last_line = line_no
+                line_end = content.find("\n", match.start())
+                line = content[line_start:line_end if line_end >= 0 else len(content)]
+                matches.append((line_no, line.strip()[:200]))
+                if count + len(matches) >= self.MAX_RESULTS:
+                    break
+            if matches:
+                count += len(matches)
+                self.results_found.emit(rel_path, matches)
+
+        self.search_finished.emit(count, time.perf_counter() - start)
+
+
+class SearchPanel(QWidget):
+    """侧边栏的全文搜索面板"""
+
+    open_file_requested = pyqtSignal(str, int)  # 文件路径, 行号（从0开始）
+
+    # 定期兜底同步的间隔（毫秒）：原地修改文件不一定产生目录事件，
+    # 超出监视上限的目录也没有事件
+    RECONCILE_INTERVAL = 60000
+
+    def __init__(self, watcher, parent=None):
+        super().__init__(parent)
+        self.watcher = watcher
+        self.root = None
+        self.db_path = None
+        self.worker = None
+        self.job = None
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(5, 5, 5, 5)
+        self.layout.setSpacing(5)
+
+        font = QFont()
+        font.setFamily(Style.UI_FONT_FAMILY.split(',')[0].strip())
+        font.setPointSize(Style.UI_FONT_SIZE)
+
+        # 创建标题
+        self.title_label = QLabel("搜索")
+        self.title_label.setStyleSheet(f"color: {Style.INACTIVE_TEXT}; font-weight: bold; padding: 5px;")
+
+        # 创建搜索框
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索内容...")
+        self.search_input.setStyleSheet(f"""
+            QLineEdit {{
+                background-color: {Style.DARKER_BG};
+                color: {Style.TEXT_COLOR};
+                border: 1px solid {Style.BORDER_COLOR};
+                border-radius: 2px;
+                padding: 4px 8px;
+                selection-background-color: {Style.HIGHLIGHT_BG};
+            }}
+        """)
+
+        # 创建搜索选项
+        self.options_layout = QHBoxLayout()
+        self.options_layout.setContentsMargins(0, 0, 0, 0)
+        self.regex_check = QCheckBox("正则")
+        self.case_check = QCheckBox("区分大小写")
+        for check in (self.regex_check, self.case_check):
+            check.setStyleSheet(f"color: {Style.TEXT_COLOR};")
+            self.options_layout.addWidget(check)
+        self.options_layout.addStretch()
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {Style.INACTIVE_TEXT}; padding: 2px;")
+
+        # 创建结果列表
+        self.result_tree = QTreeWidget()
+        self.result_tree.setHeaderHidden(True)
+        self.result_tree.setUniformRowHeights(True)
+        self.result_tree.setFont(font)
+        self.result_tree.setStyleSheet(f"""
+            QTreeWidget {{
+                background-color: {Style.DARKER_BG};
+                border: none;
+                outline: none;
+            }}
+            QTreeWidget::item:selected {{
+                background-color: {Style.SELECTION_BG};
+            }}
+        """)
+
+        # 添加到布局
+        self.layout.addWidget(self.title_label)
+        self.layout.addWidget(self.search_input)
+        self.layout.addLayout(self.options_layout)
+        self.layout.addWidget(self.status_label)
+        self.layout.addWidget(self.result_tree)
+
+        # 输入停顿后再搜索
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.start_search)
+
+        # 工作区变化由共用的监视器报告，增量更新索引
+        self.reconcile_timer = QTimer(self)
+        self.reconcile_timer.setInterval(self.RECONCILE_INTERVAL)
+        self.reconcile_timer.timeout.connect(self.reconcile)
+
+        # 连接信号
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_input.returnPressed.connect(self.start_search)
+        self.regex_check.toggled.connect(self.start_search)
+        self.case_check.toggled.connect(self.start_search)
+        self.result_tree.itemActivated.connect(self.on_item_activated)
+
+    def set_root_path(self, path):
+        """切换工作区，启动索引线程并开始监视"""
+        path = os.path.abspath(path)
+        if path == self.root:
+            return
+        self.stop()
+        self.root = path
+        self.db_path = default_db_path(search_cache_dir(), path)
+
+        self.worker = IndexWorker(path, self.db_path, self)
+        self.worker.progress.connect(self.on_index_progress)
+        self.worker.index_updated.connect(self.on_index_updated)
+        self.worker.index_failed.connect(self.status_label.setText)
+        self.worker.start()
+        self.worker.crawl()
+
+        ignore = self.worker.ignore
+        self.watcher.ignore = lambda p: ignore.is_ignored(p, True)
+        self.watcher.paths_changed.connect(self.worker.update_paths)
+        self.watcher.set_tree(path)
+        self.reconcile_timer.start()
+
+    def reconcile(self):
+        # 监视覆盖了整个工作区时只重新检查已索引文件的状态，否则重新遍历
+        if self.worker:
+            self.worker.reconcile(self.watcher.truncated)
+
+    def stop(self):
+        """停止索引和查询线程"""
+        if self.job:
+            self.job.cancel()
+            self.job.wait()
+        self.cancel_search()
+        self.reconcile_timer.stop()
+        if self.worker:
+            self.watcher.paths_changed.disconnect(self.worker.update_paths)
+            self.watcher.set_tree(None)
+            self.worker.stop()
+            self.worker = None
+
+    def cancel_search(self):
+        """取消正在进行的查询，线程结束后再释放"""
+        job = self.job
+        self.job = None
+        if job:
+            job.cancel()
+            if job.isRunning():
+                job.finished.connect(job.deleteLater)
+            else:
+                job.deleteLater()
+
+    def search(self, text):
+        """从外部发起搜索"""
+        self.search_input.setText(text)
+        self.start_search()
+
+    def start_search(self):
+        self.search_timer.stop()
+        text = self.search_input.text()
+        self.cancel_search()
+        self.result_tree.clear()
+        if not text or not self.root:
+            self.status_label.setText("")
+            return
+
+        self.job = SearchJob(self.root, self.db_path, text,
+                             self.regex_check.isChecked(), self.case_check.isChecked(), self)
+        self.job.results_found.connect(self.on_results_found)
+        self.job.search_finished.connect(self.on_search_finished)
+        self.job.search_failed.connect(self.status_label.setText)
+        self.status_label.setText("搜索中...")
+        self.job.start()
+
+    def on_results_found(self, rel_path, matches):
+        if self.sender() is not self.job:
+            return
+        file_item = QTreeWidgetItem([f"{rel_path} ({len(matches)})"])
+        file_item.setData(0, Qt.UserRole, (rel_path, matches[0][0]))
+        file_item.setForeground(0, QColor(Style.TEXT_COLOR))
+        for line_no, line in matches:
+            line_item = QTreeWidgetItem([f"{line_no + 1}: {line}"])
+            line_item.setData(0, Qt.UserRole, (rel_path, line_no))
+            line_item.setForeground(0, QColor(Style.INACTIVE_TEXT))
+            file_item.addChild(line_item)
+        self.result_tree.addTopLevelItem(file_item)
+        file_item.setExpanded(True)
+
+    def on_search_finished(self, count, elapsed):
+        if self.sender() is not self.job:
+            return
+        self.status_label.setText(f"{count} 个结果，用时 {elapsed * 1000:.0f} 毫秒")
+
+    def on_index_progress(self, done, total):
+        self.status_label.setText(f"正在建立索引: {done}/{total}")
+
+    def on_index_updated(self):
+        if self.job is None or not self.job.isRunning():
+            self.status_label.setText("索引已更新")
+
+    def on_item_activated(self, item, column):
+        data = item.data(0, Qt.UserRole)
+        if data:
+            rel_path, line_no = data
+            self.open_file_requested.emit(os.path.join(self.root, rel_path), line_no)